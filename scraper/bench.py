@@ -0,0 +1,324 @@
+"""
+Benchmarks offline del pipeline del scraper (sin red).
+
+Mide parseo de ambas fuentes, normalización de fechas, dedupe/delta y la
+escritura verificada de la API contra históricos sintéticos de varios
+tamaños. Reporta throughput y memoria pico por etapa y guarda un JSON que
+se puede comparar entre commits:
+
+    python scraper/bench.py --salida bench_base.json
+    python scraper/bench.py --comparar bench_base.json
+
+Los HTML salen de scraper/fixtures/ (grabados con --grabar); si no existen
+se generan unos sintéticos con la misma estructura que esperan los parsers.
+El repo no trae fixtures grabados, así que sin un --grabar previo las
+cifras de parseo son de HTML sintético y el reporte lo dice
+("Fixtures HTML: sinteticos").
+"""
+import argparse, contextlib, gc, io, json, os, platform, random, subprocess, sys, tempfile, time, tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import main  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+TAMANOS = [10_000, 100_000, 1_000_000]
+UMBRAL_REGRESION = 0.20
+
+LOTERIAS = sorted(set(main.CANON_MAP.values())) + [
+    "Agarra 4", "Super Palé", "Pega 3 Más", "Loto Pool", "Toca 3", "Mega Chances",
+]
+MESES_TXT = {v: k for k, v in main.MESES.items()}
+
+# ---------- Fixtures HTML ----------
+def _html_loterias_dominicanas(hoy: datetime, n: int = 60, nombres: list = None) -> str:
+    rnd = random.Random(1)
+    nombres = nombres or LOTERIAS
+    bloques = []
+    for i in range(n):
+        nombre = nombres[i % len(nombres)]
+        numeros = "".join(f"<span class='score'>{rnd.randint(0, 99):02d}</span>" for _ in range(3))
+        bloques.append(
+            "<div class='game-block'>"
+            f"<div class='game-info p-2'><div class='game-logo'><img src='/img/logo{i}.png'></div>"
+            f"<div class='session-date'>{hoy:%d-%m-%Y} {10 + i % 12}:00</div>"
+            f"<div class='game-title'><span>{nombre}</span></div></div>"
+            f"<div class='game-scores'>{numeros}</div>"
+            "</div>"
+        )
+    anuncios = "<div class='ad'><script>var x=1;</script><img src='/ads/x.png'></div>" * 80
+    return f"<html><head><title>LD</title></head><body>{anuncios}{''.join(bloques)}</body></html>"
+
+def _html_tusnumerosrd(hoy: datetime, n: int = 60, nombres: list = None) -> str:
+    rnd = random.Random(2)
+    nombres = nombres or LOTERIAS
+    mes = MESES_TXT[f"{hoy.month:02d}"]
+    filas = []
+    for i in range(n):
+        nombre = nombres[(i * 7) % len(nombres)]
+        numeros = "".join(
+            f"<div class='badge badge-primary badge-dot'>{rnd.randint(0, 99):02d}</div>" for _ in range(3)
+        )
+        hora = f"{1 + i % 12}:{(i * 5) % 60:02d}{'AM' if i % 2 else 'PM'}"
+        filas.append(
+            f"<tr><td><img src='/logos/{i}.png'><h6 class='mb-0'>{nombre}</h6></td>"
+            f"<td>{numeros}</td>"
+            f"<td><span class='table-inner-text'><span class='table-inner-text'>{hoy.day} {mes}</span></span></td>"
+            f"<td>{hora}</td></tr>"
+        )
+    anuncios = "<div class='ad'><script>var x=1;</script><img src='/ads/x.png'></div>" * 80
+    return f"<html><body>{anuncios}<table>{''.join(filas)}</table></body></html>"
+
+GENERADORES = {
+    "loteriasdominicanas": _html_loterias_dominicanas,
+    "tusnumerosrd": _html_tusnumerosrd,
+}
+
+def cargar_fixtures(directorio: str) -> tuple:
+    """({clave: html}, "grabados" | "sinteticos")."""
+    hoy = datetime.now(main.TZ_RD)
+    htmls, origen = {}, "grabados"
+    for clave, generar in GENERADORES.items():
+        path = os.path.join(directorio, f"{clave}.html")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                htmls[clave] = f.read()
+        else:
+            htmls[clave] = generar(hoy)
+            origen = "sinteticos"
+    return htmls, origen
+
+def grabar_fixtures(directorio: str):
+    """Guarda el HTML actual de cada fuente (GET directo) como fixture."""
+    os.makedirs(directorio, exist_ok=True)
+    for clave, cfg in main.FUENTES.items():
+        r = main._http_session().get(cfg["url"], timeout=cfg["timeout_http"])
+        r.raise_for_status()
+        if "charset" not in r.headers.get("Content-Type", "").lower():
+            r.encoding = r.apparent_encoding
+        path = os.path.join(directorio, f"{clave}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(r.text)
+        print(f"💾 {path}: {len(r.text)} bytes")
+
+# ---------- Datos sintéticos ----------
+def historico_sintetico(n: int, semilla: int = 7) -> list:
+    """n registros públicos repartidos hacia atrás en el tiempo, ~60 por día."""
+    rnd = random.Random(semilla)
+    hoy = datetime.now(main.TZ_RD)
+    registros = []
+    for i in range(n):
+        dia = hoy - timedelta(days=1 + i // 60)
+        fecha = dia.strftime("%Y-%m-%d")
+        registros.append({
+            "fuente": "tusnumerosrd.com" if i % 2 else "loteriasdominicanas.com",
+            "loteria": LOTERIAS[i % len(LOTERIAS)],
+            "img": f"https://example.invalid/logo{i % 50}.png",
+            "numeros": [f"{rnd.randint(0, 99):02d}" for _ in range(3)],
+            "fecha_original": f"{dia:%d-%m-%Y} {10 + i % 12}:00",
+            "fecha": fecha,
+            "hora": f"{1 + i % 12}:{(i * 5) % 60:02d}PM" if i % 2 else None,
+            "hora_scrapeo": f"{fecha} {10 + i % 12}:30:00",
+        })
+    return registros
+
+def lote_de_hoy(historico: list, n: int = 120) -> list:
+    """Corrida típica: la mitad ya está en el histórico reciente, la otra mitad es nueva."""
+    ahora = datetime.now(main.TZ_RD)
+    hoy = ahora.strftime("%Y-%m-%d")
+    mes = MESES_TXT[f"{ahora.month:02d}"]
+    repetidos = [dict(r) for r in historico[:n // 2]]
+    nuevos = []
+    for i in range(n - len(repetidos)):
+        nuevos.append({
+            "fuente": "tusnumerosrd.com",
+            "loteria": LOTERIAS[i % len(LOTERIAS)],
+            "img": "",
+            "numeros": [f"{(i * 3 + k) % 100:02d}" for k in range(3)],
+            "fecha_original": f"{i % 28 + 1} {mes}",
+            "fecha": hoy,
+            "hora": f"{1 + i % 12}:25PM",
+            "hora_scrapeo": f"{hoy} 12:00:00",
+        })
+    return repetidos + nuevos
+
+# ---------- Medición ----------
+@contextlib.contextmanager
+def _silencio():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def medir(nombre: str, fn, unidades: int, repeticiones: int, con_memoria: bool = True) -> dict:
+    """Mejor tiempo de `repeticiones` corridas y memoria pico (tracemalloc, corrida aparte)."""
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        with _silencio():
+            inicio = time.perf_counter()
+            fn()
+            tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos)
+
+    pico = None
+    if con_memoria:
+        gc.collect()
+        tracemalloc.start()
+        with _silencio():
+            fn()
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    res = {
+        "etapa": nombre,
+        "unidades": unidades,
+        "segundos": round(mejor, 6),
+        "por_segundo": round(unidades / mejor, 1) if mejor > 0 else None,
+        "memoria_pico_mb": round(pico / 2**20, 2) if pico is not None else None,
+    }
+    print(
+        f"  {nombre:<34} {unidades:>9} u  {mejor * 1000:>10.1f} ms  "
+        f"{res['por_segundo'] or 0:>12,.0f} u/s"
+        + (f"  {res['memoria_pico_mb']:>8.1f} MB" if pico is not None else "")
+    )
+    return res
+
+def etapas_parseo(htmls: dict, repeticiones: int, con_memoria: bool) -> list:
+    resultados = []
+    for clave, html in htmls.items():
+        cfg = main.FUENTES[clave]
+        with _silencio():
+            filas = len(cfg["parser"](html))
+        resultados.append(medir(
+            f"parseo {clave}", lambda: cfg["parser"](html), filas, repeticiones, con_memoria
+        ))
+        resultados.append(medir(
+            f"huella {clave}", lambda: main._analizar_html(clave, html), 1, repeticiones, con_memoria
+        ))
+    return resultados
+
+def etapas_fechas(repeticiones: int, con_memoria: bool) -> list:
+    hoy = datetime.now(main.TZ_RD)
+    crudas = [
+        f"{d % 28 + 1} {mes}" for d, mes in enumerate(list(main.MESES) * 50)
+    ] + [f"{(hoy - timedelta(days=d)):%d-%m-%Y} 12:{d % 60:02d}" for d in range(1000)]
+    items = [{"fecha": main.normaliza_fecha(c), "hora": "7:25PM"} for c in crudas]
+    return [
+        medir("normaliza_fecha", lambda: [main.normaliza_fecha(c) for c in crudas],
+              len(crudas), repeticiones, con_memoria),
+        medir("parse_dt", lambda: [main.parse_dt(it) for it in items],
+              len(items), repeticiones, con_memoria),
+    ]
+
+def etapas_historico(n: int, repeticiones: int, con_memoria: bool) -> list:
+    historico = historico_sintetico(n)
+    lote = lote_de_hoy(historico)
+    normalizado = main.normalizar_resultados(lote)
+    resultados = [
+        medir(f"normalizar_resultados [{n}]", lambda: main.normalizar_resultados(historico[:10_000]),
+              min(n, 10_000), repeticiones, con_memoria),
+        medir(f"delta_nuevos [{n}]", lambda: main.delta_nuevos(historico, normalizado),
+              n, repeticiones, con_memoria),
+        medir(f"evitar_duplicados [{n}]", lambda: main.evitar_duplicados(historico, normalizado),
+              n, repeticiones, con_memoria),
+        medir(f"compactar_delta [{n}]",
+              lambda: main.compactar_delta(main.delta_nuevos(historico, normalizado)),
+              len(normalizado), repeticiones, con_memoria),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "resultados_combinados.json")
+        resultados.append(medir(
+            f"escribir_api_publica [{n}]", lambda: main.escribir_api_publica(historico, path),
+            n, repeticiones, con_memoria
+        ))
+        resultados.append(medir(
+            f"verificar manifiesto [{n}]", lambda: main.manifiesto_al_dia(path),
+            n, repeticiones, con_memoria
+        ))
+        resultados.append(medir(
+            f"cargar_historico [{n}]", lambda: main.cargar_historico(path),
+            n, repeticiones, con_memoria
+        ))
+    return resultados
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def comparar(actual: dict, base: dict, umbral: float) -> int:
+    """Imprime la variación por etapa; devuelve cuántas etapas empeoraron más que `umbral`."""
+    previas = {e["etapa"]: e for e in base.get("etapas", [])}
+    regresiones = 0
+    print(f"\n📊 Comparación contra {base.get('commit') or 'base'} (umbral {umbral:.0%}):")
+    for etapa in actual["etapas"]:
+        previa = previas.get(etapa["etapa"])
+        if not previa or not previa.get("segundos"):
+            continue
+        cambio = etapa["segundos"] / previa["segundos"] - 1
+        marca = "❌" if cambio > umbral else ("✅" if cambio < -umbral else "  ")
+        regresiones += cambio > umbral
+        print(f"  {marca} {etapa['etapa']:<34} {cambio:+7.1%}")
+    return regresiones
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Benchmarks offline del scraper")
+    parser.add_argument("--tamanos", default=",".join(map(str, TAMANOS)),
+                        help="Tamaños de histórico sintético, separados por coma.")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--grabar", action="store_true",
+                        help="Descarga el HTML actual de las fuentes a --fixtures y sale.")
+    parser.add_argument("--sin-memoria", action="store_true",
+                        help="No mide memoria pico (ahorra una corrida por etapa).")
+    parser.add_argument("--salida", help="Guarda los resultados en este JSON.")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior para comparar.")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_REGRESION)
+    args = parser.parse_args()
+
+    if args.grabar:
+        grabar_fixtures(args.fixtures)
+        return 0
+
+    con_memoria = not args.sin_memoria
+    htmls, origen = cargar_fixtures(args.fixtures)
+    print(f"🧪 Fixtures HTML: {origen}")
+    if origen == "sinteticos":
+        print(f"   (sin HTML grabado en {args.fixtures}; para medir páginas reales: --grabar)")
+
+    etapas = []
+    # Las etapas cortas son ruidosas: se repiten más para que el mejor tiempo sea estable.
+    print("🔬 Parseo")
+    etapas += etapas_parseo(htmls, args.repeticiones * 3, con_memoria)
+    print("🔬 Fechas")
+    etapas += etapas_fechas(args.repeticiones * 3, con_memoria)
+    for n in (int(t) for t in args.tamanos.split(",") if t.strip()):
+        print(f"🔬 Histórico de {n:,} registros")
+        # El histórico de 1M es caro de medir: una sola repetición basta.
+        etapas += etapas_historico(n, 1 if n >= 1_000_000 else args.repeticiones, con_memoria)
+
+    resultado = {
+        "commit": _commit_actual(),
+        "fecha": datetime.now(main.TZ_RD).isoformat(),
+        "python": platform.python_version(),
+        "parser": main._backend_parser(),
+        "fixtures": origen,
+        "etapas": etapas,
+    }
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if comparar(resultado, base, args.umbral):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
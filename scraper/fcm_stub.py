@@ -0,0 +1,164 @@
+"""
+Stub local de FCM v1 para pruebas de carga (sin Google ni dispositivos).
+
+Acepta POST /v1/projects/<id>/messages:send con la misma forma que FCM y
+puede inyectar latencia, 429 (con Retry-After) y 5xx para ejercitar la
+concurrencia y los reintentos del despacho:
+
+    python scraper/fcm_stub.py --puerto 8766 --latencia-ms 80 --tasa-429 0.1 --tasa-5xx 0.05
+
+El scraper se apunta con FCM_ENDPOINT=http://127.0.0.1:8766 y
+FCM_TOKEN_ESTATICO=stub. scraper/replay.py lo levanta en un hilo.
+"""
+import argparse, json, random, re, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RUTA_ENVIO = re.compile(r"^/v1/projects/[^/]+/messages:send$")
+
+class ServidorFCMStub:
+    """
+    Servidor en un hilo que responde como FCM y registra cada request:
+    destino, status devuelto y momento de llegada (perf_counter del proceso).
+    """
+
+    def __init__(self, puerto: int = 0, latencia_ms: float = 0.0, jitter_ms: float = 0.0,
+                 tasa_429: float = 0.0, tasa_5xx: float = 0.0, retry_after: int = 1,
+                 semilla: int = None):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.tasa_429 = tasa_429
+        self.tasa_5xx = tasa_5xx
+        self.retry_after = retry_after
+        self.registros = []
+        self._rnd = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._en_curso = 0
+        self.max_en_curso = 0
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", puerto), self._handler())
+        self._httpd.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self) -> str:
+        host, puerto = self._httpd.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def _sortear(self) -> tuple:
+        """(status, espera_s) para el próximo request."""
+        with self._lock:
+            azar = self._rnd.random()
+            jitter = self._rnd.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        if azar < self.tasa_429:
+            status = 429
+        elif azar < self.tasa_429 + self.tasa_5xx:
+            status = 503
+        else:
+            status = 200
+        return status, max(0.0, self.latencia_ms + jitter) / 1000
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, como el endpoint real
+
+            def _responder(self, status: int, cuerpo: dict, headers: dict = None):
+                datos = json.dumps(cuerpo).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def do_POST(self):
+                llegada = time.perf_counter()
+                largo = int(self.headers.get("Content-Length") or 0)
+                crudo = self.rfile.read(largo)
+                if not RUTA_ENVIO.match(self.path):
+                    return self._responder(404, {"error": {"code": 404, "status": "NOT_FOUND"}})
+                if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+                    return self._responder(401, {"error": {"code": 401, "status": "UNAUTHENTICATED"}})
+                try:
+                    message = json.loads(crudo)["message"]
+                    destino = message.get("topic") or message["condition"]
+                except (ValueError, KeyError, TypeError):
+                    return self._responder(400, {"error": {"code": 400, "status": "INVALID_ARGUMENT"}})
+
+                with stub._lock:
+                    stub._en_curso += 1
+                    stub.max_en_curso = max(stub.max_en_curso, stub._en_curso)
+                status, espera = stub._sortear()
+                try:
+                    time.sleep(espera)
+                    if status == 429:
+                        self._responder(429, {"error": {"code": 429, "status": "QUOTA_EXCEEDED"}},
+                                        {"Retry-After": str(stub.retry_after)})
+                    elif status >= 500:
+                        self._responder(status, {"error": {"code": status, "status": "UNAVAILABLE"}})
+                    else:
+                        n = len(stub.registros) + 1
+                        self._responder(200, {"name": f"projects/stub/messages/{n}"})
+                finally:
+                    with stub._lock:
+                        stub._en_curso -= 1
+                        stub.registros.append({
+                            "destino": destino,
+                            "status": status,
+                            "llegada": llegada,
+                            "ms": round((time.perf_counter() - llegada) * 1000, 1),
+                        })
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def resumen(self) -> dict:
+        with self._lock:
+            registros = list(self.registros)
+        conteo = {}
+        for r in registros:
+            conteo[str(r["status"])] = conteo.get(str(r["status"]), 0) + 1
+        return {
+            "requests": len(registros),
+            "por_status": conteo,
+            "max_en_curso": self.max_en_curso,
+            "destinos_ok": len({r["destino"] for r in registros if r["status"] == 200}),
+        }
+
+def main_stub():
+    parser = argparse.ArgumentParser(description="Stub local de FCM v1")
+    parser.add_argument("--puerto", type=int, default=8766)
+    parser.add_argument("--latencia-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--tasa-429", type=float, default=0.0)
+    parser.add_argument("--tasa-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--semilla", type=int)
+    args = parser.parse_args()
+
+    stub = ServidorFCMStub(args.puerto, args.latencia_ms, args.jitter_ms,
+                           args.tasa_429, args.tasa_5xx, args.retry_after, args.semilla)
+    print(f"📡 Stub FCM en {stub.url} (Ctrl+C para salir)")
+    try:
+        stub._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._httpd.server_close()
+        print(f"📊 {json.dumps(stub.resumen(), ensure_ascii=False)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_stub())
@@ -1,7 +1,21 @@
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
-import json, os, re, unicodedata
-from datetime import datetime, timedelta, timezone
+from playwright.async_api import async_playwright
+from bs4 import BeautifulSoup, SoupStrainer
+import argparse, asyncio, contextlib, functools, gzip, hashlib, io, json, os, random, re, signal, sqlite3, threading, time, unicodedata
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+try:
+    import brotli  # opcional: sin él solo se publican las variantes .gz
+except ImportError:
+    brotli = None
+
+try:
+    import numpy as np  # opcional: sin él no se publica api/stats.json
+except ImportError:
+    np = None
 
 # --- FCM V1 ---
 import requests
@@ -12,6 +26,10 @@ import google.auth.transport.requests
 PROJECT_ID = "bancard-a52ba"
 TOPIC_GLOBAL = "resultados_loteria"       # usuarios sin favoritas
 ANDROID_CHANNEL_ID = "resultados_loteria_high"  # Debe existir en la app
+# Base del endpoint FCM v1. Para pruebas de carga se apunta al stub local
+# (scraper/fcm_stub.py) y FCM_TOKEN_ESTATICO evita pedir token a Google.
+FCM_ENDPOINT = os.getenv("FCM_ENDPOINT", "https://fcm.googleapis.com").rstrip("/")
+FCM_TOKEN_ESTATICO = os.getenv("FCM_TOKEN_ESTATICO", "")
 
 # === TZ RD (sin DST) ===
 TZ_RD = timezone(timedelta(hours=-4), name="America/Santo_Domingo")
@@ -145,23 +163,34 @@ def make_dedupe_key(loteria: str, numeros: list, fecha: str) -> str:
     return re.sub(r'\s+', ' ', base).strip()
 
 # ---------- Parseo fecha/hora a datetime (TZ RD) ----------
+_RE_FECHA_ISO = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+_RE_HORA_AMPM = re.compile(r'^(\d{1,2}):(\d{2})\s*([AaPp][Mm])$')
+
+def _hora_a_hm(raw_hora: str):
+    """'7:25PM' -> (19, 25); 12:00 cuando no hay hora reconocible."""
+    hh, mm = 12, 0
+    if raw_hora:
+        h = _RE_HORA_AMPM.match(raw_hora.replace(' ', ''))
+        if h:
+            hh = int(h.group(1)); mm = int(h.group(2))
+            ampm = h.group(3).upper()
+            if ampm == 'PM' and hh != 12: hh += 12
+            if ampm == 'AM' and hh == 12: hh = 0
+    return hh, mm
+
 def parse_dt(item) -> datetime|None:
     raw_fecha = (item.get('fecha') or item.get('fecha_original') or '').strip()
-    raw_fecha = normaliza_fecha(raw_fecha)
     raw_hora  = (item.get('hora') or '').strip()
 
-    # yyyy-MM-dd (+ hora AM/PM)
-    m = re.match(r'^(\d{4})-(\d{2})-(\d{2})$', raw_fecha)
+    # yyyy-MM-dd (+ hora AM/PM). Es lo que dejan los scrapers: no hace falta
+    # volver a pasar por normaliza_fecha.
+    m = _RE_FECHA_ISO.match(raw_fecha)
+    if not m:
+        raw_fecha = normaliza_fecha(raw_fecha)
+        m = _RE_FECHA_ISO.match(raw_fecha)
     if m:
         y, mo, d = int(m.group(1)), int(m.group(2)), int(m.group(3))
-        hh, mm = 12, 0
-        if raw_hora:
-            h = re.match(r'^(\d{1,2}):(\d{2})\s*([AaPp][Mm])$', raw_hora.replace(' ', ''))
-            if h:
-                hh = int(h.group(1)); mm = int(h.group(2))
-                ampm = h.group(3).upper()
-                if ampm == 'PM' and hh != 12: hh += 12
-                if ampm == 'AM' and hh == 12: hh = 0
+        hh, mm = _hora_a_hm(raw_hora)
         return datetime(y, mo, d, hh, mm, tzinfo=TZ_RD)
 
     # dd-MM-yyyy HH:mm
@@ -177,14 +206,7 @@ def parse_dt(item) -> datetime|None:
         mo = int(MESES.get(mes_txt, '00'))
         if mo == 0: return None
         now = datetime.now(TZ_RD)
-        hh, mm = 12, 0
-        if raw_hora:
-            h = re.match(r'^(\d{1,2}):(\d{2})\s*([AaPp][Mm])$', raw_hora.replace(' ', ''))
-            if h:
-                hh = int(h.group(1)); mm = int(h.group(2))
-                ampm = h.group(3).upper()
-                if ampm == 'PM' and hh != 12: hh += 12
-                if ampm == 'AM' and hh == 12: hh = 0
+        hh, mm = _hora_a_hm(raw_hora)
         return datetime(now.year, mo, d, hh, mm, tzinfo=TZ_RD)
     return None
 
@@ -192,310 +214,1076 @@ def is_today(dt: datetime) -> bool:
     now = datetime.now(TZ_RD)
     return (dt.year, dt.month, dt.day) == (now.year, now.month, now.day)
 
+# ---------- Registro normalizado ----------
+class Resultado:
+    """
+    Fila scrapeada normalizada una sola vez: nombre canónico, fecha ISO,
+    datetime, clave de números, tópicos FCM y claves de dedupe quedan
+    calculados al construirla. `publico` es el dict con el esquema del JSON
+    público y se serializa tal cual, sin copias.
+    """
+
+    __slots__ = (
+        "publico", "loteria", "numeros", "fecha", "hora", "hora_scrapeo", "fuente",
+        "canonica", "dt", "numeros_key", "topic", "topic_alias", "clave",
+    )
+
+    def __init__(self, publico: dict):
+        self.publico = publico
+        self.loteria = publico.get("loteria") or ""
+        self.numeros = publico.get("numeros") or []
+        self.fecha = publico.get("fecha") or ""
+        self.hora = publico.get("hora")
+        self.hora_scrapeo = publico.get("hora_scrapeo") or ""
+        self.fuente = publico.get("fuente") or ""
+
+        self.canonica = canonicaliza_loteria(self.loteria)
+        self.dt = parse_dt(publico)
+        self.numeros_key = nums_key(self.numeros)
+        self.topic = topic_seguro(self.canonica)
+        self.topic_alias = topic_seguro(self.loteria or self.canonica)
+
+        # Misma identidad que _clave() sobre dicts: un sorteo por lotería
+        # canónica, fecha y conjunto de números, lo reporte quien lo reporte.
+        self.clave = (self.canonica, self.fecha, self.numeros_key)
+
+    def __repr__(self):
+        return f"Resultado({self.canonica!r}, {self.fecha!r}, {self.numeros!r}, {self.hora!r})"
+
+def normalizar_resultados(crudos: list) -> list:
+    """Etapa única de normalización: dicts de los scrapers -> Resultado."""
+    return [Resultado(r) for r in crudos]
+
+def registros_publicos(items) -> list:
+    """Dicts del esquema público para Resultado o registros ya publicados."""
+    return [r.publico if isinstance(r, Resultado) else r for r in items]
+
 # ---------- Scrapers ----------
-def scrapear_loterias_dominicanas():
-    resultados = []
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=True,
-                args=["--no-sandbox", "--disable-dev-shm-usage"]
-            )
-            page = browser.new_page(
-                viewport={"width": 1280, "height": 1600},
-                user_agent=(
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/131.0.0.0 Safari/537.36"
-                )
-            )
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/131.0.0.0 Safari/537.36"
+)
+CHROMIUM_ARGS = ["--no-sandbox", "--disable-dev-shm-usage"]
 
-            response = page.goto(
-                "https://loteriasdominicanas.com/pagina/ultimos-resultados",
-                wait_until="domcontentloaded",
-                timeout=60000
+# ---------- Parseo HTML ----------
+# "lxml" (C, por defecto; ya está en requirements) o "html.parser" (siempre
+# disponible). Se puede forzar con SCRAPER_PARSER.
+PARSER_BACKEND = os.getenv("SCRAPER_PARSER", "lxml")
+
+# Alcance por fuente: solo se construyen los contenedores de resultados con
+# todo su subárbol; cabecera, scripts y anuncios ni siquiera entran al árbol.
+# Se acota al padre común (div.game-block, fila tr) y no a cada nodo, para
+# que las relaciones entre hermanos queden como en el árbol completo.
+ALCANCE_LOTERIAS_DOMINICANAS = SoupStrainer("div", class_="game-block")
+ALCANCE_TUSNUMEROSRD = SoupStrainer("tr")
+
+# Bloques game-info en el HTML crudo: si alguno quedó fuera de un game-block
+# el árbol acotado lo perdería, así que se usa el completo.
+_GAME_INFO_RE = re.compile(r"""class\s*=\s*["'](?:[^"']*\s)?game-info(?=[\s"'])""")
+
+@functools.lru_cache(maxsize=None)
+def _backend_parser() -> str:
+    if PARSER_BACKEND == "lxml":
+        try:
+            import lxml  # noqa: F401
+            return "lxml"
+        except ImportError:
+            print("⚠️ lxml no disponible; se usa html.parser.")
+    return "html.parser"
+
+def construir_arbol(html: str, alcance=None) -> BeautifulSoup:
+    """Árbol BeautifulSoup con el backend configurado, acotado a `alcance` si se indica."""
+    return BeautifulSoup(html, _backend_parser(), parse_only=alcance)
+
+def arbol_loterias_dominicanas(html: str) -> BeautifulSoup:
+    """Árbol acotado a los game-block, o el completo si hay bloques fuera de ellos."""
+    soup = construir_arbol(html, ALCANCE_LOTERIAS_DOMINICANAS)
+    if len(soup.select("div.game-info")) != len(_GAME_INFO_RE.findall(html)):
+        soup = construir_arbol(html)
+    return soup
+
+def arbol_tusnumerosrd(html: str) -> BeautifulSoup:
+    return construir_arbol(html, ALCANCE_TUSNUMEROSRD)
+
+# ---------- Marca de agua por fuente (parseo incremental) ----------
+# Identidades (hash del texto) de los bloques/filas ya procesados en la última
+# corrida persistida. El parser salta lo conocido sin extraer logo, fechas ni
+# números; con "corte_marca" = N en FUENTES deja de recorrer la página tras N
+# filas conocidas seguidas (fuentes que listan lo más nuevo primero).
+# --forzar o SCRAPER_PARSEO_COMPLETO=1 (--parseo-completo) parsean todo.
+MARCAS_ESTADO = "marcas.json"
+MARCA_MAX = 1000
+PARSEO_COMPLETO = os.getenv("SCRAPER_PARSEO_COMPLETO", "") == "1"
+
+class MarcaAgua:
+    """Marca de agua de una fuente durante un parseo."""
+
+    def __init__(self, conocidas=(), corte: int = 0, completo: bool = False):
+        self.previas = list(conocidas)
+        self.conocidas = set(self.previas)
+        self.corte = corte
+        self.completo = completo
+        self.vistas = []
+        self.saltadas = 0
+        self.cortado = False
+        self._seguidas = 0
+
+    def ver(self, *textos) -> bool:
+        """Registra el bloque; True si ya se conocía y se puede saltar."""
+        ident = hashlib.sha1("\x1f".join(textos).encode("utf-8")).hexdigest()[:16]
+        self.vistas.append(ident)
+        if ident not in self.conocidas:
+            self._seguidas = 0
+            return False
+        self.saltadas += 1
+        self._seguidas += 1
+        if self.completo:
+            return False
+        if self.corte and self._seguidas >= self.corte:
+            self.cortado = True
+        return True
+
+    def siguiente(self) -> list:
+        """Marca a guardar: lo visto y, si se cortó, lo conocido que quedó sin recorrer."""
+        vistas = list(dict.fromkeys(self.vistas))
+        if self.cortado:
+            ya = set(vistas)
+            vistas += [i for i in self.previas if i not in ya]
+        return vistas[:MARCA_MAX]
+
+    def resumen(self, nombre: str):
+        if not self.saltadas:
+            return
+        if self.completo:
+            print(f"🔎 {nombre}: parseo completo; {self.saltadas} filas ya conocidas por la marca")
+        else:
+            print(
+                f"⏭️ {nombre}: {self.saltadas} filas conocidas saltadas"
+                + (" (corte: el resto es anterior)" if self.cortado else "")
             )
-            if response:
-                print(f"🌐 loteriasdominicanas.com HTTP {response.status}")
 
-            page.wait_for_selector("div.game-info.p-2", timeout=25000)
-            html = page.content()
+def _marcas_guardadas() -> dict:
+    """marcas.json; si falta, está corrupto o no tiene la forma esperada, sin marcas."""
+    marcas = _leer_estado(MARCAS_ESTADO, {})
+    if not isinstance(marcas, dict):
+        return {}
+    return {k: v for k, v in marcas.items() if isinstance(v, list)}
 
-            if len(html) < 1000:
-                raise RuntimeError(
-                    f"HTML demasiado pequeño en loteriasdominicanas.com: {len(html)} bytes"
-                )
+def _marca_fuente(clave: str, forzar: bool = False) -> MarcaAgua:
+    previas = [] if forzar else _marcas_guardadas().get(clave, [])
+    return MarcaAgua(previas, FUENTES[clave].get("corte_marca", 0), completo=forzar or PARSEO_COMPLETO)
 
-            soup = BeautifulSoup(html, "html.parser")
-            juegos = soup.select("div.game-info.p-2")
-            print(f"📄 LoteriasDominicanas: {len(juegos)} bloques encontrados")
+def parsear_loterias_dominicanas(html: str, soup=None, marca: MarcaAgua = None) -> list:
+    """
+    Extrae los resultados del HTML de loteriasdominicanas.com.
+    `soup` permite reutilizar un árbol ya construido con arbol_loterias_dominicanas().
+    Con `marca` se saltan los bloques que ya se procesaron en una corrida anterior.
+    """
+    resultados = []
 
-            errores = 0
+    if len(html) < 1000:
+        raise RuntimeError(
+            f"HTML demasiado pequeño en loteriasdominicanas.com: {len(html)} bytes"
+        )
 
-            for indice, juego in enumerate(juegos):
-                try:
-                    fecha_tag = juego.select_one(".session-date")
-                    nombre_tag = juego.select_one(".game-title span")
-                    numeros_tag = juego.find_next_sibling("div", class_="game-scores")
-                    logo_div = juego.select_one("div.game-logo")
-
-                    img_url = ""
-                    if logo_div:
-                        img_tag = logo_div.find("img")
-                        if img_tag:
-                            img_url = img_tag.get("src", "") or img_tag.get("data-src", "")
-
-                    if img_url.startswith("/"):
-                        img_url = "https://loteriasdominicanas.com" + img_url
-                    img_url = sanitizar_logo(img_url)
-
-                    if not (fecha_tag and nombre_tag and numeros_tag):
-                        continue
+    if soup is None:
+        soup = arbol_loterias_dominicanas(html)
+    juegos = soup.select("div.game-info.p-2")
+    print(f"📄 LoteriasDominicanas: {len(juegos)} bloques encontrados")
 
-                    fecha = fecha_tag.get_text(" ", strip=True)
-                    fecha_normalizada = normaliza_fecha(fecha)
-                    nombre = nombre_tag.get_text(" ", strip=True)
-                    numeros = [
-                        n.get_text(strip=True)
-                        for n in numeros_tag.select("span.score")
-                        if n.get_text(strip=True)
-                    ]
+    errores = 0
 
-                    if not nombre or not numeros:
-                        continue
+    for indice, juego in enumerate(juegos):
+        try:
+            numeros_tag = juego.find_next_sibling("div", class_="game-scores")
+            if marca is not None and marca.ver(
+                juego.get_text(" ", strip=True),
+                numeros_tag.get_text(" ", strip=True) if numeros_tag else "",
+            ):
+                if marca.cortado:
+                    break
+                continue
 
-                    resultados.append({
-                        "fuente": "loteriasdominicanas.com",
-                        "loteria": nombre,
-                        "img": img_url,
-                        "numeros": numeros,
-                        "fecha_original": fecha,
-                        "fecha": fecha_normalizada,
-                        "hora": None,  # esta fuente no trae hora
-                        "hora_scrapeo": datetime.now(TZ_RD).strftime("%Y-%m-%d %H:%M:%S")
-                    })
+            fecha_tag = juego.select_one(".session-date")
+            nombre_tag = juego.select_one(".game-title span")
+            logo_div = juego.select_one("div.game-logo")
 
-                except Exception as e:
-                    errores += 1
-                    print(
-                        f"⚠️ Error procesando juego LoteriasDominicanas "
-                        f"#{indice}: {repr(e)}"
-                    )
+            img_url = ""
+            if logo_div:
+                img_tag = logo_div.find("img")
+                if img_tag:
+                    img_url = img_tag.get("src", "") or img_tag.get("data-src", "")
+
+            if img_url.startswith("/"):
+                img_url = "https://loteriasdominicanas.com" + img_url
+            img_url = sanitizar_logo(img_url)
 
-            browser.close()
+            if not (fecha_tag and nombre_tag and numeros_tag):
+                continue
 
+            fecha = fecha_tag.get_text(" ", strip=True)
+            fecha_normalizada = normaliza_fecha(fecha)
+            nombre = nombre_tag.get_text(" ", strip=True)
+            numeros = [
+                n.get_text(strip=True)
+                for n in numeros_tag.select("span.score")
+                if n.get_text(strip=True)
+            ]
+
+            if not nombre or not numeros:
+                continue
+
+            resultados.append({
+                "fuente": "loteriasdominicanas.com",
+                "loteria": nombre,
+                "img": img_url,
+                "numeros": numeros,
+                "fecha_original": fecha,
+                "fecha": fecha_normalizada,
+                "hora": None,  # esta fuente no trae hora
+                "hora_scrapeo": datetime.now(TZ_RD).strftime("%Y-%m-%d %H:%M:%S")
+            })
+
+        except Exception as e:
+            errores += 1
             print(
-                f"✅ LoteriasDominicanas: {len(resultados)} resultados válidos"
-                + (f" | {errores} errores de fila" if errores else "")
+                f"⚠️ Error procesando juego LoteriasDominicanas "
+                f"#{indice}: {repr(e)}"
             )
 
-    except Exception as e:
-        print(f"❌ Error loteriasdominicanas.com: {repr(e)}")
+    if marca is not None:
+        marca.resumen("LoteriasDominicanas")
+    print(
+        f"✅ LoteriasDominicanas: {len(resultados)} resultados válidos"
+        + (f" | {errores} errores de fila" if errores else "")
+    )
 
     return resultados
 
-def scrapear_tusnumerosrd():
+def parsear_tusnumerosrd(html: str, soup=None, marca: MarcaAgua = None) -> list:
+    """
+    Extrae los resultados del HTML de tusnumerosrd.com.
+    `soup` permite reutilizar un árbol ya construido con arbol_tusnumerosrd().
+    Con `marca` se saltan las filas ya procesadas y, como la tabla va de lo
+    más nuevo a lo más viejo, se corta al encontrar varias conocidas seguidas.
+    """
     resultados = []
 
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=True,
-                args=["--no-sandbox", "--disable-dev-shm-usage"]
-            )
-            page = browser.new_page(
-                viewport={"width": 1280, "height": 1600},
-                user_agent=(
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/131.0.0.0 Safari/537.36"
+    print(f"📄 TusNumerosRD HTML: {len(html)} bytes")
+
+    if len(html) < 1000:
+        raise RuntimeError(
+            f"HTML demasiado pequeño en tusnumerosrd.com: {len(html)} bytes"
+        )
+
+    if soup is None:
+        soup = arbol_tusnumerosrd(html)
+    filas = soup.select("tr")
+    print(f"📊 TusNumerosRD: {len(filas)} filas encontradas")
+
+    errores = 0
+
+    for indice, fila in enumerate(filas):
+        try:
+            # Nombre: selector original + fallback simple.
+            nombre_tag = fila.select_one("h6.mb-0") or fila.select_one("h6")
+            if not nombre_tag:
+                continue
+
+            nombre = nombre_tag.get_text(" ", strip=True)
+            if not nombre:
+                continue
+
+            if marca is not None and marca.ver(fila.get_text(" ", strip=True)):
+                if marca.cortado:
+                    break
+                continue
+
+            # Logo: conserva src original y soporta lazy-loading.
+            img_tag = fila.select_one("img")
+            img_url = ""
+            if img_tag:
+                img_url = img_tag.get("src", "") or img_tag.get("data-src", "")
+
+            if img_url.startswith("/"):
+                img_url = "https://www.tusnumerosrd.com" + img_url
+            img_url = sanitizar_logo(img_url)
+
+            # Números: selector original exacto.
+            numeros = [
+                n.get_text(strip=True)
+                for n in fila.select("div.badge.badge-primary.badge-dot")
+                if n.get_text(strip=True)
+            ]
+
+            # Fallback si la web cambia clases pero conserva .badge.
+            if not numeros:
+                candidatos = []
+                for badge in fila.select(".badge"):
+                    valor = badge.get_text(" ", strip=True)
+                    if re.fullmatch(r"\d{1,3}", valor):
+                        candidatos.append(valor)
+                numeros = candidatos
+
+            # Fecha:
+            # El HTML actual tiene span.table-inner-text anidado.
+            # Tomamos el último candidato válido para evitar depender
+            # del span exterior.
+            fecha = ""
+            fecha_tags = fila.select("span.table-inner-text")
+            for tag in reversed(fecha_tags):
+                candidato = re.sub(
+                    r"\s+",
+                    " ",
+                    tag.get_text(" ", strip=True).replace("\xa0", " ")
+                ).strip()
+                if re.search(
+                    r"\b\d{1,2}\s+"
+                    r"(?:enero|febrero|marzo|abril|mayo|junio|julio|"
+                    r"agosto|septiembre|setiembre|octubre|noviembre|diciembre)\b",
+                    candidato,
+                    re.IGNORECASE
+                ):
+                    fecha = candidato
+                    break
+
+            # Fallback: buscar la fecha en el texto de las celdas.
+            todas_celdas = fila.find_all("td")
+            textos_celdas = [
+                re.sub(
+                    r"\s+",
+                    " ",
+                    td.get_text(" ", strip=True).replace("\xa0", " ")
+                ).strip()
+                for td in todas_celdas
+            ]
+
+            if not fecha:
+                for texto in textos_celdas:
+                    m_fecha = re.search(
+                        r"\b\d{1,2}\s+"
+                        r"(?:enero|febrero|marzo|abril|mayo|junio|julio|"
+                        r"agosto|septiembre|setiembre|octubre|noviembre|diciembre)"
+                        r"(?:\s+\d{4})?\b",
+                        texto,
+                        re.IGNORECASE
+                    )
+                    if m_fecha:
+                        fecha = m_fecha.group(0)
+                        break
+
+            fecha_normalizada = normaliza_fecha(fecha)
+
+            # Hora:
+            # En el HTML actual es la última celda: <td>7:25PM</td>.
+            # Se busca por patrón para que siga funcionando aunque
+            # cambien las clases CSS.
+            hora = None
+            for texto in reversed(textos_celdas):
+                m_hora = re.search(
+                    r"\b(\d{1,2}):(\d{2})\s*([AaPp][Mm])\b",
+                    texto
                 )
-            )
+                if m_hora:
+                    hora = (
+                        f"{int(m_hora.group(1))}:"
+                        f"{m_hora.group(2)}"
+                        f"{m_hora.group(3).upper()}"
+                    )
+                    break
 
-            print("🌐 Abriendo tusnumerosrd.com...")
+            # Solo publicar filas realmente utilizables.
+            if not numeros:
+                print(f"⚠️ {nombre}: sin números; fila ignorada")
+                continue
 
-            response = page.goto(
-                "https://www.tusnumerosrd.com/resultados.php",
-                wait_until="domcontentloaded",
-                timeout=60000
+            if not fecha_normalizada:
+                print(f"⚠️ {nombre}: sin fecha válida; fila ignorada")
+                continue
+
+            resultados.append({
+                "fuente": "tusnumerosrd.com",
+                "loteria": nombre,
+                "img": img_url,
+                "numeros": numeros,
+                "fecha_original": fecha,
+                "fecha": fecha_normalizada,
+                "hora": hora,
+                "hora_scrapeo": datetime.now(TZ_RD).strftime("%Y-%m-%d %H:%M:%S")
+            })
+
+        except Exception as e:
+            errores += 1
+            print(
+                f"⚠️ Error procesando fila TusNumerosRD "
+                f"#{indice}: {repr(e)}"
             )
 
-            if response:
-                print(f"🌐 tusnumerosrd.com HTTP {response.status}")
+    if marca is not None:
+        marca.resumen("TusNumerosRD")
+    print(
+        f"✅ TusNumerosRD: {len(resultados)} resultados válidos"
+        + (f" | {errores} errores de fila" if errores else "")
+    )
 
-            # Espera el contenido que realmente necesitamos, no un tiempo fijo solamente.
-            try:
-                page.wait_for_selector("h6.mb-0", timeout=25000)
-            except Exception:
-                # Dejamos un pequeño margen por si el sitio termina de pintar tarde.
-                page.wait_for_timeout(3000)
+    # Diagnóstico útil sin alterar el JSON público.
+    for r in resultados[:5]:
+        print(
+            "   ↳ "
+            f"{r.get('loteria')} | "
+            f"{r.get('numeros')} | "
+            f"{r.get('fecha_original')} -> {r.get('fecha')} | "
+            f"{r.get('hora')}"
+        )
 
-            html = page.content()
-            print(f"📄 TusNumerosRD HTML: {len(html)} bytes")
+    return resultados
 
-            if len(html) < 1000:
-                raise RuntimeError(
-                    f"HTML demasiado pequeño en tusnumerosrd.com: {len(html)} bytes"
-                )
+# Cada fuente conserva sus propios tiempos de espera. "selector_obligatorio"
+# indica si la ausencia del selector invalida la fuente o si basta con darle
+# un margen extra para que termine de pintar. "selectores_http" son los nodos
+# que deben venir en el HTML del servidor para evitar abrir Chromium y
+# "fragmento" delimita la parte de la página que se usa como huella; "arbol"
+# construye el árbol acotado que comparten la huella y el parseo.
+# Política de recursos en Playwright (route interception). SCRAPER_RECURSOS=todo
+# la desactiva y además registra cuántos bytes baja la página completa, que
+# sirve de línea base para estimar el ahorro.
+RECURSOS_MODO = os.getenv("SCRAPER_RECURSOS", "politica")
+RECURSOS_BLOQUEADOS = ["image", "media", "font", "stylesheet"]
+RECURSOS_ESTADO = "recursos.json"
 
-            soup = BeautifulSoup(html, "html.parser")
-            filas = soup.select("tr")
-            print(f"📊 TusNumerosRD: {len(filas)} filas encontradas")
+FUENTES = {
+    "loteriasdominicanas": {
+        "dominio": "loteriasdominicanas.com",
+        "url": "https://loteriasdominicanas.com/pagina/ultimos-resultados",
+        # Página de un día pasado para --backfill ({fecha} es un date). Sin
+        # verificar contra el sitio: si ignora ?date= devuelve los de hoy, que
+        # el backfill descarta por fuera del rango y lo avisa.
+        "url_fecha": "https://loteriasdominicanas.com/pagina/ultimos-resultados?date={fecha:%d-%m-%Y}",
+        "selector": "div.game-info.p-2",
+        "selector_obligatorio": True,
+        "selectores_http": ["div.game-info.p-2", "div.game-scores span.score"],
+        "fragmento": "div.game-info.p-2, div.game-scores",
+        "arbol": arbol_loterias_dominicanas,
+        "timeout_http": 20,
+        "timeout_goto": 60000,
+        "timeout_selector": 25000,
+        "timeout_total": 120,
+        "parser": parsear_loterias_dominicanas,
+        # Solo hace falta el texto y el src de los logos: nada de imágenes,
+        # fuentes, CSS ni scripts de terceros (anuncios/analítica).
+        "recursos": {"bloquear_tipos": RECURSOS_BLOQUEADOS, "dominios": []},
+    },
+    "tusnumerosrd": {
+        "dominio": "tusnumerosrd.com",
+        "url": "https://www.tusnumerosrd.com/resultados.php",
+        # Sin página por fecha conocida: en --backfill solo con --url o
+        # SCRAPER_BACKFILL_URL_TUSNUMEROSRD.
+        "url_fecha": None,
+        "selector": "h6.mb-0",
+        "selector_obligatorio": False,
+        "selectores_http": ["h6.mb-0", "div.badge.badge-primary.badge-dot"],
+        "fragmento": "tr",
+        "arbol": arbol_tusnumerosrd,
+        "timeout_http": 20,
+        "timeout_goto": 60000,
+        "timeout_selector": 25000,
+        "timeout_total": 120,
+        "parser": parsear_tusnumerosrd,
+        # Tabla de lo más nuevo a lo más viejo: tras 5 filas conocidas seguidas
+        # el resto ya se procesó. loteriasdominicanas muestra un bloque por
+        # lotería (no cronológico), así que ahí solo se saltan bloques.
+        "corte_marca": 5,
+        "recursos": {"bloquear_tipos": RECURSOS_BLOQUEADOS, "dominios": []},
+    },
+}
 
-            errores = 0
+# === Estado entre corridas (el workflow lo restaura con actions/cache) ===
+STATE_DIR = os.getenv("SCRAPER_STATE_DIR", ".scraper_state")
 
-            for indice, fila in enumerate(filas):
-                try:
-                    # Nombre: selector original + fallback simple.
-                    nombre_tag = fila.select_one("h6.mb-0") or fila.select_one("h6")
-                    if not nombre_tag:
-                        continue
+def _leer_estado(nombre: str, defecto=None):
+    try:
+        with open(os.path.join(STATE_DIR, nombre), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return defecto
 
-                    nombre = nombre_tag.get_text(" ", strip=True)
-                    if not nombre:
-                        continue
+def _guardar_estado(nombre: str, data):
+    """Escritura atómica; el estado es solo una optimización, nunca aborta la corrida."""
+    path = os.path.join(STATE_DIR, nombre)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar estado {nombre}: {repr(e)}")
 
-                    # Logo: conserva src original y soporta lazy-loading.
-                    img_tag = fila.select_one("img")
-                    img_url = ""
-                    if img_tag:
-                        img_url = img_tag.get("src", "") or img_tag.get("data-src", "")
-
-                    if img_url.startswith("/"):
-                        img_url = "https://www.tusnumerosrd.com" + img_url
-                    img_url = sanitizar_logo(img_url)
-
-                    # Números: selector original exacto.
-                    numeros = [
-                        n.get_text(strip=True)
-                        for n in fila.select("div.badge.badge-primary.badge-dot")
-                        if n.get_text(strip=True)
-                    ]
-
-                    # Fallback si la web cambia clases pero conserva .badge.
-                    if not numeros:
-                        candidatos = []
-                        for badge in fila.select(".badge"):
-                            valor = badge.get_text(" ", strip=True)
-                            if re.fullmatch(r"\d{1,3}", valor):
-                                candidatos.append(valor)
-                        numeros = candidatos
-
-                    # Fecha:
-                    # El HTML actual tiene span.table-inner-text anidado.
-                    # Tomamos el último candidato válido para evitar depender
-                    # del span exterior.
-                    fecha = ""
-                    fecha_tags = fila.select("span.table-inner-text")
-                    for tag in reversed(fecha_tags):
-                        candidato = re.sub(
-                            r"\s+",
-                            " ",
-                            tag.get_text(" ", strip=True).replace("\xa0", " ")
-                        ).strip()
-                        if re.search(
-                            r"\b\d{1,2}\s+"
-                            r"(?:enero|febrero|marzo|abril|mayo|junio|julio|"
-                            r"agosto|septiembre|setiembre|octubre|noviembre|diciembre)\b",
-                            candidato,
-                            re.IGNORECASE
-                        ):
-                            fecha = candidato
-                            break
-
-                    # Fallback: buscar la fecha en el texto de las celdas.
-                    todas_celdas = fila.find_all("td")
-                    textos_celdas = [
-                        re.sub(
-                            r"\s+",
-                            " ",
-                            td.get_text(" ", strip=True).replace("\xa0", " ")
-                        ).strip()
-                        for td in todas_celdas
-                    ]
-
-                    if not fecha:
-                        for texto in textos_celdas:
-                            m_fecha = re.search(
-                                r"\b\d{1,2}\s+"
-                                r"(?:enero|febrero|marzo|abril|mayo|junio|julio|"
-                                r"agosto|septiembre|setiembre|octubre|noviembre|diciembre)"
-                                r"(?:\s+\d{4})?\b",
-                                texto,
-                                re.IGNORECASE
-                            )
-                            if m_fecha:
-                                fecha = m_fecha.group(0)
-                                break
-
-                    fecha_normalizada = normaliza_fecha(fecha)
-
-                    # Hora:
-                    # En el HTML actual es la última celda: <td>7:25PM</td>.
-                    # Se busca por patrón para que siga funcionando aunque
-                    # cambien las clases CSS.
-                    hora = None
-                    for texto in reversed(textos_celdas):
-                        m_hora = re.search(
-                            r"\b(\d{1,2}):(\d{2})\s*([AaPp][Mm])\b",
-                            texto
-                        )
-                        if m_hora:
-                            hora = (
-                                f"{int(m_hora.group(1))}:"
-                                f"{m_hora.group(2)}"
-                                f"{m_hora.group(3).upper()}"
-                            )
-                            break
-
-                    # Solo publicar filas realmente utilizables.
-                    if not numeros:
-                        print(f"⚠️ {nombre}: sin números; fila ignorada")
-                        continue
+# ---------- Telemetría por etapa ----------
+# Cada corrida deja en docs/status.json un registro con la duración de cada
+# etapa (navegador, goto, selector, parseo, filtro, dedupe, escritura, envíos
+# FCM), tamaños, filas, errores y la ruta usada por cada fuente, más una
+# ventana de las últimas corridas para ver tendencias de latencia.
+STATUS_PATH = os.getenv("SCRAPER_STATUS_PATH", os.path.join("docs", "status.json"))
+STATUS_VENTANA = 50
+STATUS_ALERTA_FACTOR = 2.0       # latencia > factor × mediana de la ventana
+STATUS_ALERTA_MIN_MS = 5000
 
-                    if not fecha_normalizada:
-                        print(f"⚠️ {nombre}: sin fecha válida; fila ignorada")
-                        continue
+class Telemetria:
+    """Acumula etapas y datos por fuente de una corrida; segura entre hilos."""
 
-                    resultados.append({
-                        "fuente": "tusnumerosrd.com",
-                        "loteria": nombre,
-                        "img": img_url,
-                        "numeros": numeros,
-                        "fecha_original": fecha,
-                        "fecha": fecha_normalizada,
-                        "hora": hora,
-                        "hora_scrapeo": datetime.now(TZ_RD).strftime("%Y-%m-%d %H:%M:%S")
-                    })
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.iniciar()
 
-                except Exception as e:
-                    errores += 1
-                    print(
-                        f"⚠️ Error procesando fila TusNumerosRD "
-                        f"#{indice}: {repr(e)}"
+    def iniciar(self):
+        with self._lock:
+            self.inicio = datetime.now(timezone.utc)
+            self._t0 = time.perf_counter()
+            self.etapas = []
+            self.fuentes = {}
+            self.contadores = {}
+
+    def registrar(self, nombre: str, ms: float, **campos):
+        with self._lock:
+            self.etapas.append({"etapa": nombre, "ms": round(ms, 1), **campos})
+            if campos.get("error"):
+                self.contadores["errores"] = self.contadores.get("errores", 0) + 1
+
+    @contextlib.contextmanager
+    def etapa(self, nombre: str, **campos):
+        """Mide el bloque; el bloque puede completar `campos` (bytes, filas...)."""
+        inicio = time.perf_counter()
+        try:
+            yield campos
+        except BaseException as e:
+            campos["error"] = repr(e)[:200]
+            raise
+        finally:
+            self.registrar(nombre, (time.perf_counter() - inicio) * 1000, **campos)
+
+    def fuente(self, clave: str, **campos):
+        with self._lock:
+            self.fuentes.setdefault(clave, {}).update(campos)
+
+    def contar(self, nombre: str, n: int = 1):
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def registro(self, estado: str) -> dict:
+        with self._lock:
+            return {
+                "inicio": self.inicio.isoformat(),
+                "ms": round((time.perf_counter() - self._t0) * 1000, 1),
+                "estado": estado,
+                "fuentes": dict(self.fuentes),
+                "contadores": dict(self.contadores),
+                "etapas": list(self.etapas),
+            }
+
+    def publicar(self, estado: str, path: str = STATUS_PATH, mensaje: str = None) -> dict:
+        """Escribe el registro de la corrida y la ventana reciente en status.json."""
+        registro = self.registro(estado)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                previo = json.load(f)
+        except (OSError, ValueError):
+            previo = {}
+        recientes = [r for r in (previo.get("recientes") or []) if isinstance(r, dict)]
+        recientes.append({
+            "inicio": registro["inicio"],
+            "ms": registro["ms"],
+            "estado": estado,
+            "errores": registro["contadores"].get("errores", 0),
+            "fuentes": {
+                c: {k: f.get(k) for k in ("ruta", "ms", "filas")}
+                for c, f in registro["fuentes"].items()
+            },
+        })
+        recientes = recientes[-STATUS_VENTANA:]
+
+        alertas = []
+        for clave, datos in registro["fuentes"].items():
+            historial = [
+                r["fuentes"][clave]["ms"] for r in recientes[:-1]
+                if (r.get("fuentes") or {}).get(clave, {}).get("ms") is not None
+            ]
+            actual = datos.get("ms")
+            if len(historial) >= 5 and actual is not None:
+                mediana = _percentil(historial, 0.5)
+                if actual > max(STATUS_ALERTA_MIN_MS, STATUS_ALERTA_FACTOR * mediana):
+                    alertas.append(f"{clave}: {actual:.0f} ms (mediana {mediana:.0f} ms)")
+        for alerta in alertas:
+            print(f"🐢 Latencia en alza: {alerta}")
+
+        status = {
+            "ok": estado != "error",
+            "message": mensaje or f"{estado}: {registro['ms'] / 1000:.1f}s",
+            "generated_at_utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "alertas": alertas,
+            "ultima": registro,
+            "recientes": recientes,
+        }
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(status, f, indent=2, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"⚠️ No se pudo escribir {path}: {repr(e)}")
+        return status
+
+TELEMETRIA = Telemetria()
+
+# ---------- Descarga HTTP directa (sin navegador) ----------
+_HTTP_SESSION = None
+
+def _http_session():
+    """Sesión compartida con pool keep-alive para todas las fuentes."""
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        s = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=len(FUENTES), pool_maxsize=8)
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        s.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "es-DO,es;q=0.9",
+        })
+        _HTTP_SESSION = s
+    return _HTTP_SESSION
+
+# ---------- Huellas de contenido ----------
+HUELLAS_ESTADO = "huellas.json"
+ESTADO_SIN_CAMBIOS = "sin_cambios"
+ESTADO_ACTUALIZADO = "actualizado"
+
+def _analizar_html(clave: str, html: str):
+    """
+    Un solo árbol acotado para validar selectores, calcular la huella del
+    fragmento de resultados y luego parsear. Solo cuenta el texto: los
+    anuncios y atributos dinámicos de la página no cambian la huella.
+    Devuelve (selectores_faltantes, huella, soup).
+    """
+    cfg = FUENTES[clave]
+    soup = cfg["arbol"](html)
+    faltan = [sel for sel in cfg["selectores_http"] if soup.select_one(sel) is None]
+
+    h = hashlib.sha256()
+    for nodo in soup.select(cfg["fragmento"]):
+        h.update(nodo.get_text(" ", strip=True).encode("utf-8"))
+        h.update(b"\n")
+    return faltan, h.hexdigest(), soup
+
+def _salida_fuente(ruta: str, motivo: str, huella=None, resultados=None, sin_cambios=False,
+                   recursos=None, marca=None, saltadas=0) -> dict:
+    return {
+        "resultados": resultados or [],
+        "ruta": ruta,
+        "motivo": motivo,
+        "huella": huella,
+        "sin_cambios": sin_cambios,
+        "recursos": recursos,
+        "marca": marca,
+        "saltadas": saltadas,
+    }
+
+def _intentar_http(clave: str, huella_previa=None, forzar=False):
+    """
+    GET condicional (ETag / If-Modified-Since) y parseo directo del HTML del servidor.
+    Devuelve (salida, motivo); salida es None cuando hay que usar Playwright.
+    """
+    cfg = FUENTES[clave]
+    cache_nombre = f"http/{clave}.json"
+    cache = _leer_estado(cache_nombre, {}) or {}
+
+    # Solo se piden validadores si tenemos el cuerpo para reutilizar ante un 304.
+    headers = {}
+    if cache.get("html"):
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+
+    try:
+        with TELEMETRIA.etapa("http_get", fuente=clave) as t:
+            r = _http_session().get(cfg["url"], headers=headers, timeout=cfg["timeout_http"])
+            t.update(status=r.status_code, bytes=len(r.content))
+    except Exception as e:
+        return None, f"GET falló: {repr(e)}"
+
+    if r.status_code == 304 and cache.get("html"):
+        html = cache["html"]
+        origen = "304 no modificado, HTML en caché"
+    elif r.status_code == 200:
+        if "charset" not in r.headers.get("Content-Type", "").lower():
+            r.encoding = r.apparent_encoding
+        html = r.text
+        origen = f"HTTP 200, {len(html)} bytes"
+    else:
+        return None, f"HTTP {r.status_code}"
+
+    with TELEMETRIA.etapa("huella", fuente=clave, bytes=len(html)):
+        faltan, huella, soup = _analizar_html(clave, html)
+    if faltan:
+        return None, f"{origen}; faltan selectores {faltan}"
+
+    if huella == huella_previa and not forzar:
+        salida = _salida_fuente("http", origen, huella=huella, sin_cambios=True)
+    else:
+        marca = _marca_fuente(clave, forzar)
+        with TELEMETRIA.etapa("parseo", fuente=clave, ruta="http") as t:
+            resultados = cfg["parser"](html, soup, marca)
+            t.update(filas=len(resultados), saltadas=marca.saltadas)
+        if resultados:
+            salida = _salida_fuente("http", origen, huella=huella, resultados=resultados,
+                                    marca=marca.siguiente(), saltadas=marca.saltadas)
+        elif marca.saltadas:
+            # La página cambió, pero solo en filas que ya se procesaron.
+            salida = _salida_fuente("http", f"{origen}; solo filas conocidas", huella=huella,
+                                    sin_cambios=True, marca=marca.siguiente(),
+                                    saltadas=marca.saltadas)
+        else:
+            return None, f"{origen}; selectores presentes pero 0 resultados"
+
+    if r.status_code == 200:
+        _guardar_estado(cache_nombre, {
+            "etag": r.headers.get("ETag"),
+            "last_modified": r.headers.get("Last-Modified"),
+            "html": html,
+        })
+
+    return salida, origen
+
+# ---------- Fallback con Playwright ----------
+class _PoliticaRecursos:
+    """
+    Handler de context.route(): aborta los tipos de recurso bloqueados y los
+    dominios de terceros no permitidos, y cuenta lo bloqueado/permitido.
+    """
+
+    def __init__(self, clave: str):
+        cfg = FUENTES[clave].get("recursos") or {}
+        self.clave = clave
+        self.bloquear_tipos = set(cfg.get("bloquear_tipos", RECURSOS_BLOQUEADOS))
+        self.dominios = {FUENTES[clave]["dominio"], *cfg.get("dominios", [])}
+        self._medidas = []
+        self.reiniciar()
+
+    def reiniciar(self):
+        """Contadores en cero y política según RECURSOS_MODO (una página reutilizada vuelve a bloquear)."""
+        for medida in self._medidas:
+            medida.cancel()
+        self.activa = RECURSOS_MODO != "todo"
+        self.bloqueadas = {}
+        self.permitidas = 0
+        self.bytes = 0
+        self._medidas = []
+
+    def _permitido(self, url: str) -> bool:
+        host = urlsplit(url).hostname or ""
+        return any(host == d or host.endswith("." + d) for d in self.dominios)
+
+    async def manejar(self, route):
+        request = route.request
+        if self.activa:
+            motivo = None
+            if request.resource_type in self.bloquear_tipos:
+                motivo = request.resource_type
+            elif not self._permitido(request.url):
+                motivo = "tercero"
+            if motivo:
+                self.bloqueadas[motivo] = self.bloqueadas.get(motivo, 0) + 1
+                await route.abort()
+                return
+        self.permitidas += 1
+        await route.continue_()
+
+    def al_terminar(self, request):
+        self._medidas.append(asyncio.ensure_future(self._medir(request)))
+
+    async def _medir(self, request):
+        try:
+            sizes = await request.sizes()
+            self.bytes += sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+        except Exception:
+            pass
+
+    async def resumen(self) -> dict:
+        if self._medidas:
+            await asyncio.wait(self._medidas, timeout=5)
+        estado = _leer_estado(RECURSOS_ESTADO, {}) or {}
+        # La línea base es solo una carga completa pedida con SCRAPER_RECURSOS=todo;
+        # la recarga sin política de _scrapear_fuente no la pisa.
+        if RECURSOS_MODO == "todo":
+            estado[self.clave] = {"bytes_sin_politica": self.bytes}
+            _guardar_estado(RECURSOS_ESTADO, estado)
+        base = (estado.get(self.clave) or {}).get("bytes_sin_politica")
+        return {
+            "politica": self.activa,
+            "bloqueadas": dict(sorted(self.bloqueadas.items())),
+            "permitidas": self.permitidas,
+            "bytes": self.bytes,
+            "ahorro_estimado": max(0, base - self.bytes) if base and self.activa else None,
+        }
+
+def _imprimir_recursos(dominio: str, r: dict):
+    bloqueadas = sum(r["bloqueadas"].values())
+    detalle = ", ".join(f"{k} {v}" for k, v in r["bloqueadas"].items())
+    linea = (
+        f"🧱 {dominio}: {bloqueadas} bloqueadas" + (f" ({detalle})" if detalle else "")
+        + f" | {r['permitidas']} permitidas, {r['bytes'] / 1024:.0f} KB"
+    )
+    if r["ahorro_estimado"] is not None:
+        linea += f" | ahorro estimado {r['ahorro_estimado'] / 1024:.0f} KB"
+    elif RECURSOS_MODO == "todo":
+        linea += " | sin política (línea base registrada)"
+    elif not r["politica"]:
+        linea += " | sin política (recarga de respaldo)"
+    print(linea)
+
+class _NavegadorCompartido:
+    """
+    Arranca Playwright/Chromium solo la primera vez que una fuente lo necesita.
+    Con persistente=True (modo --watch) cada fuente conserva su contexto y su
+    página abiertos entre sondeos, hasta que se recicla el navegador.
+    """
+
+    def __init__(self, persistente: bool = False):
+        self.persistente = persistente
+        self._playwright = None
+        self._browser = None
+        self._paginas = {}
+        self._lock = asyncio.Lock()
+
+    async def obtener(self):
+        async with self._lock:
+            if self._browser is None:
+                print("🚀 Lanzando Chromium compartido...")
+                with TELEMETRIA.etapa("browser_launch"):
+                    self._playwright = await async_playwright().start()
+                    self._browser = await self._playwright.chromium.launch(
+                        headless=True, args=CHROMIUM_ARGS
                     )
+        return self._browser
 
-            browser.close()
+    @property
+    def activo(self) -> bool:
+        return self._browser is not None
 
-            print(
-                f"✅ TusNumerosRD: {len(resultados)} resultados válidos"
-                + (f" | {errores} errores de fila" if errores else "")
+    async def pagina(self, clave: str):
+        """(context, page, política) para la fuente; reutiliza la abierta si es persistente."""
+        if self.persistente and clave in self._paginas:
+            context, page, politica = self._paginas[clave]
+            if not page.is_closed():
+                politica.reiniciar()
+                return context, page, politica
+            await self.descartar_pagina(clave)
+
+        browser = await self.obtener()
+        context = await browser.new_context(
+            viewport={"width": 1280, "height": 1600},
+            user_agent=USER_AGENT
+        )
+        politica = _PoliticaRecursos(clave)
+        await context.route("**/*", politica.manejar)
+        page = await context.new_page()
+        page.on("requestfinished", politica.al_terminar)
+        if self.persistente:
+            self._paginas[clave] = (context, page, politica)
+        return context, page, politica
+
+    async def descartar_pagina(self, clave: str):
+        context, _, _ = self._paginas.pop(clave, (None, None, None))
+        if context is not None:
+            try:
+                await context.close()
+            except Exception:
+                pass
+
+    async def cerrar(self):
+        for clave in list(self._paginas):
+            await self.descartar_pagina(clave)
+        for cierre in (
+            self._browser.close if self._browser else None,
+            self._playwright.stop if self._playwright else None,
+        ):
+            if cierre:
+                try:
+                    await cierre()
+                except Exception:
+                    pass
+        self._browser = None
+        self._playwright = None
+
+async def _scrapear_fuente(navegador: _NavegadorCompartido, clave: str, motivo: str,
+                           huella_previa=None, forzar=False) -> dict:
+    """Carga la página de la fuente en su propio contexto y la parsea."""
+    cfg = FUENTES[clave]
+    context, page, politica = await navegador.pagina(clave)
+    ok = False
+    try:
+        print(f"🌐 Abriendo {cfg['dominio']}...")
+
+        with TELEMETRIA.etapa("goto", fuente=clave) as t:
+            response = await page.goto(
+                cfg["url"],
+                wait_until="domcontentloaded",
+                timeout=cfg["timeout_goto"]
             )
+            t["status"] = response.status if response else None
+        if response:
+            print(f"🌐 {cfg['dominio']} HTTP {response.status}")
 
-            # Diagnóstico útil sin alterar el JSON público.
-            for r in resultados[:5]:
-                print(
-                    "   ↳ "
-                    f"{r.get('loteria')} | "
-                    f"{r.get('numeros')} | "
-                    f"{r.get('fecha_original')} -> {r.get('fecha')} | "
-                    f"{r.get('hora')}"
-                )
+        # Espera el contenido que realmente necesitamos, no un tiempo fijo solamente.
+        try:
+            with TELEMETRIA.etapa("selector", fuente=clave):
+                await page.wait_for_selector(cfg["selector"], timeout=cfg["timeout_selector"])
+        except Exception:
+            if politica.activa:
+                # Puede que el sitio necesite algo de lo bloqueado para pintar:
+                # una recarga sin política antes de darse por vencido.
+                print(f"⚠️ {cfg['dominio']}: sin selector con recursos bloqueados; recargando sin política")
+                politica.reiniciar()
+                politica.activa = False
+                await page.goto(cfg["url"], wait_until="domcontentloaded", timeout=cfg["timeout_goto"])
+            try:
+                await page.wait_for_selector(cfg["selector"], timeout=cfg["timeout_selector"])
+            except Exception:
+                if cfg["selector_obligatorio"]:
+                    raise
+                # Dejamos un pequeño margen por si el sitio termina de pintar tarde.
+                await page.wait_for_timeout(3000)
+
+        html = await page.content()
+        recursos = await politica.resumen()
+        _imprimir_recursos(cfg["dominio"], recursos)
+
+        # El parseo es CPU puro: se saca del event loop para no frenar
+        # la navegación de las demás fuentes.
+        with TELEMETRIA.etapa("huella", fuente=clave, bytes=len(html)):
+            _, huella, soup = await asyncio.to_thread(_analizar_html, clave, html)
+        ok = True
+        if huella == huella_previa and not forzar:
+            return _salida_fuente("playwright", motivo, huella=huella, sin_cambios=True,
+                                  recursos=recursos)
+
+        marca = _marca_fuente(clave, forzar)
+        with TELEMETRIA.etapa("parseo", fuente=clave, ruta="playwright") as t:
+            resultados = await asyncio.to_thread(cfg["parser"], html, soup, marca)
+            t.update(filas=len(resultados), saltadas=marca.saltadas)
+        return _salida_fuente("playwright", motivo, huella=huella, resultados=resultados,
+                              sin_cambios=not resultados and marca.saltadas > 0,
+                              recursos=recursos, marca=marca.siguiente(), saltadas=marca.saltadas)
+    finally:
+        # Una página persistente que falló se descarta para empezar limpia.
+        if not navegador.persistente:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        elif not ok:
+            await navegador.descartar_pagina(clave)
+
+async def _obtener_fuente(navegador: _NavegadorCompartido, clave: str,
+                          huella_previa=None, forzar=False) -> dict:
+    """Primero HTTP directo; Chromium solo si el HTML del servidor no sirve."""
+    cfg = FUENTES[clave]
 
+    salida, motivo = await asyncio.to_thread(_intentar_http, clave, huella_previa, forzar)
+    if salida:
+        print(f"⚡ {cfg['dominio']}: ruta HTTP ({motivo})")
+        return salida
+
+    print(f"🧭 {cfg['dominio']}: ruta Playwright ({motivo})")
+    return await _scrapear_fuente(navegador, clave, motivo, huella_previa, forzar)
+
+async def _obtener_fuente_aislada(navegador: _NavegadorCompartido, clave: str,
+                                  huella_previa=None, forzar=False) -> dict:
+    """Envuelve una fuente con su timeout total; un fallo nunca afecta a las demás."""
+    cfg = FUENTES[clave]
+    inicio = time.perf_counter()
+    try:
+        salida = await asyncio.wait_for(
+            _obtener_fuente(navegador, clave, huella_previa, forzar),
+            timeout=cfg["timeout_total"]
+        )
+    except asyncio.TimeoutError:
+        salida = _salida_fuente("error", f"timeout total de {cfg['timeout_total']}s")
     except Exception as e:
-        print(f"❌ Error tusnumerosrd.com: {repr(e)}")
+        salida = _salida_fuente("error", repr(e))
+    if salida["ruta"] == "error":
+        print(f"❌ Error {cfg['dominio']}: {salida['motivo']}")
+    TELEMETRIA.fuente(
+        clave,
+        ruta=salida["ruta"],
+        motivo=salida["motivo"][:200],
+        ms=round((time.perf_counter() - inicio) * 1000, 1),
+        filas=len(salida["resultados"]),
+        sin_cambios=salida["sin_cambios"],
+        recursos=salida.get("recursos"),
+    )
+    return salida
 
-    return resultados
+async def _obtener_fuentes_async(claves: list, huellas: dict, forzar: bool,
+                                 navegador: _NavegadorCompartido = None) -> dict:
+    """Con un navegador recibido (modo --watch) no se cierra al terminar."""
+    propio = navegador is None
+    navegador = navegador or _NavegadorCompartido()
+    try:
+        salidas = await asyncio.gather(
+            *(_obtener_fuente_aislada(navegador, c, huellas.get(c), forzar) for c in claves)
+        )
+    finally:
+        if propio:
+            await navegador.cerrar()
+    return dict(zip(claves, salidas))
+
+def obtener_fuentes(claves=None, forzar=False) -> dict:
+    """
+    Recorre todas las fuentes en paralelo: HTTP directo cuando el HTML del
+    servidor ya trae los resultados y un único Chromium compartido como fallback.
+    Las fuentes cuya huella coincide con la última corrida exitosa no se
+    parsean y salen con sin_cambios=True (salvo forzar=True).
+    Devuelve {clave_fuente: salida} con resultados, ruta, motivo y huella.
+    """
+    claves = list(claves or FUENTES)
+    huellas = _leer_estado(HUELLAS_ESTADO, {}) or {}
+    try:
+        return asyncio.run(_obtener_fuentes_async(claves, huellas, forzar))
+    except Exception as e:
+        print(f"❌ Error en el motor de scraping: {repr(e)}")
+        return {c: _salida_fuente("error", repr(e)) for c in claves}
+
+def scrapear_fuentes(claves=None) -> dict:
+    """Devuelve {clave_fuente: [resultados]}; una fuente caída devuelve []."""
+    salidas = obtener_fuentes(claves, forzar=True)
+    return {c: s["resultados"] for c, s in salidas.items()}
+
+def guardar_huellas(salidas: dict):
+    """
+    Registra la huella y la marca de agua de cada fuente que aportó datos.
+    Se llama solo después de persistir la corrida, para que un fallo obligue
+    a reprocesar (y a volver a parsear las filas nuevas).
+    """
+    huellas = _leer_estado(HUELLAS_ESTADO, {}) or {}
+    marcas = _marcas_guardadas()
+    for clave, salida in salidas.items():
+        if not (salida.get("resultados") or salida.get("sin_cambios")):
+            continue
+        if salida.get("huella"):
+            huellas[clave] = salida["huella"]
+        if salida.get("marca") is not None:
+            marcas[clave] = salida["marca"]
+    _guardar_estado(HUELLAS_ESTADO, huellas)
+    _guardar_estado(MARCAS_ESTADO, marcas)
+
+def scrapear_loterias_dominicanas():
+    return scrapear_fuentes(["loteriasdominicanas"])["loteriasdominicanas"]
+
+def scrapear_tusnumerosrd():
+    return scrapear_fuentes(["tusnumerosrd"])["tusnumerosrd"]
 
 # ---------- Persistencia ----------
 def cargar_historico(path="resultados_combinados.json"):
@@ -511,81 +1299,1531 @@ def cargar_historico(path="resultados_combinados.json"):
     return []
 
 def _clave(r):
-    return (r.get('loteria',''), tuple(r.get('numeros') or []), r.get('fecha',''), r.get('hora'))
+    if isinstance(r, Resultado):
+        return r.clave
+    # Un registro ya fusionado guarda el nombre canónico.
+    loteria = r.get('loteria') or ''
+    return (
+        loteria if 'fuentes' in r else canonicaliza_loteria(loteria),
+        r.get('fecha') or '',
+        nums_key(r.get('numeros')),
+    )
 
 def evitar_duplicados(resultados_viejos, nuevos):
-    existentes = set(_clave(r) for r in resultados_viejos)
-    no_duplicados = [r for r in nuevos if _clave(r) not in existentes]
-    return resultados_viejos + no_duplicados
+    return fusionar_registros([*resultados_viejos, *nuevos])
 
 def delta_nuevos(historico, nuevos):
     existentes = set(_clave(r) for r in historico)
     return [r for r in nuevos if _clave(r) not in existentes]
 
-# --- dedupe entre fuentes (misma lotería/fecha/números) ---
-def _grupo_clave(r):
-    lot_can = canonicaliza_loteria(r.get('loteria', '') or '')
-    fecha = r.get('fecha') or ''
-    numeros = tuple(r.get('numeros') or [])
-    return (lot_can, fecha, numeros)
+# --- fusión entre fuentes: un registro por sorteo ---
+# Cada sorteo se guarda una sola vez con las fuentes que lo reportaron en
+# "fuentes"; cada campo sale de la fuente que mejor lo trae (hora de
+# tusnumerosrd, logo de loteriasdominicanas). Sin preferencia explícita
+# manda el orden de FUENTES.
+FUSION_PREFERENCIAS = {
+    "hora": ["tusnumerosrd.com", "loteriasdominicanas.com"],
+    "img": ["loteriasdominicanas.com", "tusnumerosrd.com"],
+}
+CAMPOS_FUSION = ("img", "numeros", "fecha_original", "hora")
+
+def _rango_fuente(fuente: str, campo: str = None) -> int:
+    orden = FUSION_PREFERENCIAS.get(campo) or [cfg["dominio"] for cfg in FUENTES.values()]
+    return orden.index(fuente) if fuente in orden else len(orden)
+
+def _fuentes_de(r: dict) -> list:
+    return list(r.get("fuentes") or ([r["fuente"]] if r.get("fuente") else []))
+
+def registro_canonico(r) -> dict:
+    """Fila de una fuente o registro publicado -> registro con nombre canónico y "fuentes"."""
+    publico = r.publico if isinstance(r, Resultado) else r
+    if "fuentes" in publico:
+        return publico
+    canonico = {"fuente": publico.get("fuente"), "fuentes": _fuentes_de(publico)}
+    canonico.update(publico)
+    canonico["loteria"] = canonicaliza_loteria(publico.get("loteria") or "")
+    return canonico
+
+def fusionar_registro(base: dict, otro: dict) -> dict:
+    """
+    Combina dos registros canónicos del mismo sorteo. Devuelve `base` tal
+    cual si `otro` no aporta nada; si no, un dict nuevo.
+    """
+    fuentes_base, fuentes_otro = _fuentes_de(base), _fuentes_de(otro)
+    fusion = dict(base)
+    for campo in CAMPOS_FUSION:
+        valor = otro.get(campo)
+        if valor in (None, "", []) or valor == base.get(campo):
+            continue
+        mejor_otro = min((_rango_fuente(f, campo) for f in fuentes_otro), default=99)
+        mejor_base = min((_rango_fuente(f, campo) for f in fuentes_base), default=99)
+        if base.get(campo) in (None, "", []) or mejor_otro < mejor_base:
+            fusion[campo] = valor
+
+    fuentes = sorted(set(fuentes_base) | set(fuentes_otro), key=_rango_fuente)
+    if fuentes:
+        fusion["fuentes"] = fuentes
+        fusion["fuente"] = fuentes[0]
+    # hora_scrapeo: la primera vez que alguna fuente lo publicó.
+    vistos = [h for h in (base.get("hora_scrapeo"), otro.get("hora_scrapeo")) if h]
+    if vistos:
+        fusion["hora_scrapeo"] = min(vistos)
+    return base if fusion == base else fusion
 
+def fusionar_registros(registros) -> list:
+    """Un registro canónico por sorteo, en el orden de su primera aparición."""
+    por_clave = {}
+    for r in registros:
+        k = _clave(r)
+        prev = por_clave.get(k)
+        canonico = registro_canonico(r)
+        por_clave[k] = canonico if prev is None else fusionar_registro(prev, canonico)
+    return list(por_clave.values())
+
+def fusionar_con_historico(historico, nuevos) -> list:
+    """
+    Registros a persistir: sorteos nuevos y sorteos ya guardados a los que
+    otra fuente les aporta algo (la fuente misma, hora, logo...).
+    """
+    indice = {}
+    for r in historico:
+        k = _clave(r)
+        prev = indice.get(k)
+        canonico = registro_canonico(r)
+        indice[k] = canonico if prev is None else fusionar_registro(prev, canonico)
+
+    cambios = {}
+    for r in nuevos:
+        k = _clave(r)
+        prev = cambios.get(k) or indice.get(k)
+        canonico = registro_canonico(r)
+        fusion = canonico if prev is None else fusionar_registro(prev, canonico)
+        if fusion is not prev:
+            cambios[k] = fusion
+    return list(cambios.values())
+
+# --- dedupe entre fuentes para notificar (misma lotería/fecha/números) ---
 def compactar_delta(delta):
+    """Un Resultado por (lotería canónica, fecha, números); prefiere el que trae hora."""
     grupos = {}
     for r in delta:
-        k = _grupo_clave(r)
+        k = r.clave
         prev = grupos.get(k)
         if not prev:
             grupos[k] = r
             continue
-        h_prev = (prev.get('hora') or '').strip()
-        h_new  = (r.get('hora') or '').strip()
+        h_prev = (prev.hora or '').strip()
+        h_new  = (r.hora or '').strip()
         if h_prev and not h_new:
             pass
         elif (not h_prev) and h_new:
             grupos[k] = r
         else:
-            if (r.get('hora_scrapeo') or '') > (prev.get('hora_scrapeo') or ''):
+            if r.hora_scrapeo > prev.hora_scrapeo:
                 grupos[k] = r
     return list(grupos.values())
 
-# ---------- FCM ----------
-def _get_fcm_credentials():
-    """Lee JSON completo desde FCM_SERVICE_ACCOUNT_JSON o ruta en GOOGLE_APPLICATION_CREDENTIALS."""
-    SCOPES = ['https://www.googleapis.com/auth/firebase.messaging']
-    env_json = os.getenv("FCM_SERVICE_ACCOUNT_JSON")
-    if env_json:
-        try:
-            info = json.loads(env_json)
-            return service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
-        except Exception as e:
-            print(f"⚠️ SA en env inválida: {e}")
-    sa_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "")
-    if sa_path and os.path.isfile(sa_path):
-        try:
-            return service_account.Credentials.from_service_account_file(sa_path, scopes=SCOPES)
-        except Exception as e:
-            print(f"⚠️ SA por archivo inválida: {e}")
-    print("❌ SA: no encontrada")
-    return None
+# ---------- Almacenamiento ----------
+# "json": el histórico completo vive en resultados_combinados.json y se
+#         reescribe en cada corrida (modo original).
+# "jsonl": log append-only con una línea verificada por resultado; el
+#          snapshot público se compacta desde el log solo cuando creció.
+# "sqlite": base embebida con índices por lotería canónica/fecha y dedupe
+#           por UPSERT; exporta el mismo snapshot público.
+STORAGE_MODE = os.getenv("SCRAPER_STORAGE", "json")
+API_PATH = "resultados_combinados.json"
+LOG_PATH = os.getenv("SCRAPER_LOG_PATH", "resultados_log.jsonl")
 
-def enviar_fcm_v1(title: str, body: str, topic: str, data: dict,
-                  collapse_key: str, tag: str, ttl_seconds: int = 900):
-    """Envía FCM con notification + data (Android muestra en background)."""
-    creds = _get_fcm_credentials()
-    if not creds:
-        print("⚠️ FCM omitido: credenciales no disponibles.")
-        return
-    req = google.auth.transport.requests.Request()
-    creds.refresh(req)
-    token = creds.token
+CAMPOS_REQUERIDOS = ("loteria", "numeros", "fecha")
 
-    # FCM data map: todos string
-    data = {k: ('' if v is None else str(v)) for k, v in (data or {}).items()}
+def _sha256_archivo(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
 
-    url = f"https://fcm.googleapis.com/v1/projects/{PROJECT_ID}/messages:send"
-    message = {
-        "message": {
-            "topic": topic,
+def ruta_manifiesto(api_path: str = API_PATH) -> str:
+    """resultados_combinados.json -> resultados_combinados.manifest.json"""
+    return os.path.splitext(api_path)[0] + ".manifest.json"
+
+def leer_manifiesto(api_path: str = API_PATH):
+    try:
+        with open(ruta_manifiesto(api_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def manifiesto_al_dia(api_path: str = API_PATH) -> bool:
+    """El archivo público existe y su hash coincide con el de su manifiesto."""
+    manifiesto = leer_manifiesto(api_path)
+    return bool(
+        manifiesto
+        and os.path.exists(api_path)
+        and _sha256_archivo(api_path) == manifiesto.get("sha256")
+    )
+
+def _problema_registro(r):
+    """Mismas reglas que el guardrail del workflow; None si el registro es válido."""
+    if not isinstance(r, dict):
+        return "registro no es objeto"
+    faltantes = [campo for campo in CAMPOS_REQUERIDOS if campo not in r]
+    if faltantes:
+        return "faltan: " + ",".join(faltantes)
+    if not isinstance(r.get("numeros"), list):
+        return "numeros no es lista"
+    return None
+
+class _ArchivoConHash:
+    """
+    Archivo binario temporal que acumula SHA-256 y tamaño de lo escrito.
+    Acepta bytes (gzip escribe por acá) o texto, que se guarda en UTF-8.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.f = open(path, "wb")
+        self.sha = hashlib.sha256()
+        self.bytes = 0
+
+    def write(self, data) -> int:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.f.write(data)
+        self.sha.update(data)
+        self.bytes += len(data)
+        return len(data)
+
+    def flush(self):
+        self.f.flush()
+
+    def cerrar(self):
+        if self.f.closed:
+            return
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.f.close()
+
+    def descartar(self):
+        self.f.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+# ---------- Variantes precomprimidas ----------
+# Cada artefacto público X.json se publica además como X.min.json (sin
+# indentación) y X.min.json.gz / X.min.json.br. gzip va con mtime=0 y sin
+# nombre de archivo, así que mismos datos => mismos bytes (y mismo blob en git).
+GZIP_NIVEL = 9
+# Calidad 9 y no 11: con un histórico sintético de 4,7 MB, 11 tarda ~25 s por
+# archivo contra ~0,3 s y solo ahorra un 35 % más (132 KB vs 204 KB).
+BROTLI_CALIDAD = 9
+
+def rutas_variantes(path: str) -> dict:
+    """resultados.json -> {"min": resultados.min.json, "gz": ….min.json.gz, "br": ….min.json.br}"""
+    base = os.path.splitext(path)[0] + ".min.json"
+    rutas = {"min": base, "gz": base + ".gz"}
+    if brotli is not None:
+        rutas["br"] = base + ".br"
+    return rutas
+
+def _info_hash(sha: str, size: int) -> dict:
+    """sha256, tamaño y ETag (derivado del hash) de un artefacto."""
+    return {"sha256": sha, "bytes": size, "etag": f'"{sha[:32]}"'}
+
+def info_contenido(data: bytes) -> dict:
+    return _info_hash(hashlib.sha256(data).hexdigest(), len(data))
+
+def comprimir_gzip(data: bytes) -> bytes:
+    buf = io.BytesIO()
+    with gzip.GzipFile(filename="", mode="wb", fileobj=buf, mtime=0, compresslevel=GZIP_NIVEL) as gz:
+        gz.write(data)
+    return buf.getvalue()
+
+def _escribir_bytes_si_cambia(path: str, contenido: bytes) -> bool:
+    """Escritura atómica que no toca el archivo si el contenido es idéntico."""
+    try:
+        if os.path.getsize(path) == len(contenido):
+            with open(path, "rb") as f:
+                if f.read() == contenido:
+                    return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+    return True
+
+def escribir_artefacto_json(path: str, data) -> tuple:
+    """
+    Escribe X.json (indent=2) y sus variantes compacta/gz/br, cada archivo
+    solo si cambió. Devuelve (se_escribió_algo, {ruta: info_contenido}).
+    """
+    legible = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    compacto = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    contenidos = {path: legible}
+    rutas = rutas_variantes(path)
+    contenidos[rutas["min"]] = compacto
+    contenidos[rutas["gz"]] = comprimir_gzip(compacto)
+    if "br" in rutas:
+        contenidos[rutas["br"]] = brotli.compress(compacto, quality=BROTLI_CALIDAD)
+
+    escrito = False
+    for ruta, contenido in contenidos.items():
+        escrito = _escribir_bytes_si_cambia(ruta, contenido) or escrito
+    return escrito, {ruta: info_contenido(contenido) for ruta, contenido in contenidos.items()}
+
+class _VariantesEnStreaming:
+    """Variante compacta + gz/br escritas a la par que el JSON legible."""
+
+    def __init__(self, path: str):
+        self.rutas = rutas_variantes(path)
+        self.archivos = {k: _ArchivoConHash(p + ".tmp") for k, p in self.rutas.items()}
+        self.gz = gzip.GzipFile(
+            filename="", mode="wb", fileobj=self.archivos["gz"],
+            mtime=0, compresslevel=GZIP_NIVEL
+        )
+        self.br = brotli.Compressor(quality=BROTLI_CALIDAD) if "br" in self.rutas else None
+
+    def write(self, texto: str):
+        data = texto.encode("utf-8")
+        self.archivos["min"].write(data)
+        self.gz.write(data)
+        if self.br is not None:
+            self.archivos["br"].write(self.br.process(data))
+
+    def cerrar(self):
+        self.gz.close()
+        if self.br is not None:
+            self.archivos["br"].write(self.br.finish())
+            self.br = None
+        for archivo in self.archivos.values():
+            archivo.cerrar()
+
+    def descartar(self):
+        for archivo in self.archivos.values():
+            archivo.descartar()
+
+    def publicar(self) -> dict:
+        info = {}
+        for clave, ruta in self.rutas.items():
+            archivo = self.archivos[clave]
+            os.replace(archivo.path, ruta)
+            info[os.path.basename(ruta)] = _info_hash(archivo.sha.hexdigest(), archivo.bytes)
+        return info
+
+def escribir_api_publica(resultados, final_path: str = API_PATH) -> dict:
+    """
+    Escribe {"generado", "resultados"} en streaming, registro a registro y con
+    el mismo formato que json.dump(indent=2), validando cada registro y
+    calculando SHA-256 y conteo sobre la marcha. En la misma pasada escribe
+    las variantes compacta/gz/br. Publica todo de forma atómica junto con el
+    manifiesto (hashes y ETags) y devuelve el manifiesto.
+    """
+    generado = datetime.now(TZ_RD).isoformat()
+    hoy = generado[:10]
+    registros = 0
+    registros_hoy = 0
+    ultimos = deque(maxlen=5)
+
+    # Escritura atómica: primero temporal, luego reemplazo.
+    # Evita dejar un JSON cortado/corrupto si el proceso se interrumpe.
+    tmp_path = final_path + ".tmp"
+    variantes = _VariantesEnStreaming(final_path)
+    w = _ArchivoConHash(tmp_path)
+
+    try:
+        w.write('{\n  "generado": ' + json.dumps(generado) + ',\n  "resultados": [')
+        variantes.write('{"generado":' + json.dumps(generado) + ',"resultados":[')
+        for r in resultados:
+            problema = _problema_registro(r)
+            if problema:
+                raise RuntimeError(
+                    f"CRITICAL: Registro #{registros} inválido ({problema}). "
+                    "No se reemplazó el archivo público."
+                )
+            bloque = json.dumps(r, indent=2, ensure_ascii=False).replace("\n", "\n    ")
+            w.write(("\n    " if registros == 0 else ",\n    ") + bloque)
+            variantes.write(
+                ("" if registros == 0 else ",")
+                + json.dumps(r, ensure_ascii=False, separators=(",", ":"))
+            )
+            registros += 1
+            if str(r.get("fecha", "")).strip() == hoy:
+                registros_hoy += 1
+            ultimos.append({k: r.get(k) for k in ("loteria", "numeros", "fecha", "hora")})
+
+        # Validación antes de tocar el archivo público.
+        if registros == 0:
+            raise RuntimeError(
+                "CRITICAL: El resultado final que se iba a guardar está vacío o es inválido."
+            )
+        w.write("\n  ]\n}")
+        variantes.write("]}")
+        variantes.cerrar()
+        w.cerrar()
+
+        # Lo que quedó en disco debe ser exactamente lo que se escribió.
+        if _sha256_archivo(tmp_path) != w.sha.hexdigest():
+            raise RuntimeError(
+                "CRITICAL: La verificación del JSON temporal falló. "
+                "No se reemplazó el archivo público."
+            )
+    except BaseException:
+        variantes.descartar()
+        w.descartar()
+        raise
+
+    manifiesto = {
+        "archivo": os.path.basename(final_path),
+        "sha256": w.sha.hexdigest(),
+        "bytes": w.bytes,
+        "etag": _info_hash(w.sha.hexdigest(), w.bytes)["etag"],
+        "registros": registros,
+        "hoy": hoy,
+        "registros_hoy": registros_hoy,
+        "generado": generado,
+        "ultimos": list(ultimos),
+    }
+
+    os.replace(tmp_path, final_path)
+    manifiesto["variantes"] = variantes.publicar()
+
+    manifiesto_path = ruta_manifiesto(final_path)
+    with open(manifiesto_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(manifiesto_path + ".tmp", manifiesto_path)
+
+    return manifiesto
+
+# ---------- API fragmentada (latest / por fecha / por lotería) ----------
+# Junto al JSON completo se publica un API estático en SCRAPER_API_DIR:
+#   latest.json              sorteo más reciente por lotería canónica
+#   fecha/<YYYY-MM-DD>.json  resultados de un día
+#   loteria/<topic>.json     resultados de una lotería (mismo slug que topic_seguro)
+#   index.json               fechas y loterías disponibles
+#   etags.json               sha256/ETag de cada archivo (incluye variantes)
+# Solo se reescriben los fragmentos que toca el delta de la corrida; los de
+# días o loterías que salieron de la ventana de retención se borran.
+API_FRAGMENTOS_DIR = os.getenv("SCRAPER_API_DIR", "api")
+
+def _leer_fragmento(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _orden_latest(r: Resultado) -> tuple:
+    return (r.dt.isoformat() if r.dt else r.fecha, r.hora_scrapeo)
+
+def publicar_fragmentos(registros, tocados=None, base_dir: str = API_FRAGMENTOS_DIR) -> dict:
+    """
+    Sin índice previo (primera corrida) o con tocados=None recorre el
+    histórico una vez (en streaming) y genera todos los fragmentos. Si no,
+    `registros` ni se recorre: se releen y fusionan solo los fragmentos de
+    fecha/lotería que tocan los registros `tocados`, y latest.json e
+    index.json se actualizan a partir de ellos (costo O(delta)).
+    Devuelve {"escritos": n, "sin_cambios": n, "borrados": n}.
+    """
+    completo = tocados is None or not os.path.exists(os.path.join(base_dir, "index.json"))
+
+    escritos = sin_cambios = 0
+    etags_path = os.path.join(base_dir, "etags.json")
+    etags = {} if completo else _leer_fragmento(etags_path)
+
+    def escribir(ruta, data):
+        nonlocal escritos, sin_cambios
+        escrito, infos = escribir_artefacto_json(os.path.join(base_dir, ruta), data)
+        for path, info in infos.items():
+            etags[os.path.relpath(path, base_dir).replace(os.sep, "/")] = info
+        if escrito:
+            escritos += 1
+        else:
+            sin_cambios += 1
+
+    if completo:
+        por_fecha, por_loteria, ultimo, conteo_fechas, nombres = _fragmentos_completos(registros)
+    else:
+        por_fecha, por_loteria, ultimo, conteo_fechas, nombres = _fragmentos_delta(tocados, base_dir)
+
+    for fecha, items in sorted(por_fecha.items()):
+        escribir(os.path.join("fecha", f"{fecha}.json"), {"fecha": fecha, "resultados": items})
+    for topic, items in sorted(por_loteria.items()):
+        escribir(
+            os.path.join("loteria", f"{topic}.json"),
+            {"loteria": nombres[topic], "topic": topic, "resultados": items}
+        )
+
+    escribir("latest.json", {
+        "resultados": {lot: publico for lot, (_, publico) in sorted(ultimo.items())}
+    })
+    escribir("index.json", {
+        "fechas": {f: conteo_fechas[f] for f in sorted(conteo_fechas, reverse=True)},
+        "loterias": dict(sorted(nombres.items())),
+    })
+    borrados = _podar_fragmentos(base_dir, set(conteo_fechas), set(nombres), etags)
+    _escribir_bytes_si_cambia(
+        etags_path,
+        json.dumps(dict(sorted(etags.items())), indent=2, ensure_ascii=False).encode("utf-8")
+    )
+
+    print(
+        f"🧩 API fragmentada en {base_dir}: {escritos} archivos escritos, "
+        f"{sin_cambios} sin cambios"
+        + (f", {borrados} fuera de la ventana borrados" if borrados else "")
+        + (" (reconstrucción completa)" if completo else "")
+    )
+    return {"escritos": escritos, "sin_cambios": sin_cambios, "borrados": borrados}
+
+def _podar_fragmentos(base_dir: str, fechas: set, topics: set, etags: dict) -> int:
+    """
+    Borra los fragmentos (con sus variantes y ETags) de días o loterías que
+    ya no están en el índice: lo anterior a la ventana vive en el archivo
+    mensual. Devuelve cuántos archivos se borraron.
+    """
+    borrados = 0
+    for carpeta, vivos in (("fecha", fechas), ("loteria", topics)):
+        try:
+            nombres = os.listdir(os.path.join(base_dir, carpeta))
+        except FileNotFoundError:
+            continue
+        for nombre in nombres:
+            if nombre.split(".", 1)[0] in vivos:
+                continue
+            os.remove(os.path.join(base_dir, carpeta, nombre))
+            etags.pop(f"{carpeta}/{nombre}", None)
+            borrados += 1
+    return borrados
+
+def _fragmentos_completos(registros) -> tuple:
+    por_fecha, por_loteria = {}, {}
+    ultimo = {}
+    conteo_fechas, nombres = {}, {}
+
+    for publico in registros:
+        r = Resultado(publico)
+        if not r.fecha:
+            continue
+        conteo_fechas[r.fecha] = conteo_fechas.get(r.fecha, 0) + 1
+        nombres[r.topic] = r.canonica
+        por_fecha.setdefault(r.fecha, []).append(publico)
+        por_loteria.setdefault(r.topic, []).append(publico)
+
+        orden = _orden_latest(r)
+        prev = ultimo.get(r.canonica)
+        if prev is None or orden >= prev[0]:
+            ultimo[r.canonica] = (orden, publico)
+    return por_fecha, por_loteria, ultimo, conteo_fechas, nombres
+
+def _fragmentos_delta(tocados, base_dir: str) -> tuple:
+    """
+    Fragmentos de fecha/lotería tocados (lo publicado fusionado con `tocados`)
+    más latest/index actualizados. Lo anterior al corte de retención no
+    entra: ya vive en el archivo mensual.
+    """
+    corte = corte_retencion() or ""
+    index = _leer_fragmento(os.path.join(base_dir, "index.json"))
+    conteo_fechas = {f: n for f, n in (index.get("fechas") or {}).items() if f >= corte}
+    corte_avanzo = len(conteo_fechas) < len(index.get("fechas") or {})
+    nombres = dict(index.get("loterias") or {})
+    ultimo = {}
+    for lot, publico in ((_leer_fragmento(os.path.join(base_dir, "latest.json")).get("resultados")) or {}).items():
+        if (publico.get("fecha") or "") >= corte:
+            ultimo[lot] = (_orden_latest(Resultado(publico)), publico)
+
+    nuevos_fecha, nuevos_loteria = {}, {}
+    for publico in tocados:
+        publico = registro_canonico(publico)
+        r = Resultado(publico)
+        if not r.fecha or r.fecha < corte:
+            continue
+        nombres[r.topic] = r.canonica
+        nuevos_fecha.setdefault(r.fecha, []).append(publico)
+        nuevos_loteria.setdefault(r.topic, []).append(publico)
+
+    def fusionar(ruta: str, nuevos: list) -> list:
+        items = [
+            p for p in _leer_fragmento(os.path.join(base_dir, ruta)).get("resultados") or []
+            if (p.get("fecha") or "") >= corte
+        ]
+        posicion = {_clave(p): i for i, p in enumerate(items)}
+        for publico in nuevos:
+            i = posicion.get(_clave(publico))
+            if i is None:
+                posicion[_clave(publico)] = len(items)
+                items.append(publico)
+            else:
+                items[i] = fusionar_registro(items[i], publico)
+        return items
+
+    por_fecha = {
+        fecha: fusionar(os.path.join("fecha", f"{fecha}.json"), nuevos)
+        for fecha, nuevos in nuevos_fecha.items()
+    }
+    # Si el corte avanzó, también las loterías no tocadas pierden lo que pasó
+    # al archivo (una vez al mes); las que quedan vacías salen del índice.
+    topics = nombres if corte_avanzo else nuevos_loteria
+    por_loteria = {
+        topic: fusionar(os.path.join("loteria", f"{topic}.json"), nuevos_loteria.get(topic, []))
+        for topic in topics
+    }
+    for topic in [t for t, items in por_loteria.items() if not items]:
+        del por_loteria[topic]
+        nombres.pop(topic, None)
+    for fecha, items in por_fecha.items():
+        conteo_fechas[fecha] = len(items)
+    for items in por_loteria.values():
+        for publico in items:
+            r = Resultado(publico)
+            prev = ultimo.get(r.canonica)
+            orden = _orden_latest(r)
+            if prev is None or orden >= prev[0]:
+                ultimo[r.canonica] = (orden, publico)
+    return por_fecha, por_loteria, ultimo, conteo_fechas, nombres
+
+# ---------- Estadísticas por lotería (api/stats.json) ----------
+# Contadores por lotería canónica para que la app no tenga que bajar y
+# recorrer todo el histórico: frecuencia de cada número (total y por
+# ventana de días), última vez que salió, pares que salen juntos y
+# cantidad de sorteos. Viven en el estado (stats.npz) como arreglos NumPy
+# y cada corrida solo suma sus sorteos nuevos. Si el estado no corresponde
+# al snapshot publicado (caché perdida, commit fallido) se rehacen desde
+# el histórico completo, archivo incluido.
+STATS_ESTADO = "stats.npz"
+STATS_NUMEROS = 100                # bolas 00-99; Pega 4, colores, etc. no cuentan
+STATS_VENTANAS = (7, 30, 90)
+STATS_DIAS = max(STATS_VENTANAS)   # días con conteo diario (buffer circular)
+STATS_TOP_PARES = 10
+
+def _bolas(numeros) -> list:
+    """Bolas 0-99 distintas de un sorteo, ordenadas."""
+    bolas = set()
+    for n in numeros or []:
+        n = str(n).strip()
+        if n.isdigit() and len(n) <= 2:
+            bolas.add(int(n))
+    return sorted(bolas)
+
+class EstadisticasLoterias:
+    """
+    Una fila por lotería canónica (self.loterias[i]):
+      frecuencia[i, n]           veces que salió n
+      ultima[i, n]               ordinal del último día en que salió n (0 = nunca)
+      pares[i, a, b]             sorteos con a y b juntos (a < b)
+      sorteos[i]                 sorteos contados
+      diario[i, d % DIAS, n]     conteo del día d; dias[s] dice qué día ocupa s
+      sorteos_diario[i, d % DIAS]
+    """
+
+    _ARREGLOS = ("frecuencia", "ultima", "pares", "sorteos", "diario", "sorteos_diario")
+
+    def __init__(self):
+        self.loterias = []
+        self._indice = {}
+        self.frecuencia = np.zeros((0, STATS_NUMEROS), dtype=np.int64)
+        self.ultima = np.zeros((0, STATS_NUMEROS), dtype=np.int32)
+        self.pares = np.zeros((0, STATS_NUMEROS, STATS_NUMEROS), dtype=np.int32)
+        self.sorteos = np.zeros(0, dtype=np.int64)
+        self.diario = np.zeros((0, STATS_DIAS, STATS_NUMEROS), dtype=np.int32)
+        self.sorteos_diario = np.zeros((0, STATS_DIAS), dtype=np.int32)
+        self.dias = np.zeros(STATS_DIAS, dtype=np.int32)
+        self.api_sha256 = None
+
+    @classmethod
+    def cargar(cls, nombre: str = STATS_ESTADO) -> "EstadisticasLoterias":
+        """Estado guardado; uno vacío si falta, está dañado o cambió la forma de los arreglos."""
+        stats = cls()
+        try:
+            with np.load(os.path.join(STATE_DIR, nombre), allow_pickle=False) as data:
+                for campo in cls._ARREGLOS + ("dias",):
+                    setattr(stats, campo, data[campo])
+                stats.loterias = [str(x) for x in data["loterias"]]
+                stats.api_sha256 = str(data["api_sha256"]) or None
+        except Exception:
+            return cls()
+        if stats.diario.shape[1:] != (STATS_DIAS, STATS_NUMEROS) or len(stats.loterias) != len(stats.sorteos):
+            return cls()
+        stats._indice = {canonica: i for i, canonica in enumerate(stats.loterias)}
+        return stats
+
+    def guardar(self, nombre: str = STATS_ESTADO):
+        path = os.path.join(STATE_DIR, nombre)
+        try:
+            os.makedirs(STATE_DIR, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                np.savez_compressed(
+                    f,
+                    loterias=np.array(self.loterias, dtype=str),
+                    api_sha256=np.array(self.api_sha256 or ""),
+                    dias=self.dias,
+                    **{campo: getattr(self, campo) for campo in self._ARREGLOS},
+                )
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar estado {nombre}: {repr(e)}")
+
+    def _fila(self, canonica: str) -> int:
+        i = self._indice.get(canonica)
+        if i is None:
+            i = self._indice[canonica] = len(self.loterias)
+            self.loterias.append(canonica)
+            for campo in self._ARREGLOS:
+                arr = getattr(self, campo)
+                setattr(self, campo, np.concatenate([arr, np.zeros((1,) + arr.shape[1:], dtype=arr.dtype)]))
+        return i
+
+    def _rotar_dias(self, hoy: int):
+        """Deja en el buffer diario exactamente los últimos STATS_DIAS días hasta `hoy`."""
+        esperados = np.arange(hoy - STATS_DIAS + 1, hoy + 1, dtype=np.int32)
+        slots = esperados % STATS_DIAS
+        viejos = slots[self.dias[slots] != esperados]
+        if len(viejos):
+            self.diario[:, viejos, :] = 0
+            self.sorteos_diario[:, viejos] = 0
+        self.dias[slots] = esperados
+
+    def sumar(self, registros, hoy: date = None) -> int:
+        """Suma sorteos que todavía no se contaron; devuelve cuántos entraron."""
+        hoy = (hoy or datetime.now(TZ_RD).date()).toordinal()
+        self._rotar_dias(hoy)
+
+        filas, bolas, dias = [], [], []
+        pares = []
+        sorteos_fila, sorteos_dia = [], []
+        for r in registros:
+            r = r if isinstance(r, Resultado) else Resultado(r)
+            nums = _bolas(r.numeros)
+            if not nums or not _RE_FECHA_ISO.match(r.fecha):
+                continue
+            i = self._fila(r.canonica)
+            dia = date.fromisoformat(r.fecha).toordinal()
+            sorteos_fila.append(i)
+            sorteos_dia.append(dia)
+            filas.extend([i] * len(nums))
+            bolas.extend(nums)
+            dias.extend([dia] * len(nums))
+            pares.extend((i, a, b) for k, a in enumerate(nums) for b in nums[k + 1:])
+        if not sorteos_fila:
+            return 0
+
+        f = np.array(filas, dtype=np.intp)
+        n = np.array(bolas, dtype=np.intp)
+        d = np.array(dias, dtype=np.int32)
+        np.add.at(self.frecuencia, (f, n), 1)
+        np.maximum.at(self.ultima, (f, n), d)
+        np.add.at(self.sorteos, np.array(sorteos_fila, dtype=np.intp), 1)
+        if pares:
+            p = np.array(pares, dtype=np.intp)
+            np.add.at(self.pares, (p[:, 0], p[:, 1], p[:, 2]), 1)
+
+        # Al buffer diario solo entran los días que siguen en la ventana.
+        en_buffer = (d > hoy - STATS_DIAS) & (d <= hoy)
+        np.add.at(self.diario, (f[en_buffer], d[en_buffer] % STATS_DIAS, n[en_buffer]), 1)
+        sf = np.array(sorteos_fila, dtype=np.intp)
+        sd = np.array(sorteos_dia, dtype=np.int32)
+        en_buffer = (sd > hoy - STATS_DIAS) & (sd <= hoy)
+        np.add.at(self.sorteos_diario, (sf[en_buffer], sd[en_buffer] % STATS_DIAS), 1)
+        return len(sorteos_fila)
+
+    def resumen(self, hoy: date = None) -> dict:
+        """Esquema público de stats.json; las ventanas y dias_sin_salir cuentan hasta `hoy`."""
+        hoy_fecha = hoy or datetime.now(TZ_RD).date()
+        hoy = hoy_fecha.toordinal()
+        self._rotar_dias(hoy)
+        etiquetas = [f"{n:02d}" for n in range(STATS_NUMEROS)]
+        mascaras = {str(v): self.dias > hoy - v for v in STATS_VENTANAS}
+
+        def conteos(valores) -> dict:
+            return {etiquetas[n]: int(valores[n]) for n in np.flatnonzero(valores)}
+
+        loterias = {}
+        for i in sorted(range(len(self.loterias)), key=lambda i: self.loterias[i]):
+            if not self.sorteos[i]:
+                continue
+            sorteos = {"total": int(self.sorteos[i])}
+            frecuencia = {"total": conteos(self.frecuencia[i])}
+            for ventana, mascara in mascaras.items():
+                sorteos[ventana] = int(self.sorteos_diario[i, mascara].sum())
+                frecuencia[ventana] = conteos(self.diario[i, mascara].sum(axis=0))
+
+            vistos = np.flatnonzero(self.ultima[i])
+            plano = self.pares[i].ravel()
+            orden = np.lexsort((np.arange(plano.size), -plano))[:STATS_TOP_PARES]
+            loterias[topic_seguro(self.loterias[i])] = {
+                "loteria": self.loterias[i],
+                "sorteos": sorteos,
+                "frecuencia": frecuencia,
+                "ultima_vez": {
+                    etiquetas[n]: date.fromordinal(int(self.ultima[i, n])).isoformat() for n in vistos
+                },
+                "dias_sin_salir": {etiquetas[n]: max(0, hoy - int(self.ultima[i, n])) for n in vistos},
+                "pares": [
+                    [etiquetas[k // STATS_NUMEROS], etiquetas[k % STATS_NUMEROS], int(plano[k])]
+                    for k in orden if plano[k]
+                ],
+            }
+        return {"hoy": hoy_fecha.isoformat(), "ventanas": list(STATS_VENTANAS), "loterias": loterias}
+
+def publicar_estadisticas(stats: EstadisticasLoterias, base_dir: str = API_FRAGMENTOS_DIR,
+                          hoy: date = None) -> bool:
+    """Escribe stats.json (y variantes) y lo agrega a etags.json; True si cambió algo."""
+    escrito, infos = escribir_artefacto_json(os.path.join(base_dir, "stats.json"), stats.resumen(hoy))
+    etags_path = os.path.join(base_dir, "etags.json")
+    try:
+        with open(etags_path, "r", encoding="utf-8") as f:
+            etags = json.load(f)
+    except (OSError, ValueError):
+        etags = {}
+    for path, info in infos.items():
+        etags[os.path.relpath(path, base_dir).replace(os.sep, "/")] = info
+    _escribir_bytes_si_cambia(
+        etags_path,
+        json.dumps(dict(sorted(etags.items())), indent=2, ensure_ascii=False).encode("utf-8")
+    )
+    return escrito
+
+def actualizar_estadisticas(nuevos, sha_previo, almacen, base_dir: str = API_FRAGMENTOS_DIR) -> dict:
+    """
+    Suma `nuevos` (sorteos que no estaban en el histórico) si el estado se
+    guardó junto con el snapshot `sha_previo`; si no, rehace todo desde el
+    almacén y el archivo. Se llama después de escribir el snapshot nuevo.
+    """
+    if np is None:
+        print("⚠️ numpy no está instalado; no se actualiza stats.json")
+        return {}
+    stats = EstadisticasLoterias.cargar()
+    if sha_previo and stats.api_sha256 == sha_previo:
+        modo = "incremental"
+        sumados = stats.sumar(fusionar_registros(nuevos))
+    else:
+        modo = "reconstruccion"
+        stats = EstadisticasLoterias()
+        sumados = stats.sumar(fusionar_registros(
+            [*registros_archivados("0000-01-01", "9999-12-31"), *almacen.iterar_todo()]
+        ))
+    stats.api_sha256 = (leer_manifiesto(API_PATH) or {}).get("sha256")
+    escrito = publicar_estadisticas(stats, base_dir)
+    stats.guardar()
+    print(f"📈 Estadísticas ({modo}): {sumados} sorteos sumados, {len(stats.loterias)} loterías")
+    return {"modo": modo, "sorteos": sumados, "escrito": escrito}
+
+# ---------- Retención: ventana caliente + archivo mensual ----------
+# La API viva guarda los últimos RETENCION_DIAS días. Un mes que quedó
+# entero fuera de la ventana se congela en archivo/AAAA-MM.json.gz (gzip
+# determinista) y ese archivo no se vuelve a escribir: si más tarde aparece
+# algo de un mes ya archivado (un sorteo nuevo o uno archivado que otra
+# fuente completó) va a una parte nueva, AAAA-MM.pN.json.gz; al leer, las
+# partes de un mes se fusionan por sorteo.
+# archivo/index.json lista cada parte con su rango de fechas y su hash.
+RETENCION_DIAS = int(os.getenv("SCRAPER_RETENCION_DIAS", "14"))  # 0 = sin retención
+ARCHIVO_DIR = os.getenv("SCRAPER_ARCHIVO_DIR", "archivo")
+_RE_PARTE_ARCHIVO = re.compile(r"^(\d{4}-\d{2})(?:\.p(\d+))?\.json\.gz$")
+
+def corte_retencion(retencion_dias: int = RETENCION_DIAS, hoy: datetime = None):
+    """
+    Primer día que sigue en la API viva (AAAA-MM-01): lo anterior pertenece
+    a meses que ya salieron completos de la ventana. None sin retención.
+    """
+    if retencion_dias <= 0:
+        return None
+    limite = (hoy or datetime.now(TZ_RD)) - timedelta(days=retencion_dias)
+    return limite.strftime("%Y-%m-01")
+
+def _leer_parte_archivo(path: str) -> list:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)["resultados"]
+
+def _entrada_archivo(nombre: str, registros: list, data: bytes) -> dict:
+    mes, parte = _RE_PARTE_ARCHIVO.match(nombre).groups()
+    fechas = sorted(r.get("fecha") or "" for r in registros)
+    return {
+        "archivo": nombre,
+        "mes": mes,
+        "parte": int(parte or 1),
+        "desde": fechas[0] if fechas else None,
+        "hasta": fechas[-1] if fechas else None,
+        "registros": len(registros),
+        **info_contenido(data),
+    }
+
+def indice_archivo(base_dir: str = ARCHIVO_DIR) -> dict:
+    """
+    {nombre: entrada} de las partes que hay en disco. Las que el índice no
+    conoce (índice perdido o corrida cortada) se leen una vez y se agregan.
+    """
+    try:
+        with open(os.path.join(base_dir, "index.json"), "r", encoding="utf-8") as f:
+            conocidas = {e["archivo"]: e for e in json.load(f).get("archivos", [])}
+    except (OSError, ValueError):
+        conocidas = {}
+    try:
+        nombres = sorted(n for n in os.listdir(base_dir) if _RE_PARTE_ARCHIVO.match(n))
+    except FileNotFoundError:
+        nombres = []
+
+    entradas = {}
+    for nombre in nombres:
+        if nombre in conocidas:
+            entradas[nombre] = conocidas[nombre]
+            continue
+        path = os.path.join(base_dir, nombre)
+        with open(path, "rb") as f:
+            data = f.read()
+        entradas[nombre] = _entrada_archivo(nombre, _leer_parte_archivo(path), data)
+    return entradas
+
+def rotar_historico(registros, base_dir: str = ARCHIVO_DIR,
+                    retencion_dias: int = RETENCION_DIAS, hoy: datetime = None) -> tuple:
+    """
+    Separa la ventana caliente y archiva los meses que quedaron fuera.
+    Devuelve (calientes, corte): todo lo anterior a `corte` ya está en el
+    archivo. Es idempotente: lo ya archivado no se vuelve a escribir.
+    """
+    corte = corte_retencion(retencion_dias, hoy)
+    if corte is None:
+        return list(registros), None
+
+    calientes, viejos = [], {}
+    for r in registros:
+        fecha = r.get("fecha") or ""
+        if fecha and fecha < corte:
+            viejos.setdefault(fecha[:7], []).append(r)
+        else:
+            calientes.append(r)
+    if not viejos:
+        return calientes, corte
+
+    entradas = indice_archivo(base_dir)
+    for mes, items in sorted(viejos.items()):
+        partes = [n for n, e in entradas.items() if e["mes"] == mes]
+        if partes:
+            # Un sorteo ya archivado solo vuelve a escribirse (fusionado) si
+            # ahora trae algo más, p. ej. la hora que aportó otra fuente.
+            archivados = {_clave(r): r for r in fusionar_registros(
+                r for nombre in sorted(partes) for r in _leer_parte_archivo(os.path.join(base_dir, nombre))
+            )}
+            pendientes = []
+            for r in items:
+                previo = archivados.get(_clave(r))
+                if previo is None:
+                    pendientes.append(r)
+                    continue
+                fusion = fusionar_registro(previo, registro_canonico(r))
+                if fusion is not previo:
+                    pendientes.append(fusion)
+            items = pendientes
+            if not items:
+                continue
+
+        parte = len(partes) + 1
+        nombre = f"{mes}.json.gz" if parte == 1 else f"{mes}.p{parte}.json.gz"
+        items.sort(key=lambda r: (r.get("fecha") or "", r.get("hora_scrapeo") or ""))
+        data = comprimir_gzip(json.dumps(
+            {"mes": mes, "parte": parte, "resultados": items},
+            ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8"))
+        _escribir_bytes_si_cambia(os.path.join(base_dir, nombre), data)
+        entradas[nombre] = _entrada_archivo(nombre, items, data)
+        print(f"🗃️ {mes}: {len(items)} registros archivados en {os.path.join(base_dir, nombre)}")
+
+    escribir_artefacto_json(os.path.join(base_dir, "index.json"), {
+        "retencion_dias": retencion_dias,
+        "archivos": [entradas[n] for n in sorted(entradas)],
+    })
+    return calientes, corte
+
+def registros_archivados(desde: str, hasta: str, base_dir: str = ARCHIVO_DIR) -> list:
+    """
+    Registros archivados con fecha en [desde, hasta]; solo se abren las partes
+    que tocan el rango. Un sorteo completado después aparece en más de una
+    parte: quien los use los fusiona por sorteo.
+    """
+    registros = []
+    for nombre, entrada in sorted(indice_archivo(base_dir).items()):
+        if (entrada.get("hasta") or "") < desde or (entrada.get("desde") or "") > hasta:
+            continue
+        registros.extend(
+            r for r in _leer_parte_archivo(os.path.join(base_dir, nombre))
+            if desde <= (r.get("fecha") or "") <= hasta
+        )
+    return registros
+
+class AlmacenJSON:
+    """Modo original: cada corrida carga y reescribe el histórico completo."""
+
+    def __init__(self, api_path: str = API_PATH):
+        self.api_path = api_path
+        self._historico = None
+        self._publicados = None
+
+    def cargar_recientes(self) -> list:
+        # En --watch el histórico se lee una vez y luego vive en memoria.
+        if self._historico is None:
+            self._historico = cargar_historico(self.api_path)
+        return self._historico
+
+    def iterar_todo(self):
+        if self._publicados is None:
+            return iter(cargar_historico(self.api_path))
+        return iter(self._publicados)
+
+    def guardar(self, nuevos: list):
+        """Persiste lo nuevo; devuelve el total publicado (None si no se reescribió)."""
+        # Reescribir todo también fusiona los duplicados que traiga el histórico;
+        # lo que quedó fuera de la ventana pasa al archivo mensual.
+        self._publicados, _ = rotar_historico(evitar_duplicados(self._historico or [], nuevos))
+        total = escribir_api_publica(self._publicados, self.api_path)["registros"]
+        self._historico = self._publicados
+        return total
+
+def _checksum_registro(registro: dict) -> str:
+    canon = json.dumps(registro, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canon.encode("utf-8")).hexdigest()[:16]
+
+def _linea_log(registro: dict, t: float) -> str:
+    return json.dumps(
+        {"t": round(t, 3), "sha256": _checksum_registro(registro), "r": registro},
+        ensure_ascii=False, separators=(",", ":")
+    ) + "\n"
+
+def _decodificar_linea_log(linea: bytes):
+    """Devuelve (t, registro) o None si la línea está cortada o el checksum no cuadra."""
+    try:
+        obj = json.loads(linea)
+        registro = obj["r"]
+        if _checksum_registro(registro) != obj["sha256"]:
+            return None
+        return float(obj.get("t") or 0), registro
+    except Exception:
+        return None
+
+def _lineas_desde_el_final(path: str, bloque: int = 1 << 16):
+    """Recorre un archivo de líneas de atrás hacia adelante sin cargarlo completo."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        resto = b""
+        while pos > 0:
+            leer = min(bloque, pos)
+            pos -= leer
+            f.seek(pos)
+            lineas = (f.read(leer) + resto).split(b"\n")
+            resto = lineas.pop(0)
+            for linea in reversed(lineas):
+                if linea.strip():
+                    yield linea
+        if resto.strip():
+            yield resto
+
+def _epoch_hora_scrapeo(registro: dict) -> float:
+    try:
+        return datetime.strptime(
+            registro.get("hora_scrapeo") or "", "%Y-%m-%d %H:%M:%S"
+        ).replace(tzinfo=TZ_RD).timestamp()
+    except ValueError:
+        return 0.0
+
+# El snapshot se actualiza con lo nuevo mientras siga siendo el que salió
+# del log (JSONL_ESTADO guarda su sha256, el tamaño del log y cuántas
+# líneas tiene). El log se compacta (una línea por sorteo) solo cuando las
+# líneas superan JSONL_COMPACTAR_RATIO × los registros publicados.
+JSONL_ESTADO = "jsonl.json"
+JSONL_COMPACTAR_RATIO = float(os.getenv("SCRAPER_JSONL_COMPACTAR_RATIO", "1.5"))
+
+class AlmacenJSONL:
+    """
+    Log append-only de resultados más el snapshot público compactado.
+    Cada línea es {"t": epoch de escritura, "sha256": checksum, "r": registro};
+    una corrida normal lee solo la cola escrita desde ayer, agrega O(nuevos)
+    al log y fusiona lo nuevo con el snapshot publicado, sin releer el log.
+    """
+
+    def __init__(self, log_path: str = LOG_PATH, api_path: str = API_PATH):
+        self.log_path = log_path
+        self.api_path = api_path
+        self._recientes = []
+        self._cargado_para = None
+        self._snapshot = None   # registros publicados, mientras sigan al día con el log
+
+    def _sembrar_desde_api(self):
+        """Primera corrida en este modo: el log arranca con el histórico publicado."""
+        if os.path.exists(self.log_path) or not os.path.exists(self.api_path):
+            return
+        historico = cargar_historico(self.api_path)
+        print(f"🌱 Creando {self.log_path} con {len(historico)} registros de {self.api_path}")
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for r in historico:
+                f.write(_linea_log(r, _epoch_hora_scrapeo(r)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+
+    def cargar_recientes(self) -> list:
+        """
+        Solo se ingieren resultados de hoy, así que basta deduplicar contra lo
+        escrito desde ayer (RD): se lee la cola del log y se corta ahí.
+        """
+        hoy = datetime.now(TZ_RD).replace(hour=0, minute=0, second=0, microsecond=0)
+        # En --watch la cola ya leída sigue en memoria hasta que cambia el día.
+        if self._cargado_para == hoy:
+            return self._recientes
+
+        self._sembrar_desde_api()
+        self._recientes = []
+        if not os.path.exists(self.log_path):
+            return self._recientes
+        self._cargado_para = hoy
+
+        corte = (hoy - timedelta(days=1)).timestamp()
+        corruptas = 0
+
+        for linea in _lineas_desde_el_final(self.log_path):
+            decodificada = _decodificar_linea_log(linea)
+            if decodificada is None:
+                corruptas += 1
+                continue
+            t, registro = decodificada
+            if t < corte:
+                break
+            self._recientes.append(registro)
+
+        self._recientes.reverse()
+        if corruptas:
+            print(f"⚠️ {corruptas} líneas inválidas ignoradas en la cola de {self.log_path}")
+        return self._recientes
+
+    def _iterar_log(self):
+        """Registros válidos del log en orden, sin materializar la lista."""
+        if not os.path.exists(self.log_path):
+            return
+        corruptas = 0
+        with open(self.log_path, "rb") as f:
+            for linea in f:
+                if not linea.strip():
+                    continue
+                decodificada = _decodificar_linea_log(linea)
+                if decodificada is None:
+                    corruptas += 1
+                    continue
+                yield decodificada[1]
+        if corruptas:
+            print(f"⚠️ {corruptas} líneas inválidas ignoradas en {self.log_path}")
+
+    def iterar_todo(self):
+        """
+        Un registro por sorteo. Recién escrito es el snapshot en memoria; si
+        no, el log se recorre una vez y se fusiona (una fusión se agrega como
+        una línea más del mismo sorteo). Es perezoso: no lee nada hasta que
+        se lo recorre.
+        """
+        if self._snapshot is not None:
+            yield from self._snapshot
+        else:
+            yield from fusionar_registros(self._iterar_log())
+
+    def leer_todo(self) -> list:
+        return list(self.iterar_todo())
+
+    def _estado_al_dia(self):
+        """Estado del último snapshot si sigue valiendo para el log y el archivo público actuales."""
+        estado = _leer_estado(JSONL_ESTADO, {}) or {}
+        tamanio = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+        if (
+            estado.get("log") == self.log_path
+            and estado.get("log_bytes") == tamanio
+            and estado.get("api_sha256")
+            and estado["api_sha256"] == (leer_manifiesto(self.api_path) or {}).get("sha256")
+        ):
+            return estado
+        return None
+
+    def _publicar(self, calientes: list, lineas: int) -> int:
+        """Escribe el snapshot y compacta el log si tiene demasiadas líneas por sorteo."""
+        if lineas > JSONL_COMPACTAR_RATIO * max(len(calientes), 1):
+            self._reescribir_log(calientes)
+            lineas = len(calientes)
+        manifiesto = escribir_api_publica(calientes, self.api_path)
+        self._snapshot = calientes
+        _guardar_estado(JSONL_ESTADO, {
+            "log": self.log_path,
+            "log_bytes": os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0,
+            "lineas": lineas,
+            "api_sha256": manifiesto["sha256"],
+        })
+        return manifiesto["registros"]
+
+    def compactar(self) -> int:
+        """
+        Reconstruye el snapshot público desde el log completo (estado perdido
+        o snapshot ajeno). Si algún mes pasó al archivo, el log se reescribe
+        sin él para que no crezca con los años.
+        """
+        lineas = 0
+
+        def contar(registros):
+            nonlocal lineas
+            for r in registros:
+                lineas += 1
+                yield r
+
+        registros = fusionar_registros(contar(self._iterar_log()))
+        calientes, _ = rotar_historico(registros)
+        if len(calientes) < len(registros):
+            self._reescribir_log(calientes)
+            lineas = len(calientes)
+        return self._publicar(calientes, lineas)
+
+    def _actualizar_snapshot(self, pendientes: list, estado: dict) -> int:
+        """Fusiona lo recién agregado al log con el snapshot publicado: O(nuevos) de fusión."""
+        if self._snapshot is None:
+            self._snapshot = cargar_historico(self.api_path)
+        registros = list(self._snapshot)
+        posicion = {_clave(r): i for i, r in enumerate(registros)}
+        for r in pendientes:
+            k = _clave(r)
+            i = posicion.get(k)
+            if i is None:
+                posicion[k] = len(registros)
+                registros.append(r)
+            else:
+                registros[i] = fusionar_registro(registros[i], registro_canonico(r))
+        calientes, _ = rotar_historico(registros)
+        return self._publicar(calientes, int(estado.get("lineas") or 0) + len(pendientes))
+
+    def _reescribir_log(self, registros: list):
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for r in registros:
+                f.write(_linea_log(r, _epoch_hora_scrapeo(r)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        print(f"✂️ {self.log_path} reescrito con {len(registros)} registros de la ventana")
+
+    def guardar(self, nuevos: list):
+        """Persiste lo nuevo; devuelve el total publicado (None si no se reescribió)."""
+        pendientes = fusionar_con_historico(self._recientes, nuevos)
+
+        if pendientes:
+            # Se mira antes de agregar: el snapshot tiene que ser el del log de hasta ahora.
+            estado = self._estado_al_dia()
+            # Si una corrida anterior quedó cortada a mitad de línea, se cierra
+            # esa línea para que no contamine la primera línea nueva.
+            prefijo = ""
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > 0:
+                with open(self.log_path, "rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        prefijo = "\n"
+
+            t = datetime.now(TZ_RD).timestamp()
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(prefijo + "".join(_linea_log(r, t) for r in pendientes))
+                f.flush()
+                os.fsync(f.fileno())
+            self._recientes.extend(pendientes)
+            print(f"🧾 {len(pendientes)} registros nuevos o fusionados agregados a {self.log_path}")
+            if estado is not None:
+                return self._actualizar_snapshot(pendientes, estado)
+            return self.compactar()
+
+        if not manifiesto_al_dia(self.api_path):
+            return self.compactar()
+
+        print(f"📎 {self.api_path} ya refleja el log; no se reescribe.")
+        return None
+
+# La ruta se resuelve al crear el almacén (SCRAPER_SQLITE_PATH o dentro de
+# STATE_DIR), no al importar el módulo.
+SQLITE_NOMBRE = "resultados.sqlite3"
+
+_SQLITE_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    id               INTEGER PRIMARY KEY,
+    loteria          TEXT NOT NULL,
+    loteria_canonica TEXT NOT NULL,
+    fecha            TEXT NOT NULL,
+    hora             TEXT NOT NULL DEFAULT '',
+    numeros          TEXT NOT NULL,
+    numeros_key      TEXT NOT NULL,
+    dt               TEXT,
+    registro         TEXT NOT NULL
+);
+-- Misma identidad que _clave(): un sorteo por lotería canónica, fecha y números.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_resultados_sorteo
+    ON resultados (loteria_canonica, fecha, numeros_key);
+CREATE INDEX IF NOT EXISTS ix_resultados_canonica_dt
+    ON resultados (loteria_canonica, dt);
+CREATE INDEX IF NOT EXISTS ix_resultados_fecha
+    ON resultados (fecha);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+class AlmacenSQLite:
+    """
+    Histórico en SQLite. El archivo vive en el estado del scraper (actions/cache),
+    así que puede faltar o venir atrasado respecto al snapshot publicado en git:
+    si el hash del snapshot no es el último que exportó la base, se reimporta.
+    """
+
+    def __init__(self, db_path: str = None, api_path: str = API_PATH):
+        db_path = db_path or os.getenv("SCRAPER_SQLITE_PATH") or os.path.join(STATE_DIR, SQLITE_NOMBRE)
+        self.db_path = db_path
+        self.api_path = api_path
+        carpeta = os.path.dirname(db_path)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrar_esquema()
+        self.conn.executescript(_SQLITE_ESQUEMA)
+
+    def _migrar_esquema(self):
+        """Bases con la clave anterior (una fila por fuente): se fusionan en el lugar."""
+        anterior = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_resultados_clave'"
+        ).fetchone()
+        if not anterior:
+            return
+        registros = [
+            json.loads(registro)
+            for (registro,) in self.conn.execute("SELECT registro FROM resultados ORDER BY id")
+        ]
+        fusionados = fusionar_registros(registros)
+        with self.conn:
+            self.conn.execute("DROP INDEX ux_resultados_clave")
+            self.conn.execute("DROP INDEX IF EXISTS ix_resultados_canonica_fecha_numeros")
+            self.conn.execute("DELETE FROM resultados")
+            self.conn.executemany(
+                """
+                INSERT INTO resultados
+                    (loteria, loteria_canonica, fecha, hora, numeros, numeros_key, dt, registro)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [self._fila(r) for r in fusionados]
+            )
+        print(f"🔧 {self.db_path}: {len(registros)} filas fusionadas en {len(fusionados)} sorteos")
+
+    @staticmethod
+    def _fila(r) -> tuple:
+        if not isinstance(r, Resultado):
+            r = Resultado(r)
+        return (
+            r.loteria,
+            r.canonica,
+            r.fecha,
+            r.hora or "",
+            json.dumps(r.numeros, ensure_ascii=False),
+            r.numeros_key,
+            r.dt.isoformat() if r.dt else None,
+            json.dumps(r.publico, ensure_ascii=False),
+        )
+
+    def _insertar(self, registros: list) -> int:
+        """
+        Fusiona cada sorteo con el que ya está en la base y hace UPSERT en una
+        sola transacción; devuelve cuántos sorteos entraron o cambiaron.
+        """
+        filas = []
+        for r in fusionar_registros(registros):
+            previo = self.conn.execute(
+                """
+                SELECT registro FROM resultados
+                WHERE loteria_canonica = ? AND fecha = ? AND numeros_key = ?
+                """,
+                _clave(r)
+            ).fetchone()
+            if previo:
+                base = registro_canonico(json.loads(previo[0]))
+                fusion = fusionar_registro(base, r)
+                if fusion == json.loads(previo[0]):
+                    continue
+                r = fusion
+            filas.append(self._fila(r))
+
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO resultados
+                    (loteria, loteria_canonica, fecha, hora, numeros, numeros_key, dt, registro)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (loteria_canonica, fecha, numeros_key) DO UPDATE SET
+                    loteria = excluded.loteria,
+                    hora = excluded.hora,
+                    numeros = excluded.numeros,
+                    dt = excluded.dt,
+                    registro = excluded.registro
+                """,
+                filas
+            )
+        return len(filas)
+
+    def _meta(self, clave: str):
+        fila = self.conn.execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+        return fila[0] if fila else None
+
+    def _set_meta(self, clave: str, valor: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO meta (clave, valor) VALUES (?, ?) "
+                "ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor",
+                (clave, valor)
+            )
+
+    def _sincronizar_con_api(self):
+        if not os.path.exists(self.api_path):
+            return
+        sha = _sha256_archivo(self.api_path)
+        if sha == self._meta("api_sha256"):
+            return
+        insertados = self._insertar(cargar_historico(self.api_path))
+        self._set_meta("api_sha256", sha)
+        print(f"🌱 {self.db_path} sincronizada con {self.api_path}: {insertados} registros importados")
+
+    def cargar_recientes(self) -> list:
+        """Solo se ingieren resultados de hoy: basta deduplicar contra ayer y hoy."""
+        self._sincronizar_con_api()
+        desde = (datetime.now(TZ_RD) - timedelta(days=1)).strftime("%Y-%m-%d")
+        filas = self.conn.execute(
+            "SELECT registro FROM resultados WHERE fecha >= ? ORDER BY id",
+            (desde,)
+        )
+        return [json.loads(registro) for (registro,) in filas]
+
+    def iterar_todo(self):
+        for (registro,) in self.conn.execute("SELECT registro FROM resultados ORDER BY id"):
+            yield json.loads(registro)
+
+    def exportar(self) -> list:
+        return list(self.iterar_todo())
+
+    def ultimo_sorteo(self, loteria_canonica: str):
+        """Sorteo más reciente de una lotería canónica (búsqueda por índice)."""
+        fila = self.conn.execute(
+            """
+            SELECT registro FROM resultados
+            WHERE loteria_canonica = ?
+            ORDER BY dt DESC, id DESC
+            LIMIT 1
+            """,
+            (loteria_canonica,)
+        ).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def existe_sorteo(self, loteria_canonica: str, fecha: str, numeros) -> bool:
+        fila = self.conn.execute(
+            """
+            SELECT 1 FROM resultados
+            WHERE loteria_canonica = ? AND fecha = ? AND numeros_key = ?
+            LIMIT 1
+            """,
+            (loteria_canonica, fecha, nums_key(numeros))
+        ).fetchone()
+        return fila is not None
+
+    def guardar(self, nuevos: list):
+        """Persiste lo nuevo; devuelve el total publicado (None si no se reescribió)."""
+        insertados = self._insertar(nuevos)
+        if insertados:
+            print(f"🗄️ {insertados} sorteos nuevos o fusionados en {self.db_path}")
+
+        if insertados or not manifiesto_al_dia(self.api_path):
+            self._archivar_viejos()
+            manifiesto = escribir_api_publica(self.iterar_todo(), self.api_path)
+            self._set_meta("api_sha256", manifiesto["sha256"])
+            return manifiesto["registros"]
+
+        print(f"📎 {self.api_path} ya refleja la base; no se reescribe.")
+        return None
+
+    def _archivar_viejos(self):
+        """Pasa al archivo mensual los meses fuera de la ventana y los borra de la base."""
+        corte = corte_retencion()
+        if corte is None:
+            return
+        viejos = [
+            json.loads(registro) for (registro,) in self.conn.execute(
+                "SELECT registro FROM resultados WHERE fecha != '' AND fecha < ? ORDER BY id", (corte,)
+            )
+        ]
+        if not viejos:
+            return
+        rotar_historico(viejos)
+        with self.conn:
+            self.conn.execute("DELETE FROM resultados WHERE fecha != '' AND fecha < ?", (corte,))
+
+    def cerrar(self):
+        self.conn.close()
+
+ALMACENES = {
+    "json": AlmacenJSON,
+    "jsonl": AlmacenJSONL,
+    "sqlite": AlmacenSQLite,
+}
+
+def abrir_almacen(modo: str = None):
+    modo = modo or STORAGE_MODE
+    if modo not in ALMACENES:
+        raise ValueError(
+            f"SCRAPER_STORAGE inválido: {modo!r} (opciones: {', '.join(ALMACENES)})"
+        )
+    return ALMACENES[modo]()
+
+# ---------- FCM ----------
+def _get_fcm_credentials():
+    """Lee JSON completo desde FCM_SERVICE_ACCOUNT_JSON o ruta en GOOGLE_APPLICATION_CREDENTIALS."""
+    SCOPES = ['https://www.googleapis.com/auth/firebase.messaging']
+    env_json = os.getenv("FCM_SERVICE_ACCOUNT_JSON")
+    if env_json:
+        try:
+            info = json.loads(env_json)
+            return service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+        except Exception as e:
+            print(f"⚠️ SA en env inválida: {e}")
+    sa_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "")
+    if sa_path and os.path.isfile(sa_path):
+        try:
+            return service_account.Credentials.from_service_account_file(sa_path, scopes=SCOPES)
+        except Exception as e:
+            print(f"⚠️ SA por archivo inválida: {e}")
+    print("❌ SA: no encontrada")
+    return None
+
+# "condicion": un solo request por sorteo con una condición que cubre los
+#              tópicos canónico, alias y global (un dispositivo suscrito a
+#              varios recibe una sola notificación).
+# "topicos": un request por tópico (comportamiento original).
+FCM_MODO_ENVIO = os.getenv("FCM_MODO_ENVIO", "condicion")
+# FCM admite como máximo 5 tópicos por expresión de condición.
+FCM_MAX_TOPICOS_CONDICION = 5
+
+def condicion_topicos(topics: list):
+    """Expresión `'a' in topics || 'b' in topics`; None si excede el límite de FCM."""
+    unicos = list(dict.fromkeys(t for t in topics if t))
+    if not unicos or len(unicos) > FCM_MAX_TOPICOS_CONDICION:
+        return None
+    return " || ".join(f"'{t}' in topics" for t in unicos)
+
+def _mensaje_fcm(title: str, body: str, topic: str, data: dict,
+                 collapse_key: str, tag: str, ttl_seconds: int, condition: str = None) -> dict:
+    # FCM data map: todos string
+    data = {k: ('' if v is None else str(v)) for k, v in (data or {}).items()}
+    destino = {"condition": condition} if condition else {"topic": topic}
+    return {
+        "message": {
+            **destino,
             "notification": {  # Android la muestra si la app está en background
                 "title": title,
                 "body": body
@@ -602,54 +2840,757 @@ def enviar_fcm_v1(title: str, body: str, topic: str, data: dict,
             }
         }
     }
-    r = requests.post(url, headers={
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }, json=message, timeout=15)
-    if r.status_code >= 300:
-        print(f"⚠️ Error FCM {r.status_code}: {r.text}")
-    else:
-        print(f"✅ FCM enviado a /topics/{topic}")
+
+class ClienteFCM:
+    """
+    Cliente FCM v1 para toda la corrida: lee la cuenta de servicio una vez,
+    reutiliza el token OAuth hasta poco antes de que venza y envía por una
+    sesión HTTP keep-alive. Acumula latencias de envío para el resumen final.
+    """
+
+    # Se renueva el token si le quedan menos de estos segundos de vida.
+    MARGEN_TOKEN = 300
+
+    def __init__(self, project_id: str = PROJECT_ID):
+        self.url = f"{FCM_ENDPOINT}/v1/projects/{project_id}/messages:send"
+        self._creds = None
+        self._creds_cargadas = False
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(16, FCM_CONCURRENCIA))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.latencias_ms = []
+        self.errores = 0
+        self.renovaciones_token = 0
+
+    def _token(self):
+        """Token OAuth vigente o None si no hay credenciales."""
+        if FCM_TOKEN_ESTATICO:
+            return FCM_TOKEN_ESTATICO
+        with self._lock:
+            if not self._creds_cargadas:
+                self._creds = _get_fcm_credentials()
+                self._creds_cargadas = True
+            if not self._creds:
+                return None
+
+            expiry = self._creds.expiry  # naive UTC según google-auth
+            if expiry is not None and expiry.tzinfo is None:
+                expiry = expiry.replace(tzinfo=timezone.utc)
+            vence_pronto = (
+                expiry is None
+                or (expiry - datetime.now(timezone.utc)).total_seconds() < self.MARGEN_TOKEN
+            )
+            if not self._creds.token or vence_pronto:
+                self._creds.refresh(google.auth.transport.requests.Request(session=self.session))
+                self.renovaciones_token += 1
+            return self._creds.token
+
+    def enviar_mensaje(self, message: dict, destino: str):
+        """POST de un mensaje ya armado. Devuelve la respuesta HTTP (None si se omitió)."""
+        token = self._token()
+        if not token:
+            print("⚠️ FCM omitido: credenciales no disponibles.")
+            return None
+
+        inicio = time.perf_counter()
+        r = self.session.post(self.url, headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        }, json=message, timeout=15)
+        latencia = (time.perf_counter() - inicio) * 1000
+
+        with self._lock:
+            self.latencias_ms.append(latencia)
+            if r.status_code >= 300:
+                self.errores += 1
+
+        if r.status_code >= 300:
+            print(f"⚠️ Error FCM {r.status_code}: {r.text}")
+        else:
+            print(f"✅ FCM enviado a {destino} ({latencia:.0f} ms)")
+        return r
+
+    def enviar(self, title: str, body: str, topic: str, data: dict,
+               collapse_key: str, tag: str, ttl_seconds: int = 900):
+        """Envía FCM con notification + data (Android muestra en background)."""
+        message = _mensaje_fcm(title, body, topic, data, collapse_key, tag, ttl_seconds)
+        return self.enviar_mensaje(message, f"/topics/{topic}")
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            lat = sorted(self.latencias_ms)
+        if not lat:
+            return {"envios": 0, "errores": self.errores, "renovaciones_token": self.renovaciones_token}
+
+        def percentil(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))], 1)
+
+        return {
+            "envios": len(lat),
+            "errores": self.errores,
+            "renovaciones_token": self.renovaciones_token,
+            "total_ms": round(sum(lat), 1),
+            "media_ms": round(sum(lat) / len(lat), 1),
+            "p50_ms": percentil(0.50),
+            "p95_ms": percentil(0.95),
+            "max_ms": round(lat[-1], 1),
+        }
+
+    def imprimir_estadisticas(self):
+        e = self.estadisticas()
+        if not e["envios"]:
+            return
+        print(
+            f"📨 FCM: {e['envios']} envíos | {e['errores']} errores | "
+            f"token renovado {e['renovaciones_token']}x | "
+            f"p50 {e['p50_ms']} ms | p95 {e['p95_ms']} ms | max {e['max_ms']} ms"
+        )
+
+_CLIENTE_FCM = None
+
+def _cliente_fcm() -> ClienteFCM:
+    global _CLIENTE_FCM
+    if _CLIENTE_FCM is None:
+        _CLIENTE_FCM = ClienteFCM()
+    return _CLIENTE_FCM
+
+def enviar_fcm_v1(title: str, body: str, topic: str, data: dict,
+                  collapse_key: str, tag: str, ttl_seconds: int = 900):
+    """Envía FCM con notification + data (Android muestra en background)."""
+    return _cliente_fcm().enviar(
+        title, body, topic, data,
+        collapse_key=collapse_key, tag=tag, ttl_seconds=ttl_seconds
+    )
 
 # ---------- Cache de envíos (idempotencia) ----------
+# Envíos confirmados, en cubetas por día (RD): sent_cache/AAAA-MM-DD.log con
+# una línea "dedupe_id<TAB>epoch" por envío. Cada confirmación se agrega al
+# final de la cubeta del día apenas FCM la acepta, así una corrida cortada no
+# pierde lo ya enviado; vencer el TTL es borrar cubetas enteras.
+SENT_CACHE_DIR = "sent_cache"
+SENT_CACHE_TTL_DIAS = 3
+# Formato anterior ({dedupe_id: epoch}); se migra a cubetas la primera vez.
 SENT_CACHE = "sent_cache.json"
 
-def load_sent_cache():
+class CacheEnviados:
+    """
+    Índice de envíos confirmados con pertenencia O(1). Se usa como el dict
+    de antes: `dedupe_id in cache` y `cache[dedupe_id] = epoch`; solo se
+    cargan las cubetas vigentes, así el costo no crece con el histórico.
+    """
+
+    def __init__(self, directorio: str = SENT_CACHE_DIR, ttl_dias: int = SENT_CACHE_TTL_DIAS):
+        self.directorio = directorio
+        self.ttl_dias = ttl_dias
+        self._cubetas = {}      # "AAAA-MM-DD" -> set(dedupe_id)
+        self._indice = {}       # dedupe_id -> "AAAA-MM-DD"
+        self._preparadas = set()  # cubetas ya revisadas por una línea cortada
+
+    def _ruta(self, dia: str) -> str:
+        return os.path.join(self.directorio, f"{dia}.log")
+
+    def _dia_minimo(self) -> str:
+        return (datetime.now(TZ_RD) - timedelta(days=self.ttl_dias)).strftime("%Y-%m-%d")
+
+    def cargar(self):
+        minimo = self._dia_minimo()
+        try:
+            nombres = sorted(os.listdir(self.directorio))
+        except FileNotFoundError:
+            nombres = []
+        for nombre in nombres:
+            dia, ext = os.path.splitext(nombre)
+            if ext != ".log" or dia < minimo:
+                continue
+            with open(os.path.join(self.directorio, nombre), "r", encoding="utf-8") as f:
+                for linea in f:
+                    # Una línea cortada por una corrida interrumpida se ignora.
+                    if not linea.endswith("\n") or "\t" not in linea:
+                        continue
+                    self._registrar(linea.split("\t", 1)[0], dia)
+        self._migrar_legado()
+        return self
+
+    def _registrar(self, dedupe_id: str, dia: str):
+        if dedupe_id not in self._indice:
+            self._indice[dedupe_id] = dia
+            self._cubetas.setdefault(dia, set()).add(dedupe_id)
+
+    def _migrar_legado(self):
+        """Pasa sent_cache.json a cubetas (escritura atómica) y lo elimina."""
+        try:
+            with open(SENT_CACHE, "r", encoding="utf-8") as f:
+                legado = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            legado = {}
+        minimo = self._dia_minimo()
+        nuevas = {}
+        for dedupe_id, ts in legado.items():
+            dia = datetime.fromtimestamp(float(ts), TZ_RD).strftime("%Y-%m-%d")
+            if dia >= minimo and dedupe_id not in self._indice:
+                nuevas.setdefault(dia, []).append((dedupe_id, float(ts)))
+        os.makedirs(self.directorio, exist_ok=True)
+        for dia, entradas in nuevas.items():
+            path = self._ruta(dia)
+            previo = ""
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    previo = f.read()
+                if previo and not previo.endswith("\n"):
+                    previo = previo[:previo.rfind("\n") + 1]
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(previo)
+                f.writelines(f"{dedupe_id}\t{int(ts)}\n" for dedupe_id, ts in sorted(entradas, key=lambda e: e[1]))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            for dedupe_id, _ in entradas:
+                self._registrar(dedupe_id, dia)
+        os.remove(SENT_CACHE)
+        print(f"📦 sent_cache.json migrado a {self.directorio}/ ({sum(map(len, nuevas.values()))} envíos vigentes)")
+
+    def __contains__(self, dedupe_id) -> bool:
+        return dedupe_id in self._indice
+
+    def __len__(self) -> int:
+        return len(self._indice)
+
+    def __setitem__(self, dedupe_id: str, ts: float):
+        self.marcar(dedupe_id, ts)
+
+    def _preparar(self, dia: str) -> str:
+        """Ruta de la cubeta; la primera vez recorta una última línea cortada."""
+        path = self._ruta(dia)
+        if dia not in self._preparadas:
+            os.makedirs(self.directorio, exist_ok=True)
+            with contextlib.suppress(FileNotFoundError):
+                with open(path, "rb+") as f:
+                    datos = f.read()
+                    if datos and not datos.endswith(b"\n"):
+                        f.truncate(datos.rfind(b"\n") + 1)
+            self._preparadas.add(dia)
+        return path
+
+    def marcar(self, dedupe_id: str, ts: float = None):
+        """Agrega el envío a la cubeta de su día y lo baja a disco en el acto."""
+        if dedupe_id in self._indice:
+            return
+        ts = datetime.now(TZ_RD).timestamp() if ts is None else float(ts)
+        dia = datetime.fromtimestamp(ts, TZ_RD).strftime("%Y-%m-%d")
+        # Una sola escritura por línea en modo append: o queda completa o se ignora al cargar.
+        with open(self._preparar(dia), "a", encoding="utf-8") as f:
+            f.write(f"{dedupe_id}\t{int(ts)}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._registrar(dedupe_id, dia)
+
+    def guardar(self):
+        """Borra las cubetas vencidas (cada marca ya se bajó a disco al escribirse)."""
+        minimo = self._dia_minimo()
+        for dia in [d for d in self._cubetas if d < minimo]:
+            for dedupe_id in self._cubetas.pop(dia):
+                del self._indice[dedupe_id]
+            self._preparadas.discard(dia)
+        try:
+            nombres = os.listdir(self.directorio)
+        except FileNotFoundError:
+            return
+        for nombre in nombres:
+            dia, ext = os.path.splitext(nombre)
+            if ext == ".log" and dia < minimo:
+                os.remove(os.path.join(self.directorio, nombre))
+
+    def cerrar(self):
+        self.guardar()
+
+def load_sent_cache() -> CacheEnviados:
+    return CacheEnviados().cargar()
+
+def save_sent_cache(cache: CacheEnviados):
+    cache.guardar()
+
+# ---------- Despacho concurrente de notificaciones ----------
+FCM_CONCURRENCIA = int(os.getenv("FCM_CONCURRENCIA", "8"))
+FCM_TASA_POR_SEG = float(os.getenv("FCM_TASA_POR_SEG", "20"))
+FCM_REINTENTOS = int(os.getenv("FCM_REINTENTOS", "4"))
+FCM_BACKOFF_BASE = 1.0
+FCM_BACKOFF_MAX = 30.0
+FCM_STATUS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# Envíos que agotaron los reintentos: la próxima corrida los vuelve a
+# intentar mientras sigan siendo relevantes.
+FCM_PENDIENTES_ESTADO = "fcm_pendientes.json"
+FCM_PENDIENTES_TTL = 3600
+
+class _TokenBucket:
+    """Limitador de tasa compartido por todos los hilos del despacho."""
+
+    def __init__(self, tasa_por_seg: float, capacidad: float = None):
+        self.tasa = max(tasa_por_seg, 0.001)
+        self.capacidad = capacidad or max(1.0, tasa_por_seg)
+        self.tokens = self.capacidad
+        self.ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def tomar(self):
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultimo) * self.tasa)
+                self.ultimo = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.tasa
+            time.sleep(espera)
+
+def _segundos_retry_after(r):
+    """Retry-After en segundos (acepta número o fecha HTTP); None si no viene."""
+    valor = (r.headers.get("Retry-After") or "").strip() if r is not None else ""
+    if not valor:
+        return None
+    if valor.isdigit():
+        return float(valor)
     try:
-        with open(SENT_CACHE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+        return max(0.0, (parsedate_to_datetime(valor) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class DespachadorFCM:
+    """
+    Envía en paralelo todos los mensajes de la corrida con concurrencia
+    acotada, token bucket y reintentos con backoff exponencial que respeta
+    Retry-After. Un envío (dedupe_id) solo se da por hecho si todos sus
+    mensajes fueron confirmados por FCM.
+    """
+
+    def __init__(self, cliente: ClienteFCM, concurrencia: int = FCM_CONCURRENCIA,
+                 tasa_por_seg: float = FCM_TASA_POR_SEG, reintentos: int = FCM_REINTENTOS):
+        self.cliente = cliente
+        self.concurrencia = max(1, concurrencia)
+        self.bucket = _TokenBucket(tasa_por_seg)
+        self.reintentos = reintentos
+        self.resultados = []
+
+    def _enviar_con_reintentos(self, dedupe_id: str, message: dict, destino: str) -> dict:
+        inicio = time.perf_counter()
+        estado, detalle = "error", ""
+        intento = 0
+
+        for intento in range(1, self.reintentos + 2):
+            self.bucket.tomar()
+            r = None
+            try:
+                r = self.cliente.enviar_mensaje(message, destino)
+            except requests.RequestException as e:
+                detalle = repr(e)
+            except Exception as e:
+                # Credenciales (RefreshError de google.auth) u otro fallo local:
+                # reintentar no ayuda; el envío queda pendiente para la próxima corrida.
+                detalle = repr(e)
+                break
+            else:
+                if r is None:
+                    estado, detalle = "omitido", "sin credenciales"
+                    break
+                if r.status_code < 300:
+                    estado, detalle = "ok", ""
+                    break
+                detalle = f"HTTP {r.status_code}"
+                if r.status_code not in FCM_STATUS_REINTENTABLES:
+                    break
+
+            if intento > self.reintentos:
+                break
+            espera = _segundos_retry_after(r)
+            if espera is None:
+                espera = FCM_BACKOFF_BASE * 2 ** (intento - 1) * random.uniform(0.8, 1.2)
+            espera = min(espera, FCM_BACKOFF_MAX)
+            print(f"⏳ {destino}: {detalle}; reintento {intento}/{self.reintentos} en {espera:.1f}s")
+            time.sleep(espera)
+
+        ms = round((time.perf_counter() - inicio) * 1000, 1)
+        TELEMETRIA.registrar(
+            "fcm_envio", ms, destino=destino, estado=estado, intentos=intento,
+            **({"error": detalle} if estado == "error" else {})
+        )
+        return {
+            "id": dedupe_id,
+            "destino": destino,
+            "message": message,
+            "estado": estado,
+            "detalle": detalle,
+            "intentos": intento,
+            "ms": ms,
+        }
+
+    def ejecutar(self, envios: list, al_completar=None) -> dict:
+        """
+        envios: [{"id": dedupe_id, "mensajes": [(message, destino), ...]}].
+        Devuelve {dedupe_id: [resultado por mensaje]}. `al_completar(dedupe_id,
+        resultados)` corre en este hilo apenas terminan todos los mensajes de
+        un envío, sin esperar al resto.
+        """
+        trabajos = [
+            (e["id"], message, destino)
+            for e in envios
+            for message, destino in e["mensajes"]
+        ]
+        if not trabajos:
+            return {}
+
+        faltan = {}
+        for dedupe_id, _, _ in trabajos:
+            faltan[dedupe_id] = faltan.get(dedupe_id, 0) + 1
+
+        por_id = {}
+        self.resultados = []
+        with ThreadPoolExecutor(max_workers=min(self.concurrencia, len(trabajos))) as pool:
+            futuros = {pool.submit(self._enviar_con_reintentos, *t): t for t in trabajos}
+            for futuro in as_completed(futuros):
+                try:
+                    res = futuro.result()
+                except Exception as e:
+                    # Un mensaje roto no corta el despacho: lo ya confirmado se marca igual.
+                    dedupe_id, message, destino = futuros[futuro]
+                    res = {
+                        "id": dedupe_id, "destino": destino, "message": message,
+                        "estado": "error", "detalle": repr(e), "intentos": 0, "ms": 0.0,
+                    }
+                self.resultados.append(res)
+                por_id.setdefault(res["id"], []).append(res)
+                faltan[res["id"]] -= 1
+                if not faltan[res["id"]] and al_completar is not None:
+                    al_completar(res["id"], por_id[res["id"]])
+
+        return por_id
+
+    def imprimir_resumen(self):
+        if not self.resultados:
+            return
+        print("📬 Resumen de envíos FCM:")
+        conteo = {}
+        for res in self.resultados:
+            conteo[res["estado"]] = conteo.get(res["estado"], 0) + 1
+            icono = {"ok": "✅", "omitido": "⚪"}.get(res["estado"], "❌")
+            print(
+                f"   {icono} {res['destino']} | {res['estado']}"
+                + (f" ({res['detalle']})" if res["detalle"] else "")
+                + f" | {res['intentos']} intento(s) | {res['ms']:.0f} ms"
+            )
+        print("   " + " | ".join(f"{k}: {v}" for k, v in sorted(conteo.items())))
+
+def despachar_notificaciones(envios: list, sent_cache: CacheEnviados = None) -> int:
+    """
+    Despacha los envíos nuevos junto con los pendientes de corridas
+    anteriores. Marca sent_cache solo con envíos confirmados y deja como
+    pendientes los mensajes que fallaron tras los reintentos.
+    Devuelve cuántos envíos quedaron confirmados.
+    """
+    ahora = datetime.now(TZ_RD).timestamp()
+    pendientes = [
+        p for p in (_leer_estado(FCM_PENDIENTES_ESTADO, []) or [])
+        if ahora - float(p.get("creado") or 0) < FCM_PENDIENTES_TTL
+    ]
+    if not envios and not pendientes:
+        return 0
+
+    if sent_cache is None:
+        sent_cache = load_sent_cache()
+
+    cola = list(envios)
+    creado = {e["id"]: ahora for e in envios}
+    for p in pendientes:
+        if p["id"] in sent_cache or p["id"] in creado:
+            continue
+        print(f"🔁 Reintentando envío pendiente: {p['id']}")
+        cola.append({"id": p["id"], "mensajes": [tuple(m) for m in p["mensajes"]]})
+        creado[p["id"]] = float(p["creado"])
+
+    confirmados = []
+
+    def al_completar(dedupe_id, resultados):
+        # Se marca en cuanto FCM confirma: si la corrida se corta, no se reenvía.
+        if all(res["estado"] == "ok" for res in resultados):
+            sent_cache.marcar(dedupe_id)
+            confirmados.append(dedupe_id)
+
+    cliente = _cliente_fcm()
+    despachador = DespachadorFCM(cliente)
+    por_id = despachador.ejecutar(cola, al_completar)
+    despachador.imprimir_resumen()
+    cliente.imprimir_estadisticas()
+
+    nuevos_pendientes = []
+    for dedupe_id, resultados in por_id.items():
+        if all(res["estado"] == "ok" for res in resultados):
+            continue
+        # Solo se reintenta lo que falló; lo confirmado no se duplica.
+        fallidos = [
+            [res["message"], res["destino"]]
+            for res in resultados
+            if res["estado"] == "error"
+        ]
+        if fallidos:
+            nuevos_pendientes.append({
+                "id": dedupe_id,
+                "creado": creado[dedupe_id],
+                "mensajes": fallidos,
+            })
+
+    if nuevos_pendientes:
+        print(f"⚠️ {len(nuevos_pendientes)} envíos quedan pendientes para la próxima corrida.")
+    _guardar_estado(FCM_PENDIENTES_ESTADO, nuevos_pendientes)
+    save_sent_cache(sent_cache)
+    return len(confirmados)
+
+# ---------- Planificador por horario de sorteos ----------
+# Calendario por lotería canónica en hora RD: minuto del sorteo (hora de la
+# fuente o de fecha_original), días en que hay sorteo y retraso con que se
+# publica (hora_scrapeo del primer avistamiento - hora del sorteo).
+PLAN_ESTADO = "calendario.json"
+PLAN_TOLERANCIA_MIN = 20         # horas más cercanas que esto son el mismo sorteo
+PLAN_RETRASO_DEFECTO = (0, 60)   # ventana de publicación mientras no hay datos
+PLAN_MARGEN_MIN = 10
+PLAN_RETRASO_MAX_MIN = 180       # más tarde que esto no se usa para aprender
+PLAN_ATRASO_MAX_MIN = 360        # un sorteo no visto tras esto se da por perdido hoy
+PLAN_MAX_RETRASOS = 30
+PLAN_DIAS_SEMANA_MIN = 14        # días de datos antes de confiar en los días de sorteo
+PLAN_DIAS_OLVIDO = 21
+PLAN_INTERVALO_RAPIDO = float(os.getenv("PLAN_INTERVALO_RAPIDO", "30"))
+PLAN_INTERVALO_ATRASADO = float(os.getenv("PLAN_INTERVALO_ATRASADO", "300"))
+PLAN_ESPERA_MAX = float(os.getenv("PLAN_ESPERA_MAX", "3600"))
+PLAN_PERIODO_CRON = float(os.getenv("PLAN_PERIODO_CRON", "600"))
+
+_RE_HORA_FECHA_ORIGINAL = re.compile(r'(\d{1,2}):(\d{2})\s*$')
+
+def _minuto_sorteo(r: Resultado):
+    """Minuto del día (RD) del sorteo, o None si la fuente no trae hora."""
+    if r.hora and _RE_HORA_AMPM.match(r.hora.replace(' ', '')):
+        hh, mm = _hora_a_hm(r.hora)
+        return hh * 60 + mm
+    m = _RE_HORA_FECHA_ORIGINAL.search(r.publico.get("fecha_original") or "")
+    if m:
+        return int(m.group(1)) * 60 + int(m.group(2))
+    return None
+
+def _minuto_scrapeo(r: Resultado):
+    """Minuto del día en que se vio el registro, si fue el mismo día del sorteo."""
+    hs = r.hora_scrapeo
+    if len(hs) < 16 or hs[:10] != r.fecha:
+        return None
+    try:
+        return int(hs[11:13]) * 60 + int(hs[14:16])
+    except ValueError:
+        return None
+
+def _percentil(valores: list, p: float):
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(p * len(orden)))]
+
+class PlanificadorSorteos:
+    """
+    Decide cuándo vale la pena volver a sondear: seguido dentro de las
+    ventanas de publicación con sorteos pendientes, espaciado si alguno viene
+    atrasado y dormido cuando ya se vio todo lo esperado.
+    """
+
+    def __init__(self, estado: dict = None):
+        estado = estado or {}
+        self.sorteos = estado.get("sorteos", {})   # canónica -> [sorteo]
+        self.vistos = estado.get("vistos", {})     # fecha -> {canónica: [minuto]}
+        self.ultima_corrida = estado.get("ultima_corrida")
 
-def save_sent_cache(cache: dict):
-    now = datetime.now(TZ_RD).timestamp()
-    # purga > 3 días
-    cache = {k:v for k,v in cache.items() if now - float(v) < 3*24*3600}
-    with open(SENT_CACHE, "w", encoding="utf-8") as f:
-        json.dump(cache, f)
-
-def _clean_for_json(items):
-    """Quita campos internos (_dt) antes de serializar al archivo público."""
-    clean = []
-    for r in items:
-        if isinstance(r, dict):
-            rr = dict(r)
-            for k in list(rr.keys()):
-                if k.startswith('_'):
-                    rr.pop(k, None)
-            clean.append(rr)
-    return clean
+    @classmethod
+    def desde_estado(cls):
+        plan = cls(_leer_estado(PLAN_ESTADO, {}))
+        if not plan.sorteos:
+            # Sin estado previo: el histórico publicado ya trae hora_scrapeo
+            # del primer avistamiento de cada resultado.
+            historico = cargar_historico(API_PATH)
+            if historico:
+                plan.registrar(normalizar_resultados(historico))
+                print(f"🗓️ Calendario de sorteos inicializado con {len(plan.sorteos)} loterías")
+        return plan
+
+    def _sorteo(self, canonica: str, minuto: int) -> dict:
+        lista = self.sorteos.setdefault(canonica, [])
+        for sorteo in lista:
+            if abs(sorteo["minuto"] - minuto) <= PLAN_TOLERANCIA_MIN:
+                return sorteo
+        sorteo = {"minuto": minuto, "dias": [], "retrasos": [], "primero": "", "ultimo": ""}
+        lista.append(sorteo)
+        return sorteo
+
+    def registrar(self, items):
+        """Aprende de resultados recién persistidos (Resultado o dicts públicos)."""
+        for r in items:
+            r = r if isinstance(r, Resultado) else Resultado(r)
+            minuto = _minuto_sorteo(r)
+            if minuto is None or not r.dt:
+                continue
+            sorteo = self._sorteo(r.canonica, minuto)
+            dia = r.dt.weekday()
+            if dia not in sorteo["dias"]:
+                sorteo["dias"] = sorted(sorteo["dias"] + [dia])
+            sorteo["primero"] = min(sorteo["primero"] or r.fecha, r.fecha)
+            sorteo["ultimo"] = max(sorteo["ultimo"], r.fecha)
+
+            visto = _minuto_scrapeo(r)
+            if visto is not None and 0 <= visto - minuto <= PLAN_RETRASO_MAX_MIN:
+                sorteo["retrasos"] = (sorteo["retrasos"] + [visto - minuto])[-PLAN_MAX_RETRASOS:]
+
+            vistos = self.vistos.setdefault(r.fecha, {}).setdefault(r.canonica, [])
+            if sorteo["minuto"] not in vistos:
+                vistos.append(sorteo["minuto"])
+
+    @staticmethod
+    def ventana(sorteo: dict) -> tuple:
+        """(desde, hasta) en minutos del día en que se espera ver publicado el sorteo."""
+        if sorteo["retrasos"]:
+            desde = _percentil(sorteo["retrasos"], 0.1)
+            hasta = _percentil(sorteo["retrasos"], 0.9)
+        else:
+            desde, hasta = PLAN_RETRASO_DEFECTO
+        return sorteo["minuto"] + desde - PLAN_MARGEN_MIN, sorteo["minuto"] + hasta + PLAN_MARGEN_MIN
+
+    @staticmethod
+    def _toca_hoy(sorteo: dict, ahora: datetime) -> bool:
+        if not sorteo["primero"]:
+            return True
+        dias_de_datos = (
+            datetime.strptime(sorteo["ultimo"], "%Y-%m-%d")
+            - datetime.strptime(sorteo["primero"], "%Y-%m-%d")
+        ).days
+        return dias_de_datos < PLAN_DIAS_SEMANA_MIN or ahora.weekday() in sorteo["dias"]
+
+    def decidir(self, ahora: datetime = None) -> tuple:
+        """(segundos hasta el próximo sondeo o None sin calendario, motivo)."""
+        if not self.sorteos:
+            return None, "sin calendario aprendido"
+        ahora = ahora or datetime.now(TZ_RD)
+        hoy = ahora.strftime("%Y-%m-%d")
+        minuto_actual = ahora.hour * 60 + ahora.minute + ahora.second / 60
+        vistos = self.vistos.get(hoy, {})
+
+        en_ventana, atrasados, proximo = [], [], None
+        for canonica, sorteos in self.sorteos.items():
+            for sorteo in sorteos:
+                if sorteo["minuto"] in vistos.get(canonica, []) or not self._toca_hoy(sorteo, ahora):
+                    continue
+                desde, hasta = self.ventana(sorteo)
+                if minuto_actual < desde:
+                    proximo = desde if proximo is None else min(proximo, desde)
+                elif minuto_actual <= hasta:
+                    en_ventana.append(canonica)
+                elif minuto_actual <= sorteo["minuto"] + PLAN_ATRASO_MAX_MIN:
+                    atrasados.append(canonica)
+
+        if en_ventana:
+            return PLAN_INTERVALO_RAPIDO, f"en ventana de publicación: {', '.join(sorted(set(en_ventana))[:5])}"
+
+        espera = PLAN_ESPERA_MAX
+        motivo = "todo lo esperado ya se vio"
+        if proximo is not None:
+            espera = min(espera, (proximo - minuto_actual) * 60)
+            hh, mm = divmod(int(proximo), 60)
+            motivo = f"próxima ventana a las {hh:02d}:{mm:02d}"
+        if atrasados:
+            espera = min(espera, PLAN_INTERVALO_ATRASADO)
+            motivo = f"{len(set(atrasados))} sorteos atrasados"
+        return max(espera, PLAN_INTERVALO_RAPIDO), motivo
+
+    def debe_correr(self, ahora: datetime = None) -> tuple:
+        """Para el cron: corre si toca antes del próximo tick o si lleva mucho sin correr."""
+        espera, motivo = self.decidir(ahora)
+        if espera is None or espera <= PLAN_PERIODO_CRON:
+            return True, motivo
+        if not self.ultima_corrida or time.time() - self.ultima_corrida >= PLAN_ESPERA_MAX:
+            return True, f"{motivo}; corrida de control"
+        return False, motivo
+
+    def guardar(self):
+        hoy = datetime.now(TZ_RD)
+        corte_vistos = (hoy - timedelta(days=2)).strftime("%Y-%m-%d")
+        corte_sorteos = (hoy - timedelta(days=PLAN_DIAS_OLVIDO)).strftime("%Y-%m-%d")
+        self.vistos = {f: v for f, v in self.vistos.items() if f >= corte_vistos}
+        self.sorteos = {
+            lot: vigentes
+            for lot, sorteos in self.sorteos.items()
+            if (vigentes := [s for s in sorteos if s["ultimo"] >= corte_sorteos])
+        }
+        _guardar_estado(PLAN_ESTADO, {
+            "sorteos": self.sorteos,
+            "vistos": self.vistos,
+            "ultima_corrida": self.ultima_corrida,
+        })
 
 # ---------- MAIN ----------
-def main():
-    print("🔍 Buscando en loteriasdominicanas.com...")
-    resultados_ld = scrapear_loterias_dominicanas()
-    print(f"✅ {len(resultados_ld)} resultados en loteriasdominicanas.com")
+def main(forzar=False, adaptativo=False):
+    planificador = PlanificadorSorteos.desde_estado()
+    if adaptativo and not forzar:
+        correr, motivo = planificador.debe_correr()
+        if not correr:
+            print(f"🗓️ Se omite la corrida: {motivo}.")
+            return ESTADO_SIN_CAMBIOS
+        print(f"🗓️ Corrida programada: {motivo}.")
 
-    print("🔍 Buscando en tusnumerosrd.com...")
-    resultados_tn = scrapear_tusnumerosrd()
+    TELEMETRIA.iniciar()
+    estado = "error"
+    try:
+        print("🔍 Buscando en loteriasdominicanas.com y tusnumerosrd.com (en paralelo)...")
+        salidas = obtener_fuentes(forzar=forzar)
+        planificador.ultima_corrida = time.time()
+        planificador.guardar()
+        estado = procesar_salidas(salidas, planificador=planificador)
+        return estado
+    finally:
+        manifiesto = leer_manifiesto(API_PATH) or {}
+        TELEMETRIA.publicar(
+            estado,
+            mensaje=f"HOY {manifiesto['hoy']}: {manifiesto.get('registros_hoy')} resultados ({estado})"
+            if manifiesto.get("hoy") else None
+        )
+
+def procesar_salidas(salidas: dict, almacen=None, sent_cache: CacheEnviados = None,
+                     solo_con_delta: bool = False, planificador: PlanificadorSorteos = None) -> str:
+    """
+    Normaliza, persiste y notifica lo que trajeron las fuentes. Una corrida
+    normal abre su almacén; --watch pasa el mismo almacén y sent_cache en
+    cada sondeo y, con solo_con_delta=True, no reescribe nada si no hay
+    registros nuevos. Lo persistido alimenta el calendario de sorteos.
+    """
+    resultados_ld = salidas["loteriasdominicanas"]["resultados"]
+    resultados_tn = salidas["tusnumerosrd"]["resultados"]
+    print(f"✅ {len(resultados_ld)} resultados en loteriasdominicanas.com")
     print(f"✅ {len(resultados_tn)} resultados en tusnumerosrd.com")
 
+    sin_cambios = [c for c, s in salidas.items() if s["sin_cambios"]]
+    for clave in sin_cambios:
+        motivo = "solo filas ya procesadas" if salidas[clave].get("saltadas") else "huella igual a la última corrida"
+        print(f"💤 {FUENTES[clave]['dominio']}: {motivo}")
+
+    # Corto circuito: nada cambió en ninguna fuente desde la última corrida
+    # exitosa, o lo único que no cambió es lo que sigue en pie. No se toca
+    # el histórico ni la API y el workflow omite validar/publicar/commitear.
+    if sin_cambios and not resultados_ld and not resultados_tn:
+        caidas = [c for c in salidas if c not in sin_cambios]
+        if caidas:
+            print(f"⚠️ Fuentes sin respuesta: {', '.join(caidas)}")
+        print("💤 Sin cambios en las fuentes; no se reescribe nada.")
+        # Una fuente cuya página cambió solo en filas conocidas trae huella
+        # y marca nuevas: se guardan para no volver a recorrerla.
+        guardar_huellas(salidas)
+        # Aun sin cambios se reintentan envíos pendientes; si alguno sale,
+        # sent_cache/ cambió y hay que dejar que el workflow lo commitee.
+        if despachar_notificaciones([], sent_cache):
+            return ESTADO_ACTUALIZADO
+        return ESTADO_SIN_CAMBIOS
+
     print("")
     print("=====================================")
     print("📊 RESUMEN DE SCRAPING")
@@ -666,26 +3607,26 @@ def main():
             "Se aborta para no sobrescribir la API con datos inválidos."
         )
 
-    if not resultados_ld:
+    if not resultados_ld and "loteriasdominicanas" not in sin_cambios:
         print("⚠️ LoteriasDominicanas no devolvió resultados; se continúa con TusNumerosRD.")
 
-    if not resultados_tn:
+    if not resultados_tn and "tusnumerosrd" not in sin_cambios:
         print("⚠️ TusNumerosRD no devolvió resultados; se continúa con LoteriasDominicanas.")
 
-    nuevos = resultados_ld + resultados_tn
+    # Cada fila se normaliza una sola vez; el resto del pipeline usa Resultado.
+    nuevos = normalizar_resultados(resultados_ld + resultados_tn)
 
     # 1) SOLO HOY (RD)
     solo_hoy = []
     descartados_fecha = 0
 
-    for r in nuevos:
-        dt = parse_dt(r)
-
-        if dt and is_today(dt):
-            r["_dt"] = dt
-            solo_hoy.append(r)
-        else:
-            descartados_fecha += 1
+    with TELEMETRIA.etapa("filtro_fecha", filas=len(nuevos)) as t:
+        for r in nuevos:
+            if r.dt and is_today(r.dt):
+                solo_hoy.append(r)
+            else:
+                descartados_fecha += 1
+        t.update(hoy=len(solo_hoy), descartados=descartados_fecha)
 
     print(
         f"📅 Resultados de HOY (RD): {len(solo_hoy)} | "
@@ -695,13 +3636,21 @@ def main():
     # Blindaje crítico:
     # si las fuentes trajeron contenido pero nada puede reconocerse como "hoy",
     # NO se reescribe el archivo ni se da una falsa ejecución correcta.
+    # Con parseo incremental lo de hoy puede estar todo entre lo saltado:
+    # lo nuevo de la página no es de hoy y no hay nada que persistir.
+    if not solo_hoy and any(s.get("saltadas") for s in salidas.values()):
+        print("💤 Lo de hoy ya estaba procesado (marca de agua); nada que persistir.")
+        despachar_notificaciones([], sent_cache)
+        guardar_huellas(salidas)
+        return ESTADO_SIN_CAMBIOS
+
     if not solo_hoy:
         muestra_fechas = [
             {
-                "loteria": r.get("loteria"),
-                "fecha_original": r.get("fecha_original"),
-                "fecha": r.get("fecha"),
-                "hora": r.get("hora")
+                "loteria": r.loteria,
+                "fecha_original": r.publico.get("fecha_original"),
+                "fecha": r.fecha,
+                "hora": r.hora
             }
             for r in nuevos[:10]
         ]
@@ -716,81 +3665,72 @@ def main():
         )
 
     # 2) Persistencia del archivo público (guardamos lo de hoy sobre histórico)
-    # Se conserva exactamente el comportamiento histórico original.
-    historico = cargar_historico()
-    delta = delta_nuevos(historico, solo_hoy)
-    delta = compactar_delta(delta)
+    # El almacén decide cuánto histórico leer y cómo escribirlo (SCRAPER_STORAGE).
+    almacen = almacen or abrir_almacen()
+    with TELEMETRIA.etapa("cargar_historico") as t:
+        historico = almacen.cargar_recientes()
+        t["filas"] = len(historico)
+    with TELEMETRIA.etapa("dedupe", filas=len(solo_hoy)) as t:
+        # persistidos: filas de sorteos que no estaban (calendario y avisos);
+        # cambios: registros fusionados a escribir, incluidos los sorteos ya
+        # guardados a los que otra fuente les agregó hora, logo, etc.
+        persistidos = delta_nuevos(historico, solo_hoy)
+        cambios = fusionar_con_historico(historico, solo_hoy)
+        delta = compactar_delta(persistidos)
+        t.update(nuevos=len(persistidos), fusionados=len(cambios), delta=len(delta))
 
-    resultados_actualizados = evitar_duplicados(historico, solo_hoy)
-    resultados_a_grabar = _clean_for_json(resultados_actualizados)
+    if solo_con_delta and not cambios:
+        print("💤 Nada nuevo respecto al histórico en memoria.")
+        despachar_notificaciones([], sent_cache)
+        guardar_huellas(salidas)
+        return ESTADO_SIN_CAMBIOS
 
-    # Validación antes de tocar el archivo público.
-    if not isinstance(resultados_a_grabar, list) or not resultados_a_grabar:
-        raise RuntimeError(
-            "CRITICAL: El resultado final que se iba a guardar está vacío o es inválido."
-        )
-
-    payload_publico = {
-        "generado": datetime.now(TZ_RD).isoformat(),
-        "resultados": resultados_a_grabar
-    }
+    sha_previo = (leer_manifiesto(API_PATH) or {}).get("sha256")
+    with TELEMETRIA.etapa("escritura_json") as t:
+        total_publicado = almacen.guardar(cambios)
+        t["registros"] = total_publicado
+        if total_publicado is not None:
+            t["bytes"] = (leer_manifiesto(API_PATH) or {}).get("bytes")
+    if planificador is not None and persistidos:
+        planificador.registrar(persistidos)
+        planificador.guardar()
+    if total_publicado is not None:
+        print(f"📦 Guardados {total_publicado} en {API_PATH}")
+        manifiesto = leer_manifiesto(API_PATH) or {}
+        print(f"🔐 sha256={manifiesto.get('sha256')} | hoy={manifiesto.get('registros_hoy')}")
+        with TELEMETRIA.etapa("fragmentos") as t:
+            t.update(publicar_fragmentos(almacen.iterar_todo(), tocados=cambios))
+        with TELEMETRIA.etapa("estadisticas") as t:
+            t.update(actualizar_estadisticas(persistidos, sha_previo, almacen))
 
-    # Escritura atómica: primero temporal, luego reemplazo.
-    # Evita dejar un JSON cortado/corrupto si el proceso se interrumpe.
-    tmp_path = "resultados_combinados.json.tmp"
-    final_path = "resultados_combinados.json"
-
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(payload_publico, f, indent=2, ensure_ascii=False)
-        f.flush()
-        os.fsync(f.fileno())
-
-    # Verifica que el archivo temporal sea JSON válido antes de publicarlo.
-    with open(tmp_path, "r", encoding="utf-8") as f:
-        verificacion = json.load(f)
-
-    if (
-        not isinstance(verificacion, dict)
-        or not isinstance(verificacion.get("resultados"), list)
-        or len(verificacion["resultados"]) == 0
-    ):
-        try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
-        raise RuntimeError(
-            "CRITICAL: La validación del JSON temporal falló. "
-            "No se reemplazó el archivo público."
-        )
-
-    os.replace(tmp_path, final_path)
-
-    print(f"📦 Guardados {len(resultados_a_grabar)} en resultados_combinados.json")
     print(f"➕ Nuevos HOY a enviar: {len(delta)}")
 
     # Si no hay delta, el JSON se mantiene actualizado pero no se repiten notificaciones.
     if not delta:
         print("↩️ No hay resultados nuevos para notificar.")
-        return
+        despachar_notificaciones([], sent_cache)
+        guardar_huellas(salidas)
+        return ESTADO_ACTUALIZADO
 
     # 3) Idempotencia entre corridas
-    sent_cache = load_sent_cache()
+    if sent_cache is None:
+        sent_cache = load_sent_cache()
+    envios = []
 
-    # 4) Envío por lotería canónica (toma el más reciente por _dt)
+    # 4) Envío por lotería canónica (toma el más reciente por dt)
     por_loteria = {}
     for r in delta:
-        lot_can = canonicaliza_loteria(r["loteria"])
-        por_loteria.setdefault(lot_can, []).append(r)
+        por_loteria.setdefault(r.canonica, []).append(r)
 
     for lot, items in por_loteria.items():
-        items.sort(key=lambda x: x.get("_dt") or datetime.min.replace(tzinfo=TZ_RD))
+        items.sort(key=lambda x: x.dt)
         last = items[-1]
-        fecha_txt = last.get("fecha") or ""
-        hora_txt = last.get("hora") or ""
-        numeros = last.get("numeros") or []
+        fecha_txt = last.fecha
+        hora_txt = last.hora or ""
+        numeros = last.numeros
         nums_txt = " ".join([str(x).zfill(2) for x in numeros])  # preserva ceros
 
-        dedupe_id = f"{topic_seguro(lot)}|{nums_key(numeros)}|{fecha_txt}"
+        dedupe_id = f"{last.topic}|{last.numeros_key}|{fecha_txt}"
         if dedupe_id in sent_cache:
             print(f"↩️ Ya enviado (cache): {dedupe_id}")
             continue
@@ -801,39 +3741,409 @@ def main():
             "fecha": fecha_txt,
             "hora": hora_txt,
             "numeros": nums_txt,
-            "fuente": last.get("fuente", ""),
+            "fuente": last.fuente,
         }
 
         title = f"Resultados de {lot}"
         body = f"{nums_txt} • {fecha_txt}" + (f" · {hora_txt}" if hora_txt else "")
 
-        topic_especifico = topic_seguro(lot)                    # canónico
-        topic_alias = topic_seguro(last.get("loteria") or lot)  # alias crudo tal como viene
+        topic_especifico = last.topic        # canónico
+        topic_alias = last.topic_alias       # alias crudo tal como viene
         collapse = f"{topic_especifico}_{fecha_txt}"
         tag = dedupe_id  # estable por lotería+fecha+números
 
-        # a) tópico específico (canónico)
-        enviar_fcm_v1(
-            title, body, topic_especifico, payload,
-            collapse_key=collapse, tag=tag, ttl_seconds=900
-        )
+        def mensaje(topic):
+            return (
+                _mensaje_fcm(title, body, topic, payload, collapse, tag, ttl_seconds=900),
+                f"/topics/{topic}"
+            )
 
+        # a) tópico específico (canónico)
         # b) alias “raw” por compatibilidad con suscripciones antiguas
+        # c) tópico global
+        topicos = [topic_especifico]
         if topic_alias != topic_especifico:
-            enviar_fcm_v1(
-                title, body, topic_alias, payload,
-                collapse_key=collapse, tag=tag, ttl_seconds=900
-            )
+            topicos.append(topic_alias)
+        topicos.append(TOPIC_GLOBAL)
 
-        # c) tópico global
-        enviar_fcm_v1(
-            title, body, TOPIC_GLOBAL, payload,
-            collapse_key=collapse, tag=tag, ttl_seconds=900
+        condicion = condicion_topicos(topicos) if FCM_MODO_ENVIO == "condicion" else None
+        if condicion:
+            mensajes = [(
+                _mensaje_fcm(title, body, None, payload, collapse, tag,
+                             ttl_seconds=900, condition=condicion),
+                f"condición {condicion}"
+            )]
+        else:
+            mensajes = [mensaje(t) for t in topicos]
+
+        envios.append({"id": dedupe_id, "mensajes": mensajes})
+
+    # 5) Todo sale en paralelo; sent_cache solo marca envíos confirmados.
+    despachar_notificaciones(envios, sent_cache)
+    guardar_huellas(salidas)
+    return ESTADO_ACTUALIZADO
+
+# ---------- Modo --watch ----------
+# Proceso de larga duración (runner propio): un solo Chromium con las páginas
+# abiertas, histórico y sent_cache en memoria, sondeo cada `intervalo`
+# segundos y reciclado del navegador cada `reciclar_cada` sondeos para
+# acotar la memoria. SIGINT/SIGTERM terminan el sondeo en curso y salen.
+WATCH_INTERVALO = float(os.getenv("WATCH_INTERVALO", "60"))
+WATCH_RECICLAR_CADA = int(os.getenv("WATCH_RECICLAR_CADA", "60"))
+
+async def _vigilar_async(intervalo: float, reciclar_cada: int, adaptativo: bool = False):
+    claves = list(FUENTES)
+    navegador = _NavegadorCompartido(persistente=True)
+    almacen = abrir_almacen()
+    sent_cache = load_sent_cache()
+    planificador = PlanificadorSorteos.desde_estado()
+
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, parar.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    print(
+        f"👀 Modo watch: sondeo "
+        + ("según calendario de sorteos" if adaptativo else f"cada {intervalo:.0f}s")
+        + f", reciclado cada {reciclar_cada} sondeos."
+    )
+    sondeo = 0
+    try:
+        while not parar.is_set():
+            sondeo += 1
+            inicio = time.monotonic()
+            huellas = _leer_estado(HUELLAS_ESTADO, {}) or {}
+            TELEMETRIA.iniciar()
+            estado = "error"
+            try:
+                salidas = await _obtener_fuentes_async(claves, huellas, False, navegador)
+                estado = await asyncio.to_thread(
+                    procesar_salidas, salidas, almacen, sent_cache, True, planificador
+                )
+                print(f"🔁 Sondeo {sondeo}: {estado} en {time.monotonic() - inicio:.1f}s")
+            except Exception as e:
+                # Sin guardar_huellas: el próximo sondeo vuelve a procesar todo.
+                print(f"❌ Sondeo {sondeo} falló: {repr(e)}")
+            TELEMETRIA.publicar(estado)
+
+            if reciclar_cada and sondeo % reciclar_cada == 0 and navegador.activo:
+                print("♻️ Reciclando Chromium para liberar memoria...")
+                await navegador.cerrar()
+
+            espera = intervalo
+            if adaptativo:
+                calculada, motivo = planificador.decidir()
+                if calculada is not None:
+                    espera = calculada
+                print(f"🗓️ Próximo sondeo en {espera:.0f}s ({motivo})")
+            espera = max(0.0, espera - (time.monotonic() - inicio))
+            try:
+                await asyncio.wait_for(parar.wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        print("🛑 Cerrando modo watch...")
+        await navegador.cerrar()
+        if hasattr(almacen, "cerrar"):
+            almacen.cerrar()
+        sent_cache.cerrar()
+
+def vigilar(intervalo: float = WATCH_INTERVALO, reciclar_cada: int = WATCH_RECICLAR_CADA,
+            adaptativo: bool = False):
+    asyncio.run(_vigilar_async(intervalo, reciclar_cada, adaptativo))
+
+# ---------- Backfill histórico (--backfill DESDE HASTA) ----------
+# Recupera días pasados (una caída, una fuente nueva) con la página por
+# fecha de cada fuente: descargas por un pool acotado de workers HTTP,
+# Chromium (pocas páginas a la vez) solo para lo que el HTML del servidor
+# no trae, parseo en un pool de procesos y una sola escritura fusionada
+# con el histórico. No notifica ni toca sent_cache ni el calendario.
+# La plantilla de URL recibe {fecha} como date ({fecha:%d-%m-%Y}) y se
+# puede cambiar con SCRAPER_BACKFILL_URL_<CLAVE> o --url clave=plantilla
+# (por ejemplo, para apuntar a fixtures locales). La plantilla por defecto de
+# loteriasdominicanas no está verificada contra el sitio.
+BACKFILL_WORKERS = int(os.getenv("SCRAPER_BACKFILL_WORKERS", "8"))
+BACKFILL_PAGINAS = int(os.getenv("SCRAPER_BACKFILL_PAGINAS", "3"))
+BACKFILL_PROCESOS = int(os.getenv("SCRAPER_BACKFILL_PROCESOS", "0"))  # 0 = un proceso por CPU
+
+def dias_backfill(desde: str, hasta: str) -> list:
+    """Días de [desde, hasta] (AAAA-MM-DD, ambos incluidos); ValueError si el rango no es válido."""
+    inicio = datetime.strptime(desde, "%Y-%m-%d").date()
+    fin = datetime.strptime(hasta, "%Y-%m-%d").date()
+    if fin < inicio:
+        raise ValueError(f"rango vacío: {desde} > {hasta}")
+    return [inicio + timedelta(days=i) for i in range((fin - inicio).days + 1)]
+
+def plantillas_backfill(extra: dict = None) -> dict:
+    """{clave: plantilla de URL por fecha}; las fuentes sin plantilla no entran al backfill."""
+    plantillas = {}
+    for clave, cfg in FUENTES.items():
+        plantilla = (
+            (extra or {}).get(clave)
+            or os.getenv(f"SCRAPER_BACKFILL_URL_{clave.upper()}")
+            or cfg.get("url_fecha")
         )
+        if plantilla:
+            plantillas[clave] = plantilla
+    return plantillas
 
-        sent_cache[dedupe_id] = datetime.now(TZ_RD).timestamp()
+def _anclar_anio(fila: dict, dia: date) -> dict:
+    """
+    Las fechas sin año ("15 julio") se normalizan con el año en curso; en la
+    página de un día pasado el año es el de ese día, o el anterior si la
+    fecha quedaría después de la página (diciembre visto en enero).
+    """
+    m = _RE_FECHA_ISO.match(fila.get("fecha") or "")
+    if not m or re.search(r"\d{4}", fila.get("fecha_original") or ""):
+        return fila
+    for anio in (dia.year, dia.year - 1):
+        try:
+            fecha = date(anio, int(m.group(2)), int(m.group(3)))
+        except ValueError:
+            continue
+        if fecha <= dia:
+            fila["fecha"] = fecha.isoformat()
+            break
+    return fila
 
-    save_sent_cache(sent_cache)
+def _parsear_pagina_fecha(clave: str, dia: str, html: str) -> dict:
+    """Corre en el pool de procesos: valida los selectores y parsea una página por fecha."""
+    inicio = time.perf_counter()
+    # Los parsers narran fila por fila; en el backfill solo cuenta el resumen.
+    with contextlib.redirect_stdout(io.StringIO()):
+        faltan, _, soup = _analizar_html(clave, html)
+        filas = [] if faltan else FUENTES[clave]["parser"](html, soup)
+    anclaje = datetime.strptime(dia, "%Y-%m-%d").date()
+    return {
+        "faltan": faltan,
+        "filas": [_anclar_anio(f, anclaje) for f in filas],
+        "ms": round((time.perf_counter() - inicio) * 1000, 1),
+    }
+
+def _descargar_pagina_fecha(clave: str, url: str) -> tuple:
+    """(html, motivo); html es None cuando hay que pedir la página a Chromium."""
+    try:
+        r = _http_session().get(url, timeout=FUENTES[clave]["timeout_http"])
+    except requests.RequestException as e:
+        return None, f"GET falló: {repr(e)}"
+    if r.status_code != 200:
+        return None, f"HTTP {r.status_code}"
+    if "charset" not in r.headers.get("Content-Type", "").lower():
+        r.encoding = r.apparent_encoding
+    return r.text, f"HTTP 200, {len(r.text)} bytes"
+
+async def _descargar_con_navegador(paginas: list, max_paginas: int = BACKFILL_PAGINAS) -> list:
+    """HTML (o None) de cada (clave, url) con a lo sumo `max_paginas` páginas abiertas."""
+    navegador = _NavegadorCompartido()
+    semaforo = asyncio.Semaphore(max(1, max_paginas))
+
+    async def una(clave: str, url: str):
+        cfg = FUENTES[clave]
+        async with semaforo:
+            context = None
+            try:
+                context, page, _ = await navegador.pagina(clave)
+                await page.goto(url, wait_until="domcontentloaded", timeout=cfg["timeout_goto"])
+                try:
+                    await page.wait_for_selector(cfg["selector"], timeout=cfg["timeout_selector"])
+                except Exception:
+                    if cfg["selector_obligatorio"]:
+                        raise
+                return await page.content()
+            except Exception as e:
+                print(f"❌ {url}: {repr(e)}")
+                return None
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+
+    try:
+        return await asyncio.gather(*(una(clave, url) for clave, url in paginas))
+    finally:
+        await navegador.cerrar()
+
+def backfill(desde: str, hasta: str, plantillas: dict = None, workers: int = BACKFILL_WORKERS,
+             procesos: int = BACKFILL_PROCESOS, almacen=None) -> str:
+    """
+    Trae los resultados de [desde, hasta] de cada fuente con plantilla y los
+    fusiona con el histórico (API viva y archivo mensual) en una escritura.
+    Devuelve ESTADO_ACTUALIZADO o ESTADO_SIN_CAMBIOS, como main().
+    """
+    dias = dias_backfill(desde, hasta)
+    plantillas = plantillas_backfill(plantillas)
+    for clave in FUENTES:
+        if clave not in plantillas:
+            print(f"⏭️ {FUENTES[clave]['dominio']}: sin plantilla de URL por fecha; se omite.")
+    paginas = [
+        (clave, dia, plantilla.format(fecha=dia))
+        for clave, plantilla in plantillas.items()
+        for dia in dias
+    ]
+    if not paginas:
+        print("💤 Ninguna fuente tiene página por fecha; nada que recuperar.")
+        return ESTADO_SIN_CAMBIOS
+    print(f"⏪ Backfill {desde} → {hasta}: {len(paginas)} páginas de {len(plantillas)} fuente(s)")
+
+    inicio = time.perf_counter()
+    filas, pendientes, fallidas = [], [], []
+    ms_parseo = 0.0
+
+    def recoger(parseos: dict):
+        nonlocal ms_parseo
+        for fut in as_completed(parseos):
+            clave, dia, url = parseos[fut]
+            res = fut.result()
+            ms_parseo += res["ms"]
+            if res["faltan"]:
+                pendientes.append((clave, dia, url, f"faltan selectores {res['faltan']}"))
+            else:
+                filas.extend(res["filas"])
+
+    with ProcessPoolExecutor(max_workers=procesos or None) as pool:
+        # Cada página se parsea apenas llega, mientras siguen las descargas.
+        parseos = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as descargas:
+            futuros = {
+                descargas.submit(_descargar_pagina_fecha, clave, url): (clave, dia, url)
+                for clave, dia, url in paginas
+            }
+            for fut in as_completed(futuros):
+                clave, dia, url = futuros[fut]
+                html, motivo = fut.result()
+                if html is None:
+                    pendientes.append((clave, dia, url, motivo))
+                else:
+                    parseos[pool.submit(_parsear_pagina_fecha, clave, dia.isoformat(), html)] = (clave, dia, url)
+        recoger(parseos)
+
+        if pendientes:
+            print(f"🧭 {len(pendientes)} páginas por Chromium ({BACKFILL_PAGINAS} a la vez)")
+            por_navegador, pendientes = pendientes, []
+            htmls = asyncio.run(_descargar_con_navegador([(c, url) for c, _, url, _ in por_navegador]))
+            parseos = {}
+            for (clave, dia, url, motivo), html in zip(por_navegador, htmls):
+                if html is None:
+                    fallidas.append((url, motivo))
+                else:
+                    parseos[pool.submit(_parsear_pagina_fecha, clave, dia.isoformat(), html)] = (clave, dia, url)
+            recoger(parseos)
+            fallidas.extend((url, motivo) for _, _, url, motivo in pendientes)
+
+    for url, motivo in fallidas:
+        print(f"❌ Sin resultados de {url} ({motivo})")
+
+    nuevos = [r for r in normalizar_resultados(filas) if desde <= r.fecha <= hasta]
+    print(
+        f"📄 {len(paginas) - len(fallidas)}/{len(paginas)} páginas, {len(filas)} filas "
+        f"({len(filas) - len(nuevos)} fuera del rango) en {time.perf_counter() - inicio:.1f}s; "
+        f"parseo {ms_parseo / 1000:.1f}s de CPU"
+    )
+    if not nuevos:
+        if filas:
+            print(
+                "⚠️ Todas las filas son de otros días: la plantilla de URL por fecha "
+                "probablemente no selecciona el día (revisar --url o SCRAPER_BACKFILL_URL_<CLAVE>)."
+            )
+        print("💤 El backfill no trajo resultados del rango.")
+        return ESTADO_SIN_CAMBIOS
+
+    # Se compara contra todo el histórico del rango, también lo ya archivado,
+    # para no volver a escribir sorteos conocidos.
+    almacen = almacen or abrir_almacen()
+    almacen.cargar_recientes()
+    historico = registros_archivados(desde, hasta) + [
+        r for r in almacen.iterar_todo() if desde <= (r.get("fecha") or "") <= hasta
+    ]
+    cambios = fusionar_con_historico(historico, nuevos)
+    print(f"🧮 {len(nuevos)} filas del rango → {len(cambios)} sorteos nuevos o fusionados")
+    if not cambios:
+        print("💤 El histórico ya tenía todo el rango.")
+        return ESTADO_SIN_CAMBIOS
+
+    sha_previo = (leer_manifiesto(API_PATH) or {}).get("sha256")
+    total_publicado = almacen.guardar(cambios)
+    if total_publicado is not None:
+        print(f"📦 Guardados {total_publicado} en {API_PATH}")
+        publicar_fragmentos(almacen.iterar_todo(), tocados=cambios)
+        actualizar_estadisticas(delta_nuevos(historico, nuevos), sha_previo, almacen)
+    return ESTADO_ACTUALIZADO
+
+def _publicar_estado_workflow(estado: str):
+    """Expone el estado como output del step (steps.<id>.outputs.estado)."""
+    salida = os.getenv("GITHUB_OUTPUT")
+    if not salida:
+        return
+    with open(salida, "a", encoding="utf-8") as f:
+        f.write(f"estado={estado}\n")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Scraper de resultados de lotería + FCM")
+    parser.add_argument(
+        "--forzar", action="store_true",
+        help="Ignora las huellas guardadas y procesa todas las fuentes."
+    )
+    parser.add_argument(
+        "--parseo-completo", action="store_true",
+        help="Parsea todas las filas aunque la marca de agua ya las conozca (verificación)."
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Proceso continuo: navegador caliente y sondeo periódico de las fuentes."
+    )
+    parser.add_argument(
+        "--intervalo", type=float, default=WATCH_INTERVALO,
+        help="Segundos entre sondeos en --watch."
+    )
+    parser.add_argument(
+        "--reciclar-cada", type=int, default=WATCH_RECICLAR_CADA,
+        help="Sondeos entre reinicios de Chromium en --watch (0 = nunca)."
+    )
+    parser.add_argument(
+        "--adaptativo", action="store_true",
+        help="Sondea según el calendario de sorteos: seguido en ventanas de publicación, "
+             "espaciado fuera de ellas (en corrida única, omite la corrida si no toca)."
+    )
+    parser.add_argument(
+        "--backfill", nargs=2, metavar=("DESDE", "HASTA"),
+        help="Recupera los resultados de un rango de días (AAAA-MM-DD) sin notificar."
+    )
+    parser.add_argument(
+        "--url", action="append", default=[], metavar="CLAVE=PLANTILLA",
+        help="Plantilla de URL por fecha para --backfill, p. ej. "
+             "tusnumerosrd=http://127.0.0.1:8765/{fecha:%%Y-%%m-%%d}/tn.html (repetible)."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=BACKFILL_WORKERS,
+        help="Descargas HTTP simultáneas en --backfill."
+    )
+    parser.add_argument(
+        "--procesos", type=int, default=BACKFILL_PROCESOS,
+        help="Procesos de parseo en --backfill (0 = uno por CPU)."
+    )
+    args = parser.parse_args()
+    if args.parseo_completo:
+        PARSEO_COMPLETO = True
+    if args.backfill:
+        plantillas = {}
+        for valor in args.url:
+            clave, sep, plantilla = valor.partition("=")
+            if not sep or clave not in FUENTES:
+                parser.error(f"--url espera CLAVE=PLANTILLA con CLAVE en {', '.join(FUENTES)}")
+            plantillas[clave] = plantilla
+        try:
+            dias_backfill(*args.backfill)
+        except ValueError as e:
+            parser.error(f"--backfill: {e}")
+        _publicar_estado_workflow(backfill(*args.backfill, plantillas=plantillas,
+                                           workers=args.workers, procesos=args.procesos))
+    elif args.watch:
+        vigilar(args.intervalo, args.reciclar_cada, args.adaptativo)
+    else:
+        _publicar_estado_workflow(main(forzar=args.forzar, adaptativo=args.adaptativo))
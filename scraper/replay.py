@@ -0,0 +1,268 @@
+"""
+Replay de extremo a extremo del scraper contra servidores locales.
+
+Sirve HTML de las fuentes (grabado o sintético, con el número de loterías y
+sorteos que se pida) desde un servidor local, corre main() completo en un
+directorio temporal y despacha las notificaciones a scraper/fcm_stub.py, que
+puede inyectar latencia, 429 y 5xx. Reporta el tiempo total de la corrida y
+la latencia de entrega por mensaje (reintentos incluidos):
+
+    python scraper/replay.py --factor 10 --sorteos 3
+    python scraper/replay.py --factor 10 --latencia-ms 120 --tasa-429 0.1 --tasa-5xx 0.05
+    python scraper/replay.py --fixtures scraper/fixtures   # HTML grabado tal cual
+
+El HTML grabado se sirve sin tocar: solo produce envíos si sus fechas son de
+hoy. Nada sale a la red: ni a las fuentes reales ni a Google.
+"""
+import argparse, contextlib, importlib, io, json, os, shutil, sys, tempfile, threading, time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fcm_stub import ServidorFCMStub  # noqa: E402
+
+FACTOR = 10
+
+# ---------- Fuentes locales ----------
+class ServidorFuentes:
+    """Sirve {ruta: html} por HTTP en un hilo, como si fueran las fuentes reales."""
+
+    def __init__(self, paginas: dict):
+        datos = {ruta: html.encode("utf-8") for ruta, html in paginas.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                cuerpo = datos.get(self.path)
+                if cuerpo is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def url(self, ruta: str) -> str:
+        host, puerto = self._httpd.server_address[:2]
+        return f"http://{host}:{puerto}{ruta}"
+
+    def detener(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+def nombres_loterias(base: list, n: int) -> list:
+    """Las n primeras loterías conocidas y, pasado ese número, loterías sintéticas."""
+    return list(base[:n]) + [f"Replay {i:03d}" for i in range(1, n - len(base) + 1)]
+
+def paginas_sinteticas(bench, loterias: int, sorteos: int) -> dict:
+    """{clave: html} con `sorteos` filas de hoy por lotería en cada fuente."""
+    hoy = datetime.now(bench.main.TZ_RD)
+    nombres = nombres_loterias(bench.LOTERIAS, loterias)
+    return {
+        clave: generar(hoy, loterias * sorteos, nombres)
+        for clave, generar in bench.GENERADORES.items()
+    }
+
+# ---------- Métricas ----------
+def _percentiles(valores: list) -> dict:
+    ordenados = sorted(valores)
+    if not ordenados:
+        return {"n": 0}
+
+    def p(q):
+        return round(ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))], 1)
+
+    return {
+        "n": len(ordenados),
+        "media_ms": round(sum(ordenados) / len(ordenados), 1),
+        "p50_ms": p(0.50),
+        "p95_ms": p(0.95),
+        "p99_ms": p(0.99),
+        "max_ms": round(ordenados[-1], 1),
+    }
+
+def resumen_envios(registro: dict, stub: ServidorFCMStub) -> dict:
+    """Latencia por mensaje (vista del despachador) y tráfico visto por el stub."""
+    envios = [e for e in registro["etapas"] if e["etapa"] == "fcm_envio"]
+    por_estado = {}
+    for e in envios:
+        por_estado[e.get("estado")] = por_estado.get(e.get("estado"), 0) + 1
+
+    llegadas = stub.registros
+    ventana_ms = None
+    if llegadas:
+        inicio = min(r["llegada"] for r in llegadas)
+        fin = max(r["llegada"] + r["ms"] / 1000 for r in llegadas)
+        ventana_ms = round((fin - inicio) * 1000, 1)
+
+    return {
+        "mensajes": len(envios),
+        "por_estado": por_estado,
+        "reintentos": sum(max(0, (e.get("intentos") or 1) - 1) for e in envios),
+        "latencia_entrega": _percentiles([e["ms"] for e in envios]),
+        "latencia_entrega_ok": _percentiles([e["ms"] for e in envios if e.get("estado") == "ok"]),
+        "ventana_despacho_ms": ventana_ms,
+        "stub": stub.resumen(),
+    }
+
+def resumen_etapas(registro: dict) -> list:
+    """Tiempo acumulado por etapa del pipeline (sin los envíos individuales)."""
+    acumulado = {}
+    for e in registro["etapas"]:
+        if e["etapa"] == "fcm_envio":
+            continue
+        total = acumulado.setdefault(e["etapa"], {"etapa": e["etapa"], "veces": 0, "ms": 0.0})
+        total["veces"] += 1
+        total["ms"] = round(total["ms"] + e["ms"], 1)
+    return sorted(acumulado.values(), key=lambda e: -e["ms"])
+
+def imprimir_reporte(reporte: dict):
+    envios = reporte["envios"]
+    lat = envios["latencia_entrega"]
+    print("")
+    print("=====================================")
+    print("🎬 RESUMEN DEL REPLAY")
+    print("=====================================")
+    print(f"Loterías x sorteos  : {reporte['loterias']} x {reporte['sorteos']} ({reporte['html']})")
+    print(f"Estado de main()    : {reporte['estado']}")
+    print(f"Tiempo total        : {reporte['total_ms'] / 1000:.2f} s")
+    print(f"Mensajes FCM        : {envios['mensajes']} | "
+          + " | ".join(f"{k}: {v}" for k, v in sorted(envios["por_estado"].items(), key=str)))
+    print(f"Reintentos          : {envios['reintentos']}")
+    if lat["n"]:
+        print(f"Entrega por mensaje : p50 {lat['p50_ms']} ms | p95 {lat['p95_ms']} ms | "
+              f"p99 {lat['p99_ms']} ms | max {lat['max_ms']} ms")
+    if envios["ventana_despacho_ms"] is not None:
+        print(f"Ventana de despacho : {envios['ventana_despacho_ms'] / 1000:.2f} s")
+    stub = envios["stub"]
+    print(f"Stub FCM            : {stub['requests']} requests | máx. en paralelo {stub['max_en_curso']} | "
+          + " | ".join(f"{k}: {v}" for k, v in sorted(stub["por_status"].items())))
+    print("Etapas más lentas   :")
+    for e in reporte["etapas"][:6]:
+        print(f"   {e['etapa']:<18} {e['ms']:>10.1f} ms ({e['veces']}x)")
+    print("=====================================")
+
+# ---------- Corrida ----------
+def main_replay():
+    parser = argparse.ArgumentParser(description="Replay de extremo a extremo con stub FCM")
+    parser.add_argument("--loterias", type=int,
+                        help=f"Loterías distintas en el HTML (por defecto {FACTOR}x las conocidas).")
+    parser.add_argument("--factor", type=float, default=FACTOR,
+                        help="Multiplica la cantidad de loterías conocidas si no se da --loterias.")
+    parser.add_argument("--sorteos", type=int, default=1, help="Sorteos de hoy por lotería y fuente.")
+    parser.add_argument("--fixtures", help="Directorio con {fuente}.html grabados; se sirven tal cual.")
+    parser.add_argument("--latencia-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--tasa-429", type=float, default=0.0)
+    parser.add_argument("--tasa-5xx", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--concurrencia", type=int, help="FCM_CONCURRENCIA para la corrida.")
+    parser.add_argument("--tasa", type=float, help="FCM_TASA_POR_SEG para la corrida.")
+    parser.add_argument("--reintentos", type=int, help="FCM_REINTENTOS para la corrida.")
+    parser.add_argument("--almacen", choices=["json", "jsonl", "sqlite"],
+                        help="SCRAPER_STORAGE para la corrida.")
+    parser.add_argument("--salida", help="Guarda el reporte en este JSON.")
+    parser.add_argument("--conservar", action="store_true",
+                        help="No borra el directorio de trabajo (histórico, estado, status.json).")
+    parser.add_argument("--verbose", action="store_true", help="Muestra la salida de main().")
+    args = parser.parse_args()
+
+    stub = ServidorFCMStub(0, args.latencia_ms, args.jitter_ms, args.tasa_429,
+                           args.tasa_5xx, args.retry_after, args.semilla).iniciar()
+    trabajo = tempfile.mkdtemp(prefix="replay_")
+    directorio_original = os.getcwd()
+
+    # Los módulos leen su configuración del entorno al importarse.
+    os.environ.update({
+        "FCM_ENDPOINT": stub.url,
+        "FCM_TOKEN_ESTATICO": "replay",
+        "SCRAPER_STATE_DIR": os.path.join(trabajo, ".scraper_state"),
+        "SCRAPER_API_DIR": os.path.join(trabajo, "api"),
+        "SCRAPER_ARCHIVO_DIR": os.path.join(trabajo, "archivo"),
+        "SCRAPER_STATUS_PATH": os.path.join(trabajo, "status.json"),
+    })
+    for variable, valor in (("FCM_CONCURRENCIA", args.concurrencia), ("FCM_TASA_POR_SEG", args.tasa),
+                            ("FCM_REINTENTOS", args.reintentos), ("SCRAPER_STORAGE", args.almacen)):
+        if valor is not None:
+            os.environ[variable] = str(valor)
+    bench = importlib.import_module("bench")
+    pipeline = bench.main
+
+    if args.fixtures:
+        htmls, origen = bench.cargar_fixtures(args.fixtures)
+        loterias = None
+    else:
+        loterias = args.loterias or max(1, round(len(bench.LOTERIAS) * args.factor))
+        htmls, origen = paginas_sinteticas(bench, loterias, args.sorteos), "sinteticos"
+
+    fuentes = ServidorFuentes({f"/{clave}.html": html for clave, html in htmls.items()})
+    for clave in htmls:
+        pipeline.FUENTES[clave]["url"] = fuentes.url(f"/{clave}.html")
+
+    print(f"🎬 Replay: {loterias or '?'} loterías x {args.sorteos} sorteos ({origen}) | "
+          f"FCM stub {stub.url} | concurrencia {pipeline.FCM_CONCURRENCIA} | "
+          f"{pipeline.FCM_TASA_POR_SEG:g} msg/s | trabajo {trabajo}")
+
+    log = io.StringIO()
+    estado = "error"
+    os.chdir(trabajo)
+    try:
+        inicio = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else log):
+                estado = pipeline.main(forzar=True)
+        except Exception as e:
+            print(log.getvalue()[-4000:])
+            print(f"❌ main() falló: {repr(e)}")
+        total_ms = (time.perf_counter() - inicio) * 1000
+    finally:
+        os.chdir(directorio_original)
+        fuentes.detener()
+        stub.detener()
+        if args.conservar:
+            print(f"📁 Directorio de trabajo: {trabajo}")
+        else:
+            shutil.rmtree(trabajo, ignore_errors=True)
+
+    registro = pipeline.TELEMETRIA.registro(estado)
+    reporte = {
+        "fecha": datetime.now(pipeline.TZ_RD).isoformat(),
+        "loterias": loterias,
+        "sorteos": args.sorteos,
+        "html": origen,
+        "estado": estado,
+        "total_ms": round(total_ms, 1),
+        "fcm": {
+            "concurrencia": pipeline.FCM_CONCURRENCIA,
+            "tasa_por_seg": pipeline.FCM_TASA_POR_SEG,
+            "reintentos": pipeline.FCM_REINTENTOS,
+            "modo": pipeline.FCM_MODO_ENVIO,
+        },
+        "stub": {
+            "latencia_ms": args.latencia_ms,
+            "jitter_ms": args.jitter_ms,
+            "tasa_429": args.tasa_429,
+            "tasa_5xx": args.tasa_5xx,
+            "retry_after": args.retry_after,
+        },
+        "envios": resumen_envios(registro, stub),
+        "etapas": resumen_etapas(registro),
+    }
+    imprimir_reporte(reporte)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"💾 Reporte en {args.salida}")
+    return 0 if estado != "error" else 1
+
+if __name__ == "__main__":
+    sys.exit(main_replay())
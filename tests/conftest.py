@@ -0,0 +1,42 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scraper"))
+
+import main  # noqa: E402
+
+LD = "loteriasdominicanas.com"
+TN = "tusnumerosrd.com"
+
+
+def fila(fuente=LD, loteria="Quiniela Leidsa", numeros=("26", "73", "04"), fecha=None, dias_atras=0, **extra):
+    """Fila cruda como la devuelve un scraper; sin `fecha`, hoy menos `dias_atras`."""
+    fecha = fecha or (datetime.now(main.TZ_RD) - timedelta(days=dias_atras)).strftime("%Y-%m-%d")
+    datos = {
+        "fuente": fuente,
+        "loteria": loteria,
+        "img": "",
+        "numeros": list(numeros),
+        "fecha_original": fecha,
+        "fecha": fecha,
+        "hora": None,
+        "hora_scrapeo": f"{fecha} 12:00:00",
+    }
+    datos.update(extra)
+    return datos
+
+
+def registro(fecha=None, loteria="Quiniela Leidsa", numeros=("26", "73", "04"), **extra):
+    """La misma fila ya en el esquema público."""
+    return main.registro_canonico(fila(LD, loteria, numeros, fecha=fecha, **extra))
+
+
+@pytest.fixture
+def aislado(tmp_path, monkeypatch):
+    """Corre la prueba en un directorio vacío con el estado del scraper adentro."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path / "estado"))
+    return tmp_path
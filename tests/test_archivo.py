@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import main
+from conftest import registro
+
+HOY = datetime(2026, 10, 18, 12, 0, tzinfo=main.TZ_RD)   # corte con 14 días: 2026-10-01
+
+
+def _rotar(registros, base_dir):
+    return main.rotar_historico(registros, base_dir=str(base_dir), retencion_dias=14, hoy=HOY)
+
+
+def _indice(base_dir):
+    with open(os.path.join(base_dir, "index.json"), encoding="utf-8") as f:
+        return {e["archivo"]: e for e in json.load(f)["archivos"]}
+
+
+def test_separa_la_ventana_y_archiva_los_meses_viejos(tmp_path):
+    registros = [registro("2026-08-30"), registro("2026-09-15"), registro("2026-10-02")]
+
+    calientes, corte = _rotar(registros, tmp_path)
+
+    assert corte == "2026-10-01"
+    assert [r["fecha"] for r in calientes] == ["2026-10-02"]
+    assert sorted(_indice(tmp_path)) == ["2026-08.json.gz", "2026-09.json.gz"]
+    assert [r["fecha"] for r in main._leer_parte_archivo(str(tmp_path / "2026-09.json.gz"))] == ["2026-09-15"]
+
+
+def test_rotar_dos_veces_no_reescribe_nada(tmp_path):
+    registros = [registro("2026-09-15"), registro("2026-10-02")]
+    _rotar(registros, tmp_path)
+    antes = {n: (tmp_path / n).read_bytes() for n in os.listdir(tmp_path)}
+    mtimes = {n: os.stat(tmp_path / n).st_mtime_ns for n in antes}
+
+    calientes, _ = _rotar(registros, tmp_path)
+
+    assert [r["fecha"] for r in calientes] == ["2026-10-02"]
+    assert {n: (tmp_path / n).read_bytes() for n in os.listdir(tmp_path)} == antes
+    assert {n: os.stat(tmp_path / n).st_mtime_ns for n in antes} == mtimes
+
+
+def test_lo_nuevo_de_un_mes_archivado_va_a_otra_parte(tmp_path):
+    _rotar([registro("2026-09-15")], tmp_path)
+    primera = (tmp_path / "2026-09.json.gz").read_bytes()
+
+    _rotar([registro("2026-09-15"), registro("2026-09-20", numeros=("01", "02", "03"))], tmp_path)
+
+    assert (tmp_path / "2026-09.json.gz").read_bytes() == primera   # inmutable
+    parte = main._leer_parte_archivo(str(tmp_path / "2026-09.p2.json.gz"))
+    assert [r["fecha"] for r in parte] == ["2026-09-20"]
+    entrada = _indice(tmp_path)["2026-09.p2.json.gz"]
+    assert (entrada["mes"], entrada["parte"]) == ("2026-09", 2)
+
+
+def test_indice_con_hash_y_conteos_de_cada_parte(tmp_path):
+    _rotar([registro("2026-09-03"), registro("2026-09-15"), registro("2026-09-15", numeros=("01", "02", "03"))],
+           tmp_path)
+
+    entrada = _indice(tmp_path)["2026-09.json.gz"]
+    data = (tmp_path / "2026-09.json.gz").read_bytes()
+    assert entrada["sha256"] == hashlib.sha256(data).hexdigest()
+    assert entrada["bytes"] == len(data)
+    assert entrada["registros"] == 3
+    assert (entrada["desde"], entrada["hasta"]) == ("2026-09-03", "2026-09-15")
+
+    # Sin index.json, el índice se reconstruye igual desde los archivos.
+    os.remove(tmp_path / "index.json")
+    assert main.indice_archivo(str(tmp_path))["2026-09.json.gz"] == entrada
+
+
+def test_un_sorteo_archivado_que_se_completa_va_fusionado_a_otra_parte(tmp_path):
+    _rotar([registro("2026-09-15")], tmp_path)
+    completado = dict(registro("2026-09-15"), fuente="tusnumerosrd.com",
+                      fuentes=["tusnumerosrd.com"], hora="8:55PM")
+
+    _rotar([completado], tmp_path)
+    _rotar([completado], tmp_path)   # la segunda vez ya no aporta nada
+
+    assert sorted(_indice(tmp_path)) == ["2026-09.json.gz", "2026-09.p2.json.gz"]
+    (r,) = main._leer_parte_archivo(str(tmp_path / "2026-09.p2.json.gz"))
+    assert r["hora"] == "8:55PM"
+    assert r["fuentes"] == ["loteriasdominicanas.com", "tusnumerosrd.com"]
+    (fusion,) = main.fusionar_registros(main.registros_archivados("2026-09-01", "2026-09-30", str(tmp_path)))
+    assert fusion == r
@@ -0,0 +1,77 @@
+import functools
+import os
+import threading
+from datetime import datetime, timedelta
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+HOY = datetime.now(main.TZ_RD).date()
+DIAS = [HOY - timedelta(days=8), HOY - timedelta(days=7)]
+ANUNCIOS = "<div class='ad'><script>var x=1;</script></div>" * 40
+
+
+def _pagina(dia, *loterias):
+    bloques = "".join(
+        "<div class='game-block'>"
+        f"<div class='game-info p-2'><div class='session-date'>{dia:%d-%m-%Y} 20:00</div>"
+        f"<div class='game-title'><span>{nombre}</span></div></div>"
+        f"<div class='game-scores'><span class='score'>{i:02d}</span><span class='score'>{dia.day:02d}</span></div>"
+        "</div>"
+        for i, nombre in enumerate(loterias)
+    )
+    return f"<html><body>{ANUNCIOS}{bloques}</body></html>"
+
+
+@pytest.fixture
+def sitio(aislado):
+    """Páginas por fecha servidas desde aislado/sitio/<AAAA-MM-DD>/ld.html."""
+    raiz = aislado / "sitio"
+    httpd = ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(SimpleHTTPRequestHandler, directory=str(raiz))
+    )
+    httpd.log_message = lambda *a: None
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    def publicar(dia, html):
+        os.makedirs(raiz / dia.isoformat(), exist_ok=True)
+        (raiz / dia.isoformat() / "ld.html").write_text(html, encoding="utf-8")
+
+    publicar.plantilla = {
+        "loteriasdominicanas": f"http://127.0.0.1:{httpd.server_address[1]}/{{fecha:%Y-%m-%d}}/ld.html"
+    }
+    yield publicar
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _backfill(plantilla):
+    return main.backfill(DIAS[0].isoformat(), DIAS[-1].isoformat(), plantilla, workers=2, procesos=1,
+                         almacen=main.AlmacenJSON())
+
+
+def test_backfill_con_plantilla_local_guarda_cada_dia(sitio):
+    for dia in DIAS:
+        sitio(dia, _pagina(dia, "Quiniela Leidsa", "Quiniela Loteka"))
+
+    assert _backfill(sitio.plantilla) == main.ESTADO_ACTUALIZADO
+
+    guardados = main.cargar_historico(main.API_PATH)
+    assert sorted((r["fecha"], r["loteria"]) for r in guardados) == sorted(
+        (dia.isoformat(), lot) for dia in DIAS for lot in ("Quiniela Leidsa", "Quiniela Loteka")
+    )
+    # Otra vez lo mismo: el histórico ya tiene el rango.
+    assert _backfill(sitio.plantilla) == main.ESTADO_SIN_CAMBIOS
+
+
+def test_pagina_que_ignora_la_fecha_no_escribe_nada(sitio, capsys):
+    # Como un sitio que no entiende el parámetro: cada URL devuelve lo de hoy.
+    for dia in DIAS:
+        sitio(dia, _pagina(HOY, "Quiniela Leidsa"))
+
+    assert _backfill(sitio.plantilla) == main.ESTADO_SIN_CAMBIOS
+
+    assert "Todas las filas son de otros días" in capsys.readouterr().out
+    assert not os.path.exists(main.API_PATH)
@@ -0,0 +1,76 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import main
+
+
+def _ts(dias_atras: int) -> float:
+    return (datetime.now(main.TZ_RD) - timedelta(days=dias_atras)).timestamp()
+
+
+def _dia(ts: float) -> str:
+    return datetime.fromtimestamp(ts, main.TZ_RD).strftime("%Y-%m-%d")
+
+
+def test_marcar_escribe_en_la_cubeta_del_dia_y_sobrevive_a_recargar(aislado):
+    cache = main.CacheEnviados("cubetas").cargar()
+    hoy, ayer = _ts(0), _ts(1)
+    cache["a|01|x"] = hoy
+    cache.marcar("b|02|x", ayer)
+    cache.marcar("a|01|x", ayer)  # ya marcado: no se duplica
+    cache.cerrar()
+
+    with open(os.path.join("cubetas", f"{_dia(hoy)}.log"), encoding="utf-8") as f:
+        assert f.read() == f"a|01|x\t{int(hoy)}\n"
+    with open(os.path.join("cubetas", f"{_dia(ayer)}.log"), encoding="utf-8") as f:
+        assert f.read() == f"b|02|x\t{int(ayer)}\n"
+
+    recargada = main.CacheEnviados("cubetas").cargar()
+    assert "a|01|x" in recargada and "b|02|x" in recargada
+    assert len(recargada) == 2
+
+
+def test_guardar_borra_las_cubetas_vencidas(aislado):
+    viejo, vigente = _ts(5), _ts(1)
+    os.makedirs("cubetas")
+    with open(os.path.join("cubetas", f"{_dia(viejo)}.log"), "w", encoding="utf-8") as f:
+        f.write(f"viejo\t{int(viejo)}\n")
+
+    cache = main.CacheEnviados("cubetas", ttl_dias=3).cargar()
+    assert "viejo" not in cache  # las cubetas vencidas ni se leen
+
+    cache.marcar("tarde", viejo)  # marcado en memoria hasta que se poda
+    cache.marcar("vigente", vigente)
+    assert "tarde" in cache
+    cache.guardar()
+
+    assert "tarde" not in cache and "vigente" in cache
+    assert sorted(os.listdir("cubetas")) == [f"{_dia(vigente)}.log"]
+
+
+def test_linea_cortada_se_ignora_y_se_recorta_antes_de_agregar(aislado):
+    ts = _ts(0)
+    os.makedirs("cubetas")
+    path = os.path.join("cubetas", f"{_dia(ts)}.log")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"entero\t{int(ts)}\ncorta\t12")
+
+    cache = main.CacheEnviados("cubetas").cargar()
+    assert "entero" in cache and "corta" not in cache
+
+    cache.marcar("nuevo", ts)
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == f"entero\t{int(ts)}\nnuevo\t{int(ts)}\n"
+
+
+def test_migra_sent_cache_json_y_lo_elimina(aislado):
+    vigente, vencido = _ts(1), _ts(10)
+    with open(main.SENT_CACHE, "w", encoding="utf-8") as f:
+        json.dump({"vigente": vigente, "vencido": vencido}, f)
+
+    cache = main.CacheEnviados("cubetas").cargar()
+
+    assert "vigente" in cache and "vencido" not in cache
+    assert not os.path.exists(main.SENT_CACHE)
+    assert os.listdir("cubetas") == [f"{_dia(vigente)}.log"]
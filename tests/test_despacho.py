@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+import main
+from fcm_stub import ServidorFCMStub
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Stub FCM sin latencia; `guion` fija el status de los primeros requests."""
+    servidor = ServidorFCMStub(retry_after=0).iniciar()
+    servidor.guion = []
+    lock = threading.Lock()
+
+    def sortear():
+        with lock:
+            return (servidor.guion.pop(0) if servidor.guion else 200), 0.0
+
+    servidor._sortear = sortear
+    monkeypatch.setattr(main, "FCM_ENDPOINT", servidor.url)
+    monkeypatch.setattr(main, "FCM_TOKEN_ESTATICO", "stub")
+    monkeypatch.setattr(main, "FCM_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(main, "_CLIENTE_FCM", None)
+    yield servidor
+    servidor.detener()
+
+
+def _envios(n, prefijo="sorteo"):
+    return [
+        {
+            "id": f"{prefijo}-{i}",
+            "mensajes": [(
+                main._mensaje_fcm("t", "b", f"topico_{i}", {}, f"c{i}", f"t{i}", 60),
+                f"/topics/topico_{i}",
+            )],
+        }
+        for i in range(n)
+    ]
+
+
+def _despachador(**kw):
+    return main.DespachadorFCM(main.ClienteFCM(), **kw)
+
+
+def test_429_y_5xx_se_reintentan_hasta_confirmar(stub):
+    stub.guion = [429, 503, 502]
+
+    por_id = _despachador(concurrencia=4, reintentos=3).ejecutar(_envios(6))
+
+    resultados = [res for lista in por_id.values() for res in lista]
+    assert all(res["estado"] == "ok" for res in resultados)
+    assert sum(res["intentos"] for res in resultados) == 6 + 3
+    assert stub.resumen()["por_status"] == {"200": 6, "429": 1, "503": 1, "502": 1}
+
+
+def test_5xx_persistente_agota_los_reintentos(stub):
+    stub.guion = [503] * 3
+
+    por_id = _despachador(concurrencia=1, reintentos=2).ejecutar(_envios(2))
+
+    fallido, siguiente = por_id["sorteo-0"][0], por_id["sorteo-1"][0]
+    assert (fallido["estado"], fallido["intentos"], fallido["detalle"]) == ("error", 3, "HTTP 503")
+    assert (siguiente["estado"], siguiente["intentos"]) == ("ok", 1)
+
+
+def test_token_bucket_limita_la_tasa(stub):
+    tasa, n = 20, 30
+
+    _despachador(concurrencia=8, tasa_por_seg=tasa).ejecutar(_envios(n))
+
+    llegadas = sorted(r["llegada"] for r in stub.registros)
+    assert len(llegadas) == n
+    # Ráfaga de `tasa` (capacidad del cubo) y después `tasa` por segundo.
+    for k, t in enumerate(llegadas):
+        assert k + 1 <= tasa + tasa * (t - llegadas[0]) + 1
+    assert llegadas[-1] - llegadas[0] >= (n - tasa) / tasa * 0.9
+    assert stub.max_en_curso <= 8
+
+
+def test_despacho_marca_confirmados_y_deja_pendientes_los_fallidos(stub, aislado):
+    cache = main.CacheEnviados("cubetas").cargar()
+    stub.guion = [503] * (main.FCM_REINTENTOS + 1)
+
+    assert main.despachar_notificaciones(_envios(1, "viejo"), cache) == 0
+    assert len(cache) == 0
+    (pendiente,) = main._leer_estado(main.FCM_PENDIENTES_ESTADO)
+    assert pendiente["id"] == "viejo-0"
+
+    # La corrida siguiente manda lo nuevo y reintenta el pendiente.
+    assert main.despachar_notificaciones(_envios(2), cache) == 3
+    assert all(i in cache for i in ("viejo-0", "sorteo-0", "sorteo-1"))
+    assert main._leer_estado(main.FCM_PENDIENTES_ESTADO) == []
@@ -0,0 +1,62 @@
+import json
+
+import main
+from conftest import LD, TN, fila
+
+
+def _corrida(almacen, filas) -> dict:
+    """Lo mismo que procesar_salidas hace con el histórico y las estadísticas."""
+    nuevos = main.normalizar_resultados(filas)
+    historico = almacen.cargar_recientes()
+    persistidos = main.delta_nuevos(historico, nuevos)
+    cambios = main.fusionar_con_historico(historico, nuevos)
+    sha_previo = (main.leer_manifiesto(main.API_PATH) or {}).get("sha256")
+    almacen.guardar(cambios)
+    return main.actualizar_estadisticas(persistidos, sha_previo, almacen, base_dir="api")
+
+
+def test_corridas_incrementales_igualan_al_calculo_completo(aislado):
+    corridas = [
+        [
+            fila(LD, "Quiniela Leidsa", ("26", "73", "04"), dias_atras=40),
+            fila(LD, "Quiniela Leidsa", ("01", "02", "03"), dias_atras=3),
+            fila(LD, "Quiniela Loteka", ("26", "99", "4"), dias_atras=3),
+        ],
+        [
+            # El mismo sorteo visto por la otra fuente: se completa, no se vuelve a contar.
+            fila(TN, "Leidsa Noche", ("01", "02", "03"), dias_atras=3, hora="8:55PM"),
+            fila(TN, "Quiniela Loteka", ("26", "73", "Roja", "1234"), dias_atras=1),
+        ],
+        [
+            fila(LD, "Quiniela Leidsa", ("26", "73", "04"), dias_atras=0),
+            fila(LD, "Quiniela Loteka", ("26", "99", "4"), dias_atras=3, img="https://cdn/l.png"),
+        ],
+    ]
+    almacen = main.AlmacenJSON()
+
+    modos = [_corrida(almacen, filas)["modo"] for filas in corridas]
+
+    assert modos == ["reconstruccion", "incremental", "incremental"]
+    completo = main.EstadisticasLoterias()
+    assert completo.sumar(main.fusionar_registros(f for filas in corridas for f in filas)) == 5
+    with open("api/stats.json", encoding="utf-8") as f:
+        publicado = json.load(f)
+    assert publicado == completo.resumen()
+
+    leidsa = publicado["loterias"][main.topic_seguro("Quiniela Leidsa")]
+    assert leidsa["sorteos"] == {"total": 3, "7": 2, "30": 2, "90": 3}
+    assert leidsa["frecuencia"]["total"]["26"] == 2
+    assert leidsa["dias_sin_salir"]["26"] == 0
+    assert ["26", "73", 2] in leidsa["pares"]
+
+
+def test_estado_desfasado_se_reconstruye(aislado):
+    almacen = main.AlmacenJSON()
+    _corrida(almacen, [fila(LD, "Quiniela Leidsa", ("01", "02", "03"), dias_atras=1)])
+    # Otro snapshot publicado sin pasar por estas estadísticas (p. ej. caché perdida).
+    almacen.guardar([main.registro_canonico(fila(LD, "Quiniela Real", ("04", "05", "06"), dias_atras=1))])
+
+    r = _corrida(almacen, [fila(LD, "Quiniela Leidsa", ("07", "08", "09"), dias_atras=0)])
+
+    assert r["modo"] == "reconstruccion"
+    assert r["sorteos"] == 3
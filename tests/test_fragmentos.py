@@ -0,0 +1,63 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import main
+from conftest import registro
+
+CORTE = main.corte_retencion()
+VIEJO = (datetime.strptime(CORTE, "%Y-%m-%d") - timedelta(days=5)).strftime("%Y-%m-%d")
+HOY = datetime.now(main.TZ_RD).strftime("%Y-%m-%d")
+
+CALIENTES = [
+    registro(HOY, "Quiniela Leidsa", ("01", "02", "03")),
+    registro(CORTE, "Quiniela Loteka", ("04", "05", "06")),
+]
+# Del mes pasado: cuando se publicaron estaban en la ventana.
+VIEJOS = [
+    registro(VIEJO, "Quiniela Leidsa", ("07", "08", "09")),
+    registro(VIEJO, "Quiniela Real", ("10", "11", "12")),
+]
+
+
+def _archivos(base):
+    return sorted(
+        os.path.relpath(os.path.join(raiz, n), base).replace(os.sep, "/")
+        for raiz, _, nombres in os.walk(base) for n in nombres
+    )
+
+
+def _leer(base, ruta):
+    with open(os.path.join(base, ruta), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _comparar_con_reconstruccion(base):
+    main.publicar_fragmentos(iter(CALIENTES), base_dir="completo")
+    assert _archivos(base) == _archivos("completo")
+    for ruta in _archivos("completo"):
+        if ruta.endswith(".json") and not ruta.endswith(".min.json"):
+            assert _leer(base, ruta) == _leer("completo", ruta), ruta
+
+
+def test_delta_borra_los_dias_que_salieron_de_la_ventana(aislado):
+    main.publicar_fragmentos(iter(VIEJOS + CALIENTES[1:]), base_dir="api")
+    assert os.path.exists(os.path.join("api", "fecha", f"{VIEJO}.json"))
+
+    r = main.publicar_fragmentos(iter([]), tocados=CALIENTES[:1], base_dir="api")
+
+    assert r["borrados"] > 0
+    assert not any(VIEJO in ruta for ruta in _archivos("api"))
+    assert not any(VIEJO in ruta for ruta in _leer("api", "etags.json"))
+    assert "loteria_quiniela_real" not in _leer("api", "index.json")["loterias"]
+    _comparar_con_reconstruccion("api")
+
+
+def test_reconstruccion_completa_no_deja_fragmentos_viejos(aislado):
+    main.publicar_fragmentos(iter(VIEJOS + CALIENTES), base_dir="api")
+
+    main.publicar_fragmentos(iter(CALIENTES), base_dir="api")
+
+    etags = _leer("api", "etags.json")
+    assert set(etags) == set(_archivos("api")) - {"etags.json"}
+    _comparar_con_reconstruccion("api")
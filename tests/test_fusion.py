@@ -0,0 +1,66 @@
+import functools
+
+import main
+from conftest import LD, TN, fila
+
+_fila = functools.partial(
+    fila, fecha="2025-08-24", fecha_original="24-08-2025 16:00", hora_scrapeo="2025-08-24 17:25:26"
+)
+
+
+def test_mismo_sorteo_de_ambas_fuentes_queda_en_un_registro():
+    ld = _fila(LD, img="https://cdn/leidsa.png", hora_scrapeo="2025-08-24 17:30:00")
+    # tusnumerosrd nombra distinto la misma lotería y trae la hora.
+    tn = _fila(TN, loteria="Leidsa Noche", img="https://tn/leidsa.gif", hora="8:55PM",
+               hora_scrapeo="2025-08-24 17:20:00")
+
+    for filas in ([ld, tn], [tn, ld]):
+        (r,) = main.fusionar_registros(filas)
+        assert r["loteria"] == "Quiniela Leidsa"
+        assert r["fuentes"] == [LD, TN]
+        assert r["fuente"] == LD
+        assert r["img"] == "https://cdn/leidsa.png"   # logo: loteriasdominicanas primero
+        assert r["hora"] == "8:55PM"                   # hora: tusnumerosrd primero
+        assert r["hora_scrapeo"] == "2025-08-24 17:20:00"  # primer avistamiento
+
+
+def test_numeros_distintos_son_sorteos_distintos():
+    a = _fila(LD)
+    b = _fila(TN, numeros=("26", "73", "05"))
+
+    registros = main.fusionar_registros([a, b])
+
+    assert len(registros) == 2
+    assert {main.nums_key(r["numeros"]) for r in registros} == {
+        main.nums_key(a["numeros"]), main.nums_key(b["numeros"])
+    }
+    assert all(len(r["fuentes"]) == 1 for r in registros)
+
+
+def test_enriquecimiento_posterior_de_un_sorteo_guardado():
+    historico = main.fusionar_registros([_fila(LD, img="https://cdn/leidsa.png")])
+
+    cambios = main.fusionar_con_historico(historico, [_fila(TN, hora="8:55PM")])
+
+    (r,) = cambios
+    assert r["fuentes"] == [LD, TN]
+    assert r["hora"] == "8:55PM"
+    assert r["img"] == "https://cdn/leidsa.png"
+    # Lo que ya está no vuelve a salir como cambio.
+    assert main.fusionar_con_historico(historico + cambios, [_fila(TN, hora="8:55PM")]) == []
+    assert main.fusionar_con_historico(historico, [_fila(LD, img="https://cdn/leidsa.png")]) == []
+
+
+def test_fusionar_es_idempotente():
+    filas = [
+        _fila(LD, img="https://cdn/leidsa.png"),
+        _fila(TN, hora="8:55PM"),
+        _fila(TN, loteria="Loteka Noche", numeros=("01", "02", "03")),
+    ]
+
+    una_vez = main.fusionar_registros(filas)
+
+    assert main.fusionar_registros(filas + filas) == una_vez
+    assert main.fusionar_registros(una_vez) == una_vez
+    assert main.fusionar_registros(una_vez + filas) == una_vez
+    assert main.fusionar_con_historico(una_vez, filas) == []
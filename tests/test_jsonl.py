@@ -0,0 +1,96 @@
+import json
+import os
+
+import main
+from conftest import LD, TN, fila
+
+
+CORRIDAS = [
+    [
+        fila(LD, "Quiniela Leidsa", ("01", "02", "03"), dias_atras=3),
+        fila(LD, "Quiniela Loteka", ("26", "99", "4"), dias_atras=3),
+    ],
+    [
+        fila(TN, "Leidsa Noche", ("01", "02", "03"), dias_atras=3, hora="8:55PM"),
+        fila(TN, "Quiniela Loteka", ("26", "73", "Roja", "1234"), dias_atras=1),
+    ],
+    [
+        fila(LD, "Quiniela Leidsa", ("26", "73", "04"), dias_atras=0),
+        fila(LD, "Quiniela Loteka", ("26", "99", "4"), dias_atras=3, img="https://cdn/l.png"),
+    ],
+]
+
+
+def _corrida(filas, fragmentos=True):
+    """Una corrida con un almacén nuevo, como cada ejecución del scraper."""
+    almacen = main.AlmacenJSONL()
+    nuevos = main.normalizar_resultados(filas)
+    cambios = main.fusionar_con_historico(almacen.cargar_recientes(), nuevos)
+    almacen.guardar(cambios)
+    if fragmentos:
+        main.publicar_fragmentos(almacen.iterar_todo(), tocados=cambios, base_dir="api")
+    return almacen
+
+
+def _lineas_log():
+    with open(main.LOG_PATH, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def _publicado():
+    return main.cargar_historico(main.API_PATH)
+
+
+def test_snapshot_incremental_iguala_a_compactar(aislado):
+    for filas in CORRIDAS:
+        _corrida(filas, fragmentos=False)
+
+    # Las corridas 2 y 3 solo agregaron: el log conserva una línea por versión.
+    assert _lineas_log() == 6
+    incremental = _publicado()
+
+    os.remove(os.path.join(main.STATE_DIR, main.JSONL_ESTADO))
+    main.AlmacenJSONL().compactar()
+    assert _publicado() == incremental
+    assert len(incremental) == 4
+
+
+def test_snapshot_ajeno_se_reconstruye_desde_el_log(aislado):
+    _corrida(CORRIDAS[0], fragmentos=False)
+    # Alguien reescribió el archivo público por fuera: el estado ya no vale.
+    with open(main.API_PATH, encoding="utf-8") as f:
+        data = json.load(f)
+    data["resultados"] = data["resultados"][:1]
+    main.escribir_api_publica(data["resultados"], main.API_PATH)
+
+    _corrida(CORRIDAS[1], fragmentos=False)
+
+    claves = {main._clave(r) for r in _publicado()}
+    assert len(claves) == 3
+
+
+def test_log_se_compacta_al_pasar_el_umbral(aislado, monkeypatch):
+    monkeypatch.setattr(main, "JSONL_COMPACTAR_RATIO", 1.0)
+    for filas in CORRIDAS:
+        _corrida(filas, fragmentos=False)
+
+    # Con ratio 1 cada fusión deja el log en una línea por sorteo.
+    assert _lineas_log() == len(_publicado()) == 4
+
+
+def test_fragmentos_delta_igualan_a_la_reconstruccion(aislado):
+    for filas in CORRIDAS:
+        _corrida(filas)
+
+    def leer(base):
+        salida = {}
+        for raiz, _, archivos in os.walk(base):
+            for nombre in archivos:
+                if nombre.endswith(".json") and nombre != "etags.json":
+                    path = os.path.join(raiz, nombre)
+                    with open(path, encoding="utf-8") as f:
+                        salida[os.path.relpath(path, base)] = json.load(f)
+        return salida
+
+    main.publicar_fragmentos(main.AlmacenJSONL().iterar_todo(), base_dir="completo")
+    assert leer("api") == leer("completo")
@@ -0,0 +1,82 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import main
+
+HOY = datetime.now(main.TZ_RD)
+MES = {v: k for k, v in main.MESES.items()}[f"{HOY.month:02d}"]
+ANUNCIOS = "<div class='ad'><script>var x=1;</script></div>" * 30
+
+
+def _html(sorteos):
+    """Tabla de tusnumerosrd, de lo más nuevo a lo más viejo."""
+    filas = "".join(
+        f"<tr><td><h6 class='mb-0'>Lotería {i}</h6></td>"
+        f"<td><div class='badge badge-primary badge-dot'>{i % 100:02d}</div></td>"
+        f"<td><span class='table-inner-text'>{HOY.day} {MES}</span></td><td>8:{i % 60:02d}PM</td></tr>"
+        for i in sorteos
+    )
+    return f"<html><body>{ANUNCIOS}<table>{filas}</table></body></html>"
+
+
+def _parsear(sorteos, previas=()):
+    marca = main.MarcaAgua(previas, corte=main.FUENTES["tusnumerosrd"]["corte_marca"])
+    resultados = main.parsear_tusnumerosrd(_html(sorteos), marca=marca)
+    return [r["loteria"] for r in resultados], marca
+
+
+def test_pagina_sin_cambios_no_parsea_nada_y_conserva_la_marca():
+    sorteos = list(range(20, 0, -1))
+    _, primera = _parsear(sorteos)
+
+    loterias, marca = _parsear(sorteos, primera.siguiente())
+
+    assert loterias == []
+    assert marca.cortado and marca.saltadas == 5
+    assert marca.siguiente() == primera.siguiente()
+
+
+def test_marca_avanzada_parsea_solo_lo_nuevo():
+    _, primera = _parsear(list(range(20, 0, -1)))
+
+    loterias, marca = _parsear(list(range(22, 0, -1)), primera.siguiente())
+
+    assert loterias == ["Lotería 22", "Lotería 21"]
+    assert marca.cortado
+    # Lo nuevo primero; lo viejo sin recorrer sigue en la marca.
+    siguiente = marca.siguiente()
+    assert siguiente[2:] == primera.siguiente()
+    assert len(siguiente) == 22
+
+
+def test_parseo_completo_no_salta_lo_conocido():
+    sorteos = list(range(10, 0, -1))
+    _, primera = _parsear(sorteos)
+
+    marca = main.MarcaAgua(primera.siguiente(), corte=5, completo=True)
+    resultados = main.parsear_tusnumerosrd(_html(sorteos), marca=marca)
+
+    assert len(resultados) == 10
+    assert marca.saltadas == 10 and not marca.cortado
+
+
+@pytest.mark.parametrize("contenido", [None, "{no es json", "[1, 2]", '{"tusnumerosrd": "abc"}'])
+def test_estado_faltante_o_corrupto_parsea_todo(aislado, contenido):
+    if contenido is not None:
+        os.makedirs(main.STATE_DIR)
+        with open(os.path.join(main.STATE_DIR, main.MARCAS_ESTADO), "w", encoding="utf-8") as f:
+            f.write(contenido)
+
+    marca = main._marca_fuente("tusnumerosrd")
+    resultados = main.parsear_tusnumerosrd(_html(range(10, 0, -1)), marca=marca)
+
+    assert len(resultados) == 10
+    assert marca.saltadas == 0
+
+    # La corrida siguiente deja un marcas.json válido.
+    main.guardar_huellas({"tusnumerosrd": {"resultados": resultados, "marca": marca.siguiente()}})
+    with open(os.path.join(main.STATE_DIR, main.MARCAS_ESTADO), encoding="utf-8") as f:
+        assert json.load(f)["tusnumerosrd"] == marca.siguiente()
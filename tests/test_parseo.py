@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+import main
+
+HOY = datetime.now(main.TZ_RD).strftime("%d-%m-%Y")
+ANUNCIOS = "<div class='ad'><script>var x=1;</script><img src='/ads/x.png'></div>" * 30
+
+
+def _info(nombre, hora="10:00"):
+    return (
+        f"<div class='game-info p-2'><div class='game-logo'><img src='/img/{nombre}.png'></div>"
+        f"<div class='session-date'>{HOY} {hora}</div>"
+        f"<div class='game-title'><span>{nombre}</span></div></div>"
+    )
+
+
+def _scores(*numeros):
+    return "<div class='game-scores'>" + "".join(f"<span class='score'>{n}</span>" for n in numeros) + "</div>"
+
+
+def _pagina(cuerpo):
+    return f"<html><head><title>LD</title></head><body>{ANUNCIOS}{cuerpo}</body></html>"
+
+
+PAGINAS = {
+    "bloques": _pagina(
+        f"<div class='game-block'>{_info('Quiniela Leidsa')}{_scores('01', '02', '03')}</div>"
+        f"<div class='game-block'>{_info('Quiniela Loteka')}{_scores('26', '73', '04')}</div>"
+    ),
+    # El game-info va dentro de un envoltorio y los números fuera: no son hermanos.
+    "envoltorio": _pagina(
+        f"<div class='game-block'><div class='wrap'>{_info('Quiniela Leidsa')}</div>{_scores('01', '02', '03')}</div>"
+        f"<div class='game-block'>{_info('Quiniela Loteka')}{_scores('26', '73', '04')}</div>"
+    ),
+    # Bloques planos y uno sin números: toma los del siguiente hermano.
+    "sin_numeros": _pagina(
+        f"<div class='lista'>{_info('Quiniela Leidsa')}{_info('Quiniela Loteka', '11:00')}"
+        f"{_scores('26', '73', '04')}</div>"
+    ),
+    # Un bloque fuera de cualquier game-block.
+    "mixta": _pagina(
+        f"<div class='game-block'>{_info('Quiniela Leidsa')}{_scores('01', '02', '03')}</div>"
+        f"<section>{_info('Quiniela Loteka')}{_scores('26', '73', '04')}</section>"
+    ),
+}
+
+
+def _parsear(html, soup=None):
+    # hora_scrapeo es el reloj del parseo: no se compara.
+    return [dict(r, hora_scrapeo=None) for r in main.parsear_loterias_dominicanas(html, soup=soup)]
+
+
+@pytest.mark.parametrize("nombre", sorted(PAGINAS))
+def test_arbol_acotado_igual_al_completo(nombre):
+    html = PAGINAS[nombre]
+
+    assert _parsear(html) == _parsear(html, soup=main.construir_arbol(html))
+
+
+def test_envoltorio_no_toma_numeros_de_fuera():
+    html = PAGINAS["envoltorio"]
+
+    assert [r["loteria"] for r in main.parsear_loterias_dominicanas(html)] == ["Quiniela Loteka"]
+
+
+def test_bloques_acotados_dejan_fuera_los_anuncios():
+    soup = main.arbol_loterias_dominicanas(PAGINAS["bloques"])
+
+    assert soup.select_one("div.ad") is None
+    assert len(soup.select("div.game-info.p-2")) == 2
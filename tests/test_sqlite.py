@@ -0,0 +1,41 @@
+import os
+
+import main
+from conftest import LD, TN, fila
+
+
+def _contar(almacen):
+    return almacen.conn.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+
+
+def test_la_base_se_crea_en_el_estado_de_la_corrida(aislado):
+    almacen = main.AlmacenSQLite()
+    almacen.cerrar()
+
+    assert almacen.db_path == os.path.join(main.STATE_DIR, main.SQLITE_NOMBRE)
+    assert os.path.exists(almacen.db_path)
+
+
+def test_guardar_recargar_y_repetir_no_duplica(aislado):
+    filas = [
+        fila(LD, "Quiniela Leidsa", ("01", "02", "03")),
+        fila(LD, "Quiniela Loteka", ("26", "99", "4"), dias_atras=1),
+    ]
+    almacen = main.AlmacenSQLite()
+    assert almacen.guardar(main.normalizar_resultados(filas)) == 2
+    almacen.cerrar()
+
+    recargado = main.AlmacenSQLite()
+    recientes = recargado.cargar_recientes()
+    assert len(recientes) == 2
+    # Lo mismo otra vez, y el mismo sorteo visto por la otra fuente.
+    otra_fuente = fila(TN, "Leidsa Noche", ("01", "02", "03"), hora="8:55PM")
+    cambios = main.fusionar_con_historico(recientes, main.normalizar_resultados([*filas, otra_fuente]))
+    recargado.guardar(cambios)
+    assert recargado.guardar(main.normalizar_resultados(filas)) is None
+
+    assert _contar(recargado) == 2
+    leidsa = recargado.ultimo_sorteo("Quiniela Leidsa")
+    assert leidsa["hora"] == "8:55PM"
+    assert sorted(leidsa["fuentes"]) == [LD, TN]
+    recargado.cerrar()